@@ -0,0 +1,212 @@
+"""
+Benchmarks create_practical_training_log_book over varied inputs.
+
+Every case is timed for a number of rounds, filled in from the skeleton
+("template") and built from scratch ("build"), after one warm up round.
+Each result reports min/median/mean/max/stddev in milliseconds, the size
+of the saved .docx and the peak memory traced by tracemalloc in a separate
+round (tracing slows the timed rounds down). Results can be saved as a
+named baseline under docs/benchmarks/ and later runs compared to it.
+
+Run from the project root:
+
+    python -m docs.benchmark_create_document --save before
+    # ... change docs/create_document.py ...
+    python -m docs.benchmark_create_document --compare before
+"""
+import argparse
+import json
+import os
+import platform
+import statistics
+import sys
+import tempfile
+import time
+import tracemalloc
+from unittest.mock import patch
+
+os.environ.setdefault("DJANGO_SETTINGS_MODULE", "main.settings")
+
+from PIL import Image
+
+from docs import create_document
+from docs.create_document import DAYS, create_practical_training_log_book, template_bytes
+
+BENCHMARK_DIR = os.path.join(os.path.dirname(__file__), "benchmarks")
+MODES = ("template", "build")
+
+
+def sample_inputs(activity="Worked on project X on {day}", operations=2, activity_diagram=None):
+    return {
+        "department": "Computer Science",
+        "student_name": "Doe, John",
+        "reg_no": "2021-04-02100",
+        "company": "ABC Technologies",
+        "week_no": 1,
+        "from_date": "2023-07-03",
+        "to_date": "2023-07-07",
+        "data_dictionary": {
+            day: {"date": f"2023-07-0{i + 3}", "activity": activity.format(day=day)}
+            for i, day in enumerate(DAYS)
+        },
+        "operations": [
+            {"operation": f"Network installation {i}", "machinery": f"Crimping tool {i}"}
+            for i in range(operations)
+        ],
+        "activity_diagram": activity_diagram,
+    }
+
+
+def large_diagram(directory):
+    # a noisy photo compresses badly, like a phone picture of a drawing
+    path = os.path.join(directory, "large_diagram.jpg")
+    Image.effect_noise((3000, 2000), 64).convert("RGB").save(path, "JPEG", quality=95)
+    return path
+
+
+def small_diagram(directory):
+    path = os.path.join(directory, "diagram.png")
+    Image.new("RGB", (1200, 800), "white").save(path, "PNG")
+    return path
+
+
+CASES = {
+    "typical": lambda directory: sample_inputs(activity_diagram=small_diagram(directory)),
+    "long_activities": lambda directory: sample_inputs(
+        activity="\n".join(f"Step {i}: configured the {{day}} deployment and checked the logs." for i in range(60))),
+    "many_operations": lambda directory: sample_inputs(operations=80),
+    "large_diagram": lambda directory: sample_inputs(activity_diagram=large_diagram(directory)),
+    "missing_diagram": lambda directory: sample_inputs(
+        activity_diagram=os.path.join(directory, "deleted.png")),
+}
+
+
+def run_case(inputs, rounds, mode, output_dir):
+    """
+    Returns the timings, size and peak memory of create_practical_training_log_book
+    for inputs, saving the documents under output_dir.
+    """
+    with patch.object(create_document, "MEDIA_ROOT", output_dir), \
+            patch.object(create_document, "LOGBOOK_DOCX_TEMPLATE", mode == "template"):
+        # warm up, builds the skeleton and loads the diagram into the page cache
+        path = create_practical_training_log_book(**inputs)
+
+        timings = []
+        for _ in range(rounds):
+            start = time.perf_counter()
+            create_practical_training_log_book(**inputs)
+            timings.append((time.perf_counter() - start) * 1000)
+
+        tracemalloc.start()
+        try:
+            create_practical_training_log_book(**inputs)
+            _, peak = tracemalloc.get_traced_memory()
+        finally:
+            tracemalloc.stop()
+
+    return {
+        "rounds": rounds,
+        "min_ms": round(min(timings), 3),
+        "median_ms": round(statistics.median(timings), 3),
+        "mean_ms": round(statistics.mean(timings), 3),
+        "max_ms": round(max(timings), 3),
+        "stddev_ms": round(statistics.stdev(timings), 3) if rounds > 1 else 0.0,
+        "bytes": os.path.getsize(path),
+        "peak_memory_bytes": peak,
+    }
+
+
+def run(cases, rounds, modes):
+    """
+    Returns {"case[mode]": result} for every case and mode.
+    """
+    results = {}
+    with tempfile.TemporaryDirectory(prefix="mlfieldbook-benchmark-") as directory:
+        for case in cases:
+            inputs = CASES[case](directory)
+            for mode in modes:
+                results[f"{case}[{mode}]"] = run_case(inputs, rounds, mode, directory)
+    return results
+
+
+def compare(results, baseline, tolerance):
+    """
+    Returns the names whose median time or peak memory grew more than
+    tolerance percent over the baseline.
+    """
+    slower = []
+    for name, result in results.items():
+        base = baseline.get(name)
+        if base is None:
+            continue
+        for key in ("median_ms", "peak_memory_bytes"):
+            if result[key] > base[key] * (1 + tolerance / 100):
+                slower.append(f"{name} {key}")
+    return slower
+
+
+def change(value, base):
+    if not base:
+        return ""
+    return f" ({(value - base) / base * 100:+.0f}%)"
+
+
+def print_results(results, baseline=None):
+    baseline = baseline or {}
+    print(f"{'name':<28}{'min':>9}{'median':>17}{'mean':>9}{'max':>9}{'stddev':>9}"
+          f"{'size KiB':>16}{'peak MiB':>16}")
+    for name, result in results.items():
+        base = baseline.get(name, {})
+        print(
+            f"{name:<28}{result['min_ms']:>9.2f}"
+            f"{result['median_ms']:>9.2f}{change(result['median_ms'], base.get('median_ms')):>8}"
+            f"{result['mean_ms']:>9.2f}{result['max_ms']:>9.2f}{result['stddev_ms']:>9.2f}"
+            f"{result['bytes'] / 1024:>9.1f}{change(result['bytes'], base.get('bytes')):>7}"
+            f"{result['peak_memory_bytes'] / 1024 / 1024:>9.2f}"
+            f"{change(result['peak_memory_bytes'], base.get('peak_memory_bytes')):>7}")
+
+
+def baseline_path(name):
+    return os.path.join(BENCHMARK_DIR, f"{name}.json")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--rounds", type=int, default=20)
+    parser.add_argument("--case", action="append", choices=sorted(CASES), help="Run only these cases.")
+    parser.add_argument("--mode", action="append", choices=MODES, help="Run only these modes.")
+    parser.add_argument("--save", metavar="NAME", help="Save the results as docs/benchmarks/NAME.json.")
+    parser.add_argument("--compare", metavar="NAME", help="Compare with docs/benchmarks/NAME.json.")
+    parser.add_argument(
+        "--tolerance", type=float, default=10,
+        help="With --compare, exit with 1 if a median or peak memory grew more than this percent.")
+    args = parser.parse_args()
+
+    # the skeleton is built once per process, not per case
+    template_bytes()
+    results = run(args.case or list(CASES), args.rounds, args.mode or list(MODES))
+
+    baseline = None
+    if args.compare:
+        with open(baseline_path(args.compare)) as file:
+            baseline = json.load(file)["results"]
+    print_results(results, baseline)
+
+    if args.save:
+        os.makedirs(BENCHMARK_DIR, exist_ok=True)
+        with open(baseline_path(args.save), "w") as file:
+            json.dump({
+                "machine": {"python": platform.python_version(), "platform": platform.platform()},
+                "results": results,
+            }, file, indent=2)
+        print(f"saved {baseline_path(args.save)}")
+
+    if baseline is not None:
+        slower = compare(results, baseline, args.tolerance)
+        if slower:
+            print("worse than the baseline: " + ", ".join(slower))
+            sys.exit(1)
+
+
+if __name__ == "__main__":
+    main()
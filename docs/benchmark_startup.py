@@ -0,0 +1,88 @@
+"""
+Measures what a web worker imports before serving its first request.
+
+Starts fresh interpreters with `python -X importtime` that load the WSGI
+application and every URL pattern, as a gunicorn worker does, and reports
+the import time, peak memory, and how much of it python-docx, lxml and
+html2docx account for. --with-documents also imports docs.create_document,
+which is what the first Print of a worker costs on top.
+
+Run from the project root:
+
+    python -m docs.benchmark_startup [--runs 5] [--with-documents]
+"""
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# the document generation dependencies, loaded on first Print only
+DOCUMENT_PACKAGES = ("docx", "lxml", "html2docx", "docs")
+
+WORKER_STARTUP = (
+    "import os, resource, sys\n"
+    "os.environ.setdefault('DJANGO_SETTINGS_MODULE', 'main.settings')\n"
+    "from main.wsgi import application\n"
+    "from django.urls import get_resolver\n"
+    "get_resolver().url_patterns\n"
+    "{extra}"
+    "print(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss)\n"
+    "print(','.join(sorted({{name.split('.')[0] for name in sys.modules}})))\n"
+)
+
+
+def worker_startup(with_documents=False):
+    """
+    Returns (total import seconds, document package import seconds, peak
+    RSS in KiB, top level packages) of one fresh worker.
+    """
+    extra = "import docs.create_document\n" if with_documents else ""
+    result = subprocess.run(
+        [sys.executable, "-X", "importtime", "-c", WORKER_STARTUP.format(extra=extra)],
+        capture_output=True, text=True, check=True,
+        cwd=os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+    total = 0
+    # (nesting depth, document import time within) of lines whose parent
+    # import has not been printed yet, children are printed first
+    pending = []
+    for line in result.stderr.splitlines():
+        # "import time: self [us] | cumulative | <2 spaces per level>package"
+        if not line.startswith("import time:") or "imported package" in line:
+            continue
+        self_us, cumulative_us, name = line[len("import time:"):].split("|")
+        total += int(self_us) / 1e6
+        depth = (len(name) - 1 - len(name.lstrip())) // 2
+
+        children = 0
+        while pending and pending[-1][0] > depth:
+            children += pending.pop()[1]
+        # a document package counts with everything it imported
+        if name.strip().split(".")[0] in DOCUMENT_PACKAGES:
+            pending.append((depth, int(cumulative_us) / 1e6))
+        else:
+            pending.append((depth, children))
+    documents = sum(seconds for _, seconds in pending)
+
+    rss, packages = result.stdout.splitlines()[-2:]
+    return total, documents, int(rss), packages.split(",")
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__.strip().splitlines()[0])
+    parser.add_argument("--runs", type=int, default=5)
+    parser.add_argument("--with-documents", action="store_true")
+    args = parser.parse_args()
+
+    runs = [worker_startup(args.with_documents) for _ in range(args.runs)]
+    loaded = sorted(set(runs[0][3]) & set(DOCUMENT_PACKAGES))
+
+    print(f"imports:            {statistics.median(run[0] for run in runs) * 1000:7.1f} ms (median of {args.runs})")
+    print(f"document packages:  {statistics.median(run[1] for run in runs) * 1000:7.1f} ms")
+    print(f"peak RSS:           {statistics.median(run[2] for run in runs) / 1024:7.1f} MiB")
+    print(f"loaded:             {', '.join(loaded) or 'none of ' + ', '.join(DOCUMENT_PACKAGES)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,38 +1,54 @@
 import os
-from main.settings import MEDIA_ROOT, BASE_DIR
+import re
+from copy import deepcopy
+from io import BytesIO
+from main.settings import MEDIA_ROOT, BASE_DIR, LOGBOOK_DOCX_TEMPLATE
 from docx import Document
 from docx.enum.text import WD_PARAGRAPH_ALIGNMENT
 from docx.enum.table import WD_ALIGN_VERTICAL
 from docx.shared import Inches, Pt
 from docx.oxml import OxmlElement
 from docx.oxml.ns import qn
-from html2docx import html2docx
+from docx.text.run import Run
 
 
-def set_cell_borders(cell):
+def set_table_borders(table):
     """
-    Add borders to the table cell.
+    Add borders around and between all cells of the table, once on the
+    table properties instead of on every cell.
     """
-    tc = cell._tc
-    tcPr = tc.get_or_add_tcPr()
+    tblPr = table._tbl.tblPr
 
-    # Create a new element for cell borders
-    borders = OxmlElement("w:tcBorders")
-    for border_side in ("top", "bottom", "left", "right"):
-        border_element = OxmlElement(f"w:{border_side}")
-        borders.append(border_element)
-
-    # Set border properties
-    for border in borders:
+    # Create a new element for table borders
+    borders = OxmlElement("w:tblBorders")
+    for border_side in ("top", "left", "bottom", "right", "insideH", "insideV"):
+        border = OxmlElement(f"w:{border_side}")
         border.set(qn("w:val"), "single")
         border.set(qn("w:sz"), "4")  # Border size in half-points
         border.set(qn("w:color"), "auto")
+        borders.append(border)
+
+    # Add borders to the table, keeping the schema order of tblPr
+    tblPr.insert_element_before(
+        borders,
+        "w:shd",
+        "w:tblLayout",
+        "w:tblCellMar",
+        "w:tblLook",
+        "w:tblCaption",
+        "w:tblDescription",
+        "w:tblPrChange",
+    )
 
-    # Add borders to the cell
-    tcPr.append(borders)
 
+def logbook_filename(reg_no, week_no):
+    """
+    Returns the download/file name of a generated log book document.
+    """
+    return f"{reg_no}-week-{week_no}-practical-training-logbook.docx"
 
-def create_practical_training_log_book(
+
+def build_practical_training_log_book(
     department,
     student_name,
     reg_no,
@@ -43,9 +59,10 @@ def create_practical_training_log_book(
     data_dictionary,
     operations,
     activity_diagram,
+    doc=None,
 ):
     """
-    Creates a Word document for a student's practical training log book.
+    Builds the Word document for a student's practical training log book.
 
     Args:
         department (str): Name of the department.
@@ -60,13 +77,11 @@ def create_practical_training_log_book(
         operations (list): List of dictionaries with operation and machinery.
             Format: [{'operation': str, 'machinery': str}, ...]
         activity_diagram (str): File path to the activity diagram image.
+        doc (docx.document.Document, optional): Existing document to append
+            this week to, on a new page. A new document is created if None.
 
     Returns:
-        str: Filepath of the saved Word document.
-
-    Raises:
-        ValueError: If data_dictionary is missing required days.
-        FileNotFoundError: If activity_diagram file does not exist.
+        docx.document.Document: The unsaved Word document.
     """
 
     """
@@ -95,8 +110,11 @@ def create_practical_training_log_book(
     student_name = student_name.upper()
     company = company.upper()
 
-    # Create a new Document
-    doc = Document()
+    # Create a new Document, or start a new page of the given one
+    if doc is None:
+        doc = Document()
+    else:
+        doc.add_page_break()
 
     # Title
     title = doc.add_heading("NAME OF MY UNIVERISTY", level=1)
@@ -158,8 +176,7 @@ def create_practical_training_log_book(
     week_log_table.columns[2].width = Inches(2.5)
 
     # Add borders to the table cells
-    for cell in week_log_table._cells:
-        set_cell_borders(cell)
+    set_table_borders(week_log_table)
 
     # add an empty paragraph with 2 new line breaks
     doc.add_paragraph()
@@ -177,10 +194,8 @@ def create_practical_training_log_book(
     for cell in table._cells:
         cell.vertical_alignment = WD_ALIGN_VERTICAL.TOP
 
-        # Add borders to the table cells
-        for row in table.rows:
-            for cell in row.cells:
-                set_cell_borders(cell)
+    # Add borders to the table cells
+    set_table_borders(table)
 
     # Set column widths
     table.columns[0].width = Inches(2)
@@ -231,8 +246,7 @@ def create_practical_training_log_book(
     machinery_table.columns[1].width = Inches(3)
 
     # Add borders to the table cells
-    for cell in machinery_table._cells:
-        set_cell_borders(cell)
+    set_table_borders(machinery_table)
 
     # Add the column headers (single-row header)
     cell_0_0 = machinery_table.cell(0, 0)
@@ -267,8 +281,7 @@ def create_practical_training_log_book(
     comments_table.columns[1].width = Inches(4)
 
     # Add borders to the table cells
-    for cell in comments_table._cells:
-        set_cell_borders(cell)
+    set_table_borders(comments_table)
 
     # Add the column headers
     comments_table.cell(0, 0).text = "Comments from Industrial Supervisor"
@@ -281,8 +294,7 @@ def create_practical_training_log_book(
     name_table.columns[1].width = Inches(3)
 
     # Add borders to the table cells
-    for cell in name_table._cells:
-        set_cell_borders(cell)
+    set_table_borders(name_table)
 
     # Add the column headers
     name_table.cell(
@@ -309,8 +321,7 @@ def create_practical_training_log_book(
     diagram_table.columns[3].width = Inches(1.5)
 
     # Add borders to the table cells
-    for cell in diagram_table._cells:
-        set_cell_borders(cell)
+    set_table_borders(diagram_table)
 
     # Add the column headers
     diagram_table.cell(0, 0).text = "Detailed Diagram of the Main Job"
@@ -338,14 +349,252 @@ def create_practical_training_log_book(
         # Add placeholder text if no diagram is available
         diagram_table.cell(1, 0).text = "No diagram available"
 
+    return doc
+
+
+DAYS = ["Monday", "Tuesday", "Wednesday", "Thursday", "Friday"]
+PLACEHOLDER = re.compile(r"<<([A-Z_]+)>>")
+
+# saved log book skeleton, built once per process by template_bytes()
+_template = None
+
+
+def template_bytes():
+    """
+    Returns the log book skeleton as .docx bytes: the document built with
+    <<NAME>> placeholders for every value that differs between students and
+    weeks, a single operation row and no diagram.
+    """
+    global _template
+    if _template is None:
+        doc = build_practical_training_log_book(
+            "<<DEPARTMENT>>",
+            "<<STUDENT_NAME>>",
+            "<<REG_NO>>",
+            "<<COMPANY>>",
+            "<<WEEK_NO>>",
+            "<<FROM_DATE>>",
+            "<<TO_DATE>>",
+            {
+                day: {
+                    "date": f"<<DATE_{day.upper()}>>",
+                    "activity": f"<<ACTIVITY_{day.upper()}>>",
+                }
+                for day in DAYS
+            },
+            [{"operation": "<<OPERATION>>", "machinery": "<<MACHINERY>>"}],
+            None,
+        )
+        buffer = BytesIO()
+        doc.save(buffer)
+        _template = buffer.getvalue()
+    return _template
+
+
+def fill_placeholders(element, values):
+    """
+    Replaces the <<NAME>> placeholders in the text of element with values,
+    leaving placeholders without a value as they are.
+    """
+    for text_element in list(element.iter(qn("w:t"))):
+        if "<<" not in (text_element.text or ""):
+            continue
+        text = PLACEHOLDER.sub(
+            lambda match: values.get(match.group(1), match.group(0)), text_element.text)
+
+        run = text_element.getparent()
+        run_content = [child for child in run if child.tag != qn("w:rPr")]
+        if ("\n" in text or "\t" in text) and run_content == [text_element]:
+            # let python-docx turn line breaks and tabs into w:br / w:tab
+            Run(run, None).text = text
+        else:
+            text_element.text = text
+            text_element.set(qn("xml:space"), "preserve")
+
+
+def fill_practical_training_log_book(
+    department,
+    student_name,
+    reg_no,
+    company,
+    week_no,
+    from_date,
+    to_date,
+    data_dictionary,
+    operations,
+    activity_diagram,
+):
+    """
+    Fills a copy of the log book skeleton from template_bytes(). Produces the
+    same document as build_practical_training_log_book, without rebuilding
+    the headings, tables and borders on every call.
+
+    Takes the same arguments as build_practical_training_log_book.
+
+    Returns:
+        docx.document.Document: The unsaved Word document.
+    """
+    doc = Document(BytesIO(template_bytes()))
+
+    values = {
+        "DEPARTMENT": department.upper(),
+        "STUDENT_NAME": student_name.upper(),
+        "REG_NO": str(reg_no),
+        "COMPANY": company.upper(),
+        "WEEK_NO": str(week_no),
+        "FROM_DATE": str(from_date),
+        "TO_DATE": str(to_date),
+    }
+    for day in DAYS:
+        values[f"DATE_{day.upper()}"] = str(data_dictionary[day]["date"])
+        values[f"ACTIVITY_{day.upper()}"] = data_dictionary[day]["activity"]
+
+    operation_text = next(
+        text for text in doc.element.body.iter(qn("w:t")) if text.text == "<<OPERATION>>"
+    )
+    operation_row = next(operation_text.iterancestors(qn("w:tr")))
+
+    # fill the skeleton before adding operations, so text typed by the
+    # student is never read as a placeholder
+    fill_placeholders(doc.element.body, values)
+
+    # one copy of the operation row per operation, or a single empty row
+    for op_data in operations:
+        row = deepcopy(operation_row)
+        fill_placeholders(row, {
+            "OPERATION": op_data["operation"],
+            "MACHINERY": op_data["machinery"],
+        })
+        operation_row.addprevious(row)
+    if operations:
+        operation_row.getparent().remove(operation_row)
+    else:
+        for run in list(operation_row.iter(qn("w:r"))):
+            run.getparent().remove(run)
+
+    # get image from logbook.activity_diagram
+    if activity_diagram and os.path.exists(activity_diagram):
+        diagram_paragraph = doc.tables[-1].cell(1, 0).paragraphs[0]
+        diagram_paragraph.clear()
+        diagram_paragraph.alignment = WD_PARAGRAPH_ALIGNMENT.CENTER
+        diagram_paragraph.add_run().add_picture(activity_diagram, width=Inches(6))
+
+    return doc
+
+
+def new_practical_training_log_book(**document_inputs):
+    """
+    Returns the filled in log book, from the skeleton when
+    LOGBOOK_DOCX_TEMPLATE is enabled and built from scratch otherwise.
+    """
+    if LOGBOOK_DOCX_TEMPLATE:
+        return fill_practical_training_log_book(**document_inputs)
+    return build_practical_training_log_book(**document_inputs)
+
+
+def create_practical_training_log_book(
+    department,
+    student_name,
+    reg_no,
+    company,
+    week_no,
+    from_date,
+    to_date,
+    data_dictionary,
+    operations,
+    activity_diagram,
+):
+    """
+    Creates a Word document for a student's practical training log book
+    and saves it under MEDIA_ROOT/docs.
+
+    Takes the same arguments as build_practical_training_log_book.
+
+    Returns:
+        str: Filepath of the saved Word document.
+
+    Raises:
+        ValueError: If data_dictionary is missing required days.
+        FileNotFoundError: If activity_diagram file does not exist.
+    """
+    doc = new_practical_training_log_book(
+        department=department,
+        student_name=student_name,
+        reg_no=reg_no,
+        company=company,
+        week_no=week_no,
+        from_date=from_date,
+        to_date=to_date,
+        data_dictionary=data_dictionary,
+        operations=operations,
+        activity_diagram=activity_diagram,
+    )
+
     # Save the Document
     # Ensure the docs directory exists
     docs_dir = os.path.join(MEDIA_ROOT, 'docs')
     os.makedirs(docs_dir, exist_ok=True)
-    
-    filepath = os.path.join(
-        docs_dir, f"{reg_no}-week-{week_no}-practical-training-logbook.docx"
-    )
+
+    filepath = os.path.join(docs_dir, logbook_filename(reg_no, week_no))
     doc.save(filepath)
 
     return filepath
+
+
+def render_practical_training_log_book(
+    department,
+    student_name,
+    reg_no,
+    company,
+    week_no,
+    from_date,
+    to_date,
+    data_dictionary,
+    operations,
+    activity_diagram,
+):
+    """
+    Renders a student's practical training log book into memory, without
+    touching the disk.
+
+    Takes the same arguments as build_practical_training_log_book.
+
+    Returns:
+        io.BytesIO: Buffer holding the .docx bytes, positioned at the start.
+    """
+    doc = new_practical_training_log_book(
+        department=department,
+        student_name=student_name,
+        reg_no=reg_no,
+        company=company,
+        week_no=week_no,
+        from_date=from_date,
+        to_date=to_date,
+        data_dictionary=data_dictionary,
+        operations=operations,
+        activity_diagram=activity_diagram,
+    )
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+
+    return buffer
+
+
+def save_practical_training_log_book(filepath, **document_inputs):
+    """
+    Builds the log book and saves it to filepath, through a temporary file
+    so readers never see a partially written document. Takes the keyword
+    arguments of build_practical_training_log_book.
+
+    Returns:
+        str: filepath
+    """
+    doc = new_practical_training_log_book(**document_inputs)
+
+    tmp_path = f"{filepath}.tmp"
+    doc.save(tmp_path)
+    os.replace(tmp_path, filepath)
+
+    return filepath
@@ -0,0 +1,19 @@
+# gunicorn -c gunicorn.conf.py main.wsgi
+#
+# Workers share their Prometheus metrics through files in
+# PROMETHEUS_MULTIPROC_DIR, which must be an empty directory when the
+# server starts, e.g.
+#
+#   rm -rf /tmp/mlfieldbook-metrics && mkdir /tmp/mlfieldbook-metrics
+#   PROMETHEUS_MULTIPROC_DIR=/tmp/mlfieldbook-metrics gunicorn -c gunicorn.conf.py main.wsgi
+import os
+
+bind = os.environ.get('GUNICORN_BIND', '127.0.0.1:8000')
+workers = int(os.environ.get('GUNICORN_WORKERS', 4))
+
+
+def child_exit(server, worker):
+    # drop the live gauges of exited workers, their counters are kept
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        from prometheus_client import multiprocess
+        multiprocess.mark_process_dead(worker.pid)
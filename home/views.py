@@ -3,6 +3,8 @@ from django.contrib.auth import login, logout, authenticate
 from django.contrib.auth.hashers import make_password
 from django.contrib.auth.models import User
 
+from logbook.metrics import login_attempts
+
 
 def home_view(request):
     return render(request, "home/index.html")
@@ -46,12 +48,15 @@ def process_login(request, redirect_path="/"):
             user_obj = User.objects.get(Q(username=identifier) | Q(email=identifier))
             user = authenticate(username=user_obj.username, password=password)
         except User.DoesNotExist:
+            login_attempts.labels('failed').inc()
             return False
 
     if user is not None:
+        login_attempts.labels('succeeded').inc()
         login(request, user)
         return redirect(redirect_path)
     else:
+        login_attempts.labels('failed').inc()
         return False
 
 
@@ -1,18 +1,43 @@
 from django.contrib import admin
-from .models import Student, Logbook, Entry, Week_operation
+from . import search
+from .models import Student, Logbook, Entry, Week_operation, DocumentJob
+
+
+class FullTextSearchMixin:
+    # uses the full-text index where there is one, else Django's icontains search
+    search_kind = None
+
+    def get_search_results(self, request, queryset, search_term):
+        if not search_term or not search.is_supported():
+            return super().get_search_results(request, queryset, search_term)
+        return queryset.filter(id__in=search.matching_ids(search_term, self.search_kind)), False
+
 
 @admin.register(Student)
 class StudentAdmin(admin.ModelAdmin):
     list_display = ['user', 'university', 'department_name', 'registration_number', 'year_of_study', 'pt_location']
+    search_fields = ['registration_number', 'user__first_name', 'user__last_name', 'department_name']
 
 @admin.register(Logbook)
-class LogbookAdmin(admin.ModelAdmin):
-    list_display = ['student', 'week_number', 'from_date', 'to_date', 'is_submitted']
+class LogbookAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ['student', 'week_number', 'from_date', 'to_date', 'is_submitted', 'completion_percentage']
+    list_select_related = ['student__user']
+    search_fields = ['week_activity']
+    search_kind = search.LOGBOOK
 
 @admin.register(Entry)
-class EntryAdmin(admin.ModelAdmin):
+class EntryAdmin(FullTextSearchMixin, admin.ModelAdmin):
     list_display = ['logbook', 'day', 'date', 'activity', 'created_at', 'updated_at']
+    search_fields = ['activity']
+    search_kind = search.ENTRY
 
 @admin.register(Week_operation)
-class OperationAdmin(admin.ModelAdmin):
-    list_display = ['id', 'logbook', 'operation']
\ No newline at end of file
+class OperationAdmin(FullTextSearchMixin, admin.ModelAdmin):
+    list_display = ['id', 'logbook', 'operation']
+    search_fields = ['operation', 'machinery']
+    search_kind = search.OPERATION
+
+@admin.register(DocumentJob)
+class DocumentJobAdmin(admin.ModelAdmin):
+    list_display = ['id', 'logbook', 'status', 'created_at', 'finished_at']
+    list_filter = ['status']
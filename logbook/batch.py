@@ -0,0 +1,108 @@
+"""
+Scaffolding logbook weeks and their daily entries in bulk.
+
+Both steps skip rows that already exist, so repeating a request (or two
+requests racing each other) never creates duplicate weeks or days.
+"""
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+
+from . import metrics
+from .counters import refresh_counters
+from .models import Logbook, Entry
+
+PLACEHOLDER_ACTIVITY = "** click update to edit **"
+
+
+def following_weeks(logbook, last_week_number):
+    """
+    Creates the missing logbooks from the logbook's week up to
+    last_week_number, each starting seven days after the one before, and
+    returns all logbooks of that range.
+
+    Logbooks are saved one by one, so they are indexed for search like any
+    other and only the weeks this call created are counted.
+    """
+    weeks = range(logbook.week_number, last_week_number + 1)
+    existing = set(
+        Logbook.objects
+        .filter(student_id=logbook.student_id, week_number__in=weeks)
+        .values_list('week_number', flat=True)
+    )
+
+    created = 0
+    for week_number in weeks:
+        if week_number in existing:
+            continue
+        from_date = logbook.from_date + timedelta(weeks=week_number - logbook.week_number)
+        try:
+            with transaction.atomic():
+                Logbook.objects.create(
+                    student_id=logbook.student_id,
+                    week_number=week_number,
+                    from_date=from_date,
+                    to_date=from_date + timedelta(days=4),
+                    week_activity="Waiting for entries")
+        except IntegrityError:
+            # a concurrent request created the week first
+            continue
+        created += 1
+    metrics.logbooks_created.labels('batch').inc(created)
+
+    return Logbook.objects.filter(student_id=logbook.student_id, week_number__in=weeks)
+
+
+def create_entries(logbooks):
+    """
+    Creates an entry for every day from each logbook's from date to its to
+    date that does not have one yet. Returns the number of entries created.
+    """
+    logbooks = list(logbooks)
+    existing = set(
+        Entry.objects
+        .filter(logbook__in=logbooks)
+        .values_list('logbook_id', 'date')
+    )
+
+    new_entries = []
+    for logbook in logbooks:
+        for i in range((logbook.to_date - logbook.from_date).days + 1):
+            date = logbook.from_date + timedelta(days=i)
+            if (logbook.id, date) in existing:
+                continue
+            new_entries.append(Entry(
+                logbook=logbook,
+                day=date.strftime('%A'),
+                date=date,
+                activity=PLACEHOLDER_ACTIVITY))
+    Entry.objects.bulk_create(new_entries, ignore_conflicts=True)
+    # bulk_create sends no post_save signals
+    refresh_counters(Logbook.objects.filter(id__in=[logbook.id for logbook in logbooks]))
+    return len(new_entries)
+
+
+def scaffold_weeks(logbook, last_week_number=None):
+    """
+    Creates the entries of the logbook, or with last_week_number, the
+    logbooks and entries of every week up to it, in one transaction.
+
+    Raises:
+        ValueError: If last_week_number is before the logbook's week or
+            more than LOGBOOK_MAX_BATCH_WEEKS weeks after it.
+    """
+    if last_week_number is None:
+        last_week_number = logbook.week_number
+    week_count = last_week_number - logbook.week_number + 1
+    if week_count < 1 or week_count > settings.LOGBOOK_MAX_BATCH_WEEKS:
+        raise ValueError(
+            f"Choose a week between {logbook.week_number} and "
+            f"{logbook.week_number + settings.LOGBOOK_MAX_BATCH_WEEKS - 1}.")
+
+    with transaction.atomic():
+        if week_count == 1:
+            logbooks = [logbook]
+        else:
+            logbooks = following_weeks(logbook, last_week_number)
+        return create_entries(logbooks)
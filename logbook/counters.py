@@ -0,0 +1,43 @@
+"""
+Entry and operation counters stored on Logbook.
+
+Catalog and detail pages read the counters instead of counting rows on
+every view. Saving or deleting an Entry or Week_operation recounts its
+logbook in the same transaction (see signals.py), bulk inserts call
+refresh_counters themselves, and the repair_logbook_counters command
+recounts existing data.
+"""
+from django.db.models import Count, F, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+from .models import Entry, Week_operation
+
+# a week has five working days
+DAYS_PER_WEEK = 5
+
+
+def _count(queryset):
+    count = (
+        queryset.filter(logbook=OuterRef('pk'))
+        .order_by()
+        .values('logbook')
+        .annotate(count=Count('id'))
+        .values('count')
+    )
+    return Coalesce(Subquery(count, output_field=IntegerField()), Value(0))
+
+
+def refresh_counters(logbooks):
+    """
+    Recounts the given logbooks queryset with a single UPDATE, which also
+    bumps their version so cached fragments are re-rendered. Returns the
+    number of logbooks updated.
+    """
+    updated_entry_count = _count(Entry.objects.filter(is_updated=True))
+    return logbooks.update(
+        entry_count=_count(Entry.objects.all()),
+        updated_entry_count=updated_entry_count,
+        operation_count=_count(Week_operation.objects.all()),
+        completion_percentage=updated_entry_count * 100 / DAYS_PER_WEEK,
+        version=F('version') + 1,
+    )
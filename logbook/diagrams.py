@@ -0,0 +1,72 @@
+"""
+Print renditions of uploaded activity diagrams.
+
+Documents show the diagram 6 inches wide, so phone photos of several
+megabytes are reduced once at upload time: rotated upright from their EXIF
+orientation, scaled down to LOGBOOK_DIAGRAM_PRINT_WIDTH pixels and
+recompressed. Document generation embeds the rendition instead of the
+original upload.
+"""
+import os
+from io import BytesIO
+
+from django.conf import settings
+from django.core.files.base import ContentFile
+from PIL import Image, ImageOps, UnidentifiedImageError
+
+
+class DiagramError(ValueError):
+    pass
+
+
+def print_rendition(diagram_file):
+    """
+    Returns a ContentFile with the print rendition of an uploaded image.
+
+    Raises:
+        DiagramError: If the file is not an image Pillow can read.
+    """
+    max_width = settings.LOGBOOK_DIAGRAM_PRINT_WIDTH
+    try:
+        image = Image.open(diagram_file)
+        # JPEGs are decoded at the smallest 1/2, 1/4 or 1/8 scale still at
+        # least max_width on both sides, whichever way up the photo is
+        image.draft('RGB', (max_width, max_width))
+        image.load()
+    except (UnidentifiedImageError, Image.DecompressionBombError, OSError) as error:
+        raise DiagramError("The diagram must be a PNG or JPEG image.") from error
+    finally:
+        diagram_file.seek(0)
+
+    is_photo = image.format == 'JPEG'
+    image = ImageOps.exif_transpose(image)
+
+    image.thumbnail((max_width, image.height), Image.Resampling.LANCZOS)
+
+    # photos stay JPEG, drawings and screenshots are kept lossless as PNG
+    output = BytesIO()
+    if is_photo:
+        image.convert('RGB').save(
+            output, 'JPEG', quality=settings.LOGBOOK_DIAGRAM_JPEG_QUALITY, optimize=True)
+        extension = 'jpg'
+    else:
+        if image.mode not in ('1', 'L', 'LA', 'P', 'RGB', 'RGBA'):
+            image = image.convert('RGBA')
+        image.save(output, 'PNG', optimize=True)
+        extension = 'png'
+
+    name = os.path.splitext(os.path.basename(diagram_file.name))[0]
+    return ContentFile(output.getvalue(), name=f"{name}.{extension}")
+
+
+def set_activity_diagram(logbook, diagram_file):
+    """
+    Stores an uploaded diagram and its print rendition on the logbook,
+    without saving the logbook.
+    """
+    rendition = print_rendition(diagram_file)
+
+    if logbook.activity_diagram_print:
+        logbook.activity_diagram_print.delete(save=False)
+    logbook.activity_diagram = diagram_file
+    logbook.activity_diagram_print = rendition
@@ -0,0 +1,189 @@
+"""
+Content-addressed cache of generated logbook documents.
+
+A document is stored under a key hashed from every input that goes into it
+(student details, entries, operations and the diagram file contents), so an
+unchanged week is served from disk instead of being rebuilt. Documents live
+in one sub directory per logbook, "<cache dir>/<logbook id>/<key>.docx", so
+everything cached for a logbook can be dropped when its data changes.
+"""
+import hashlib
+import json
+import os
+import shutil
+import tempfile
+
+from django.conf import settings
+
+from . import metrics
+
+# bump when the generated document layout changes
+CACHE_VERSION = 2
+
+# diagram path -> (size, mtime, sha256), so big images are hashed only once
+_diagram_digests = {}
+
+# cache dir -> bytes stored, as of this process's last scan plus what it
+# stored since. Other processes' documents are counted at the next scan.
+_cache_bytes = {}
+
+# eviction frees down to this share of LOGBOOK_DOCUMENT_CACHE_MAX_BYTES, so
+# a full cache is not scanned again on every store
+EVICT_TO = 0.9
+
+
+def is_enabled():
+    return bool(settings.LOGBOOK_DOCUMENT_CACHE_DIR)
+
+
+def file_digest(path):
+    """
+    Returns the sha256 of a file, or None if it does not exist.
+    """
+    if not path or not os.path.exists(path):
+        return None
+
+    stat = os.stat(path)
+    cached = _diagram_digests.get(path)
+    if cached and cached[:2] == (stat.st_size, stat.st_mtime_ns):
+        return cached[2]
+
+    sha = hashlib.sha256()
+    with open(path, 'rb') as file:
+        for chunk in iter(lambda: file.read(1024 * 1024), b''):
+            sha.update(chunk)
+    digest = sha.hexdigest()
+    _diagram_digests[path] = (stat.st_size, stat.st_mtime_ns, digest)
+    return digest
+
+
+def document_key(document_inputs):
+    """
+    Hashes the keyword arguments of render_practical_training_log_book.
+    """
+    inputs = dict(document_inputs)
+    inputs['activity_diagram'] = file_digest(inputs.get('activity_diagram'))
+    inputs['cache_version'] = CACHE_VERSION
+    payload = json.dumps(inputs, sort_keys=True, default=str)
+    return hashlib.sha256(payload.encode('utf-8')).hexdigest()
+
+
+def logbook_dir(logbook_id):
+    return os.path.join(settings.LOGBOOK_DOCUMENT_CACHE_DIR, str(logbook_id))
+
+
+def get(logbook_id, key):
+    """
+    Returns the path of a cached document, or None on a miss.
+    """
+    path = os.path.join(logbook_dir(logbook_id), f"{key}.docx")
+    try:
+        # mark as recently used for the LRU eviction
+        os.utime(path)
+    except FileNotFoundError:
+        return None
+    return path
+
+
+def store(logbook_id, key, content):
+    """
+    Saves a rendered document. When the cache may have grown past
+    LOGBOOK_DOCUMENT_CACHE_MAX_BYTES, evicts least recently used documents.
+    """
+    directory = logbook_dir(logbook_id)
+    os.makedirs(directory, exist_ok=True)
+
+    # write to a temporary file first so readers never see partial documents
+    fd, tmp_path = tempfile.mkstemp(dir=directory, suffix='.tmp')
+    with os.fdopen(fd, 'wb') as file:
+        file.write(content)
+    path = os.path.join(directory, f"{key}.docx")
+    os.replace(tmp_path, path)
+
+    # the cache is walked on the first store of the process and whenever
+    # the running total goes over the limit, not on every store
+    cache_root = settings.LOGBOOK_DOCUMENT_CACHE_DIR
+    max_bytes = settings.LOGBOOK_DOCUMENT_CACHE_MAX_BYTES
+    total = _cache_bytes.get(cache_root)
+    if total is None or total + len(content) > max_bytes:
+        evict(max_bytes, int(max_bytes * EVICT_TO))
+    else:
+        _cache_bytes[cache_root] = total + len(content)
+    return path
+
+
+def evict(max_bytes, target_bytes=None):
+    """
+    Removes least recently used documents down to target_bytes (max_bytes
+    by default) if the cache holds more than max_bytes.
+    """
+    cache_root = settings.LOGBOOK_DOCUMENT_CACHE_DIR
+    if target_bytes is None:
+        target_bytes = max_bytes
+    if not os.path.isdir(cache_root):
+        _cache_bytes[cache_root] = 0
+        return
+
+    documents = []
+    total = 0
+    for logbook_entry in os.scandir(cache_root):
+        if not logbook_entry.is_dir():
+            continue
+        for entry in os.scandir(logbook_entry.path):
+            if not entry.name.endswith('.docx'):
+                continue
+            try:
+                stat = entry.stat()
+            except FileNotFoundError:
+                continue
+            documents.append((stat.st_mtime_ns, stat.st_size, entry.path))
+            total += stat.st_size
+
+    # drop the least recently used documents first
+    if total > max_bytes:
+        documents.sort()
+        for _, size, path in documents:
+            if total <= target_bytes:
+                break
+            try:
+                os.remove(path)
+            except FileNotFoundError:
+                pass
+            total -= size
+    _cache_bytes[cache_root] = total
+
+
+def invalidate(logbook_ids):
+    """
+    Drops every cached document of the given logbooks.
+    """
+    if not is_enabled():
+        return
+    for logbook_id in logbook_ids:
+        shutil.rmtree(logbook_dir(logbook_id), ignore_errors=True)
+
+
+def cached_document(logbook_id, document_inputs, render):
+    """
+    Returns an open file with the document for these inputs, calling
+    render(**document_inputs) and caching its buffer on a miss.
+    """
+    if not is_enabled():
+        return render(**document_inputs)
+
+    key = document_key(document_inputs)
+    path = get(logbook_id, key)
+    if path is not None:
+        try:
+            document = open(path, 'rb')
+        except FileNotFoundError:
+            # evicted between the lookup and the open
+            pass
+        else:
+            metrics.cache_lookup('document', True)
+            return document
+
+    metrics.cache_lookup('document', False)
+    buffer = render(**document_inputs)
+    store(logbook_id, key, buffer.getvalue())
+    return buffer
@@ -0,0 +1,149 @@
+"""
+Loading logbooks for document generation and exporting several weeks at
+once, either merged into one document or as a ZIP of weekly documents.
+"""
+import zipfile
+from io import BytesIO
+
+from django.db.models import Prefetch
+
+from . import document_cache
+from .models import Logbook, Entry, Week_operation
+
+DAYS = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
+
+
+def logbooks_for_documents(logbooks):
+    """
+    Loads everything a document needs for the given logbooks in three
+    queries: logbooks with their students, entries and operations.
+    """
+    return (
+        logbooks
+        .select_related('student__user')
+        .prefetch_related(
+            Prefetch('entries', queryset=Entry.objects.order_by('id')),
+            Prefetch('week_operations', queryset=Week_operation.objects.order_by('id')),
+        )
+    )
+
+
+def semester_logbooks(students):
+    return logbooks_for_documents(
+        Logbook.objects.filter(student__in=students)
+    ).order_by('student__registration_number', 'student_id', 'week_number', 'id')
+
+
+def activity_diagram_path(logbook):
+    # prefer the downscaled print rendition over the original upload
+    diagram = logbook.activity_diagram_print or logbook.activity_diagram
+    return diagram.path if diagram else None
+
+
+def logbook_document_inputs(logbook):
+    """
+    Returns the keyword arguments of render_practical_training_log_book for a
+    logbook loaded through logbooks_for_documents.
+    """
+    student = logbook.student
+
+    # collect activities
+    entries_by_day = {}
+    for entry in logbook.entries.all():
+        entries_by_day.setdefault(entry.day, entry)
+
+    activity_dict = {}
+    for day in DAYS:
+        entry = entries_by_day.get(day)
+        if entry is None:
+            activity_dict[day] = {
+                'date': "dd/mm/yyyy",
+                'activity': ""}
+        else:
+            activity_dict[day] = {
+                'date': entry.date,
+                'activity': entry.activity}
+
+    # get operation and machinery
+    operation_list = []
+    for week_operation in logbook.week_operations.all():
+        operation_list.append(
+            {"operation": week_operation.operation,
+            "machinery": week_operation.machinery})
+
+    return {
+        'department': student.department_name,
+        'student_name': f"{student.user.last_name}, {student.user.first_name}",
+        'reg_no': student.registration_number,
+        'company': student.pt_location,
+        'week_no': logbook.week_number,
+        'from_date': logbook.from_date,
+        'to_date': logbook.to_date,
+        'data_dictionary': activity_dict,
+        'operations': operation_list,
+        'activity_diagram': activity_diagram_path(logbook),
+    }
+
+
+def merged_document(logbooks):
+    """
+    Builds all weeks into a single document, one week after the other, and
+    returns it as an in-memory buffer.
+    """
+    # python-docx is only loaded by workers that generate documents
+    from docs.create_document import build_practical_training_log_book
+
+    doc = None
+    for logbook in logbooks:
+        doc = build_practical_training_log_book(**logbook_document_inputs(logbook), doc=doc)
+
+    buffer = BytesIO()
+    doc.save(buffer)
+    buffer.seek(0)
+    return buffer
+
+
+class _ZipSink:
+    """
+    Write-only file object collecting what zipfile writes, so the archive
+    can be streamed without being seekable or held in memory as a whole.
+    """
+
+    def __init__(self):
+        self.chunks = []
+
+    def write(self, data):
+        self.chunks.append(bytes(data))
+        return len(data)
+
+    def flush(self):
+        pass
+
+    def pop(self):
+        data = b''.join(self.chunks)
+        self.chunks = []
+        return data
+
+
+def iter_zip(logbooks, by_student=False):
+    """
+    Yields a ZIP archive with one document per logbook, one week at a time.
+    Weekly documents are taken from (and added to) the document cache.
+    """
+    from docs.create_document import render_practical_training_log_book, logbook_filename
+
+    sink = _ZipSink()
+    # documents are already compressed, storing them saves the CPU
+    with zipfile.ZipFile(sink, 'w', zipfile.ZIP_STORED) as archive:
+        for logbook in logbooks:
+            document_inputs = logbook_document_inputs(logbook)
+            name = logbook_filename(document_inputs['reg_no'], document_inputs['week_no'])
+            if by_student:
+                name = f"{document_inputs['reg_no']}/{name}"
+
+            document = document_cache.cached_document(
+                logbook.id, document_inputs, render_practical_training_log_book)
+            with document:
+                archive.writestr(name, document.read())
+            yield sink.pop()
+    yield sink.pop()
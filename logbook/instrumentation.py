@@ -0,0 +1,147 @@
+"""
+Per-view request timings.
+
+With LOGBOOK_INSTRUMENTATION on, InstrumentationMiddleware records the
+wall time, number of queries, time spent in the database and time spent
+generating documents of every request, under its URL name. The last
+LOGBOOK_INSTRUMENTATION_WINDOW requests of each URL name are kept in the
+process's memory, and the staff-only instrumentation endpoint reports
+their percentiles. Requests slower than LOGBOOK_SLOW_REQUEST_MS, or
+running more than LOGBOOK_SLOW_REQUEST_QUERIES queries, are logged to the
+"logbook.instrumentation" logger with their slowest SQL.
+"""
+import logging
+import threading
+import time
+from collections import defaultdict, deque
+from contextlib import ExitStack, contextmanager
+from contextvars import ContextVar
+
+from django.conf import settings
+from django.core.exceptions import MiddlewareNotUsed
+from django.db import connections
+
+logger = logging.getLogger('logbook.instrumentation')
+
+METRICS = ('wall_ms', 'queries', 'db_ms', 'document_ms')
+PERCENTILES = (50, 95, 99)
+
+# slowest queries kept per request for the slow request log
+SLOWEST_QUERIES = 3
+
+_current = ContextVar('logbook_request_timings', default=None)
+
+_lock = threading.Lock()
+_samples = defaultdict(lambda: deque(maxlen=settings.LOGBOOK_INSTRUMENTATION_WINDOW))
+
+
+class RequestTimings:
+    def __init__(self):
+        self.queries = 0
+        self.db_time = 0.0
+        self.document_time = 0.0
+        self.slowest = []
+
+    def __call__(self, execute, sql, params, many, context):
+        # wraps every query of the request, see connection.execute_wrapper
+        start = time.perf_counter()
+        try:
+            return execute(sql, params, many, context)
+        finally:
+            elapsed = time.perf_counter() - start
+            self.queries += 1
+            self.db_time += elapsed
+            self.slowest.append((elapsed, sql))
+            self.slowest.sort(key=lambda query: query[0], reverse=True)
+            del self.slowest[SLOWEST_QUERIES:]
+
+
+@contextmanager
+def document_timer():
+    """
+    Adds the time spent in the block to the request's document time.
+    """
+    timings = _current.get()
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        if timings is not None:
+            timings.document_time += time.perf_counter() - start
+
+
+def record(url_name, sample):
+    with _lock:
+        _samples[url_name].append(sample)
+
+
+def percentile(values, percent):
+    # nearest rank of sorted values
+    index = max(0, -(-len(values) * percent // 100) - 1)
+    return values[index]
+
+
+def report():
+    """
+    Returns {url name: {'count': n, metric: {'p50', 'p95', 'p99', 'max'}}}
+    over the kept requests of each URL name.
+    """
+    with _lock:
+        samples = {url_name: list(rows) for url_name, rows in _samples.items()}
+
+    result = {}
+    for url_name, rows in sorted(samples.items()):
+        view = {'count': len(rows)}
+        for i, metric in enumerate(METRICS):
+            values = sorted(row[i] for row in rows)
+            view[metric] = {f'p{percent}': percentile(values, percent) for percent in PERCENTILES}
+            view[metric]['max'] = values[-1]
+        result[url_name] = view
+    return result
+
+
+def reset():
+    with _lock:
+        _samples.clear()
+
+
+class InstrumentationMiddleware:
+    def __init__(self, get_response):
+        if not settings.LOGBOOK_INSTRUMENTATION:
+            raise MiddlewareNotUsed
+        self.get_response = get_response
+
+    def __call__(self, request):
+        timings = RequestTimings()
+        token = _current.set(timings)
+        start = time.perf_counter()
+        try:
+            with ExitStack() as stack:
+                for connection in connections.all():
+                    stack.enter_context(connection.execute_wrapper(timings))
+                response = self.get_response(request)
+        finally:
+            _current.reset(token)
+        wall_time = time.perf_counter() - start
+
+        match = request.resolver_match
+        url_name = match.view_name if match else 'unresolved'
+        sample = (
+            round(wall_time * 1000, 2),
+            timings.queries,
+            round(timings.db_time * 1000, 2),
+            round(timings.document_time * 1000, 2),
+        )
+        record(url_name, sample)
+
+        slow_ms = settings.LOGBOOK_SLOW_REQUEST_MS
+        slow_queries = settings.LOGBOOK_SLOW_REQUEST_QUERIES
+        if (slow_ms is not None and sample[0] > slow_ms) or (
+                slow_queries is not None and timings.queries > slow_queries):
+            logger.warning(
+                "Slow request %s %s (%s): %.0f ms, %d queries in %.0f ms, documents %.0f ms. "
+                "Slowest SQL:\n%s",
+                request.method, request.path, url_name, sample[0], timings.queries, sample[2],
+                sample[3],
+                '\n'.join(f"{elapsed * 1000:.1f} ms: {sql}" for elapsed, sql in timings.slowest))
+        return response
@@ -0,0 +1,229 @@
+"""
+Database-backed queue for generating logbook documents outside of the
+request worker.
+
+Views enqueue a DocumentJob and the browser polls its status. The
+run_document_worker management command claims pending jobs and renders
+them in a pool of LOGBOOK_DOCUMENT_WORKERS processes, writing the finished
+documents to LOGBOOK_DOCUMENT_JOB_DIR.
+"""
+import multiprocessing
+import os
+import shutil
+import time
+import traceback
+from concurrent.futures import ProcessPoolExecutor, wait, FIRST_COMPLETED
+from datetime import timedelta
+
+from django.conf import settings
+from django.db import IntegrityError, transaction
+from django.urls import reverse
+from django.utils import timezone
+
+from . import document_cache, metrics
+from .documents import logbooks_for_documents, logbook_document_inputs
+from .models import Logbook, DocumentJob
+
+ACTIVE_STATUSES = [DocumentJob.PENDING, DocumentJob.RUNNING]
+
+
+def enqueue(logbook):
+    """
+    Queues a document for the logbook, reusing a job that is still waiting
+    or running. Returns None if the student has too many jobs queued.
+    """
+    fail_stale_jobs()
+
+    existing = DocumentJob.objects.filter(logbook=logbook, status__in=ACTIVE_STATUSES).first()
+    if existing is not None:
+        return existing
+
+    active = DocumentJob.objects.filter(
+        logbook__student_id=logbook.student_id, status__in=ACTIVE_STATUSES).count()
+    if active >= settings.LOGBOOK_DOCUMENT_JOBS_PER_STUDENT:
+        return None
+
+    try:
+        with transaction.atomic():
+            return DocumentJob.objects.create(logbook=logbook)
+    except IntegrityError:
+        # a concurrent request queued the logbook first
+        return DocumentJob.objects.filter(logbook=logbook, status__in=ACTIVE_STATUSES).first()
+
+
+def job_status(job):
+    status = {
+        'id': job.id,
+        'status': job.status,
+        'status_url': reverse('document_job_status', kwargs={'job_id': job.id}),
+    }
+    if job.status == DocumentJob.DONE:
+        status['download_url'] = reverse('document_job_download', kwargs={'job_id': job.id})
+    if job.status == DocumentJob.FAILED:
+        status['error'] = "The document could not be generated, please try again."
+    return status
+
+
+def claim_next_job():
+    """
+    Marks the oldest pending job as running and returns it, or None if the
+    queue is empty. The conditional update keeps two workers from claiming
+    the same job.
+    """
+    while True:
+        job = DocumentJob.objects.filter(status=DocumentJob.PENDING).order_by('id').first()
+        if job is None:
+            return None
+        started_at = timezone.now()
+        claimed = DocumentJob.objects.filter(id=job.id, status=DocumentJob.PENDING).update(
+            status=DocumentJob.RUNNING, started_at=started_at)
+        if claimed:
+            job.status = DocumentJob.RUNNING
+            job.started_at = started_at
+            return job
+
+
+def start_job(pool, job):
+    """
+    Writes the job's document from the document cache when possible, else
+    submits it to the worker pool. Returns the future and the document
+    cache key, the future is None if the job is already done.
+    """
+    from docs.create_document import save_practical_training_log_book, logbook_filename
+
+    logbook = logbooks_for_documents(Logbook.objects).get(id=job.logbook_id)
+    document_inputs = logbook_document_inputs(logbook)
+
+    job.file_name = logbook_filename(document_inputs['reg_no'], document_inputs['week_no'])
+    job.output_path = os.path.join(settings.LOGBOOK_DOCUMENT_JOB_DIR, f"{job.id}.docx")
+    job.save(update_fields=['file_name', 'output_path'])
+    os.makedirs(settings.LOGBOOK_DOCUMENT_JOB_DIR, exist_ok=True)
+
+    cache_key = None
+    if document_cache.is_enabled():
+        cache_key = document_cache.document_key(document_inputs)
+        cached_path = document_cache.get(logbook.id, cache_key)
+        metrics.cache_lookup('document', cached_path is not None)
+        if cached_path is not None:
+            shutil.copyfile(cached_path, job.output_path)
+            finish_job(job)
+            return None, cache_key
+
+    future = pool.submit(save_practical_training_log_book, job.output_path, **document_inputs)
+    return future, cache_key
+
+
+def finish_job(job, future=None, cache_key=None):
+    try:
+        if future is not None:
+            future.result()
+    except Exception:
+        job.status = DocumentJob.FAILED
+        job.error = traceback.format_exc()
+    else:
+        job.status = DocumentJob.DONE
+    job.finished_at = timezone.now()
+    # fail_stale_jobs may have given up on the job meanwhile, and another
+    # job of the logbook been queued, so only a running job is finished
+    if not save_result(job):
+        return
+
+    if job.status == DocumentJob.DONE:
+        if cache_key is not None:
+            with open(job.output_path, 'rb') as document:
+                document_cache.store(job.logbook_id, cache_key, document.read())
+        metrics.documents_generated.labels('job').inc()
+        metrics.document_bytes.labels('job').observe(os.path.getsize(job.output_path))
+        if job.started_at is not None:
+            metrics.document_seconds.labels('job').observe(
+                (job.finished_at - job.started_at).total_seconds())
+
+
+def fail_job(job):
+    job.status = DocumentJob.FAILED
+    job.error = traceback.format_exc()
+    job.finished_at = timezone.now()
+    save_result(job)
+
+
+def save_result(job):
+    """
+    Stores the status, error and finish time of a job still running.
+    Returns whether it was.
+    """
+    return DocumentJob.objects.filter(id=job.id, status=DocumentJob.RUNNING).update(
+        status=job.status, error=job.error, finished_at=job.finished_at) == 1
+
+
+def fail_stale_jobs():
+    """
+    Fails jobs running for longer than LOGBOOK_DOCUMENT_JOB_TIMEOUT, left
+    behind by a worker that crashed or was stopped. Returns their number.
+    """
+    now = timezone.now()
+    return DocumentJob.objects.filter(
+        status=DocumentJob.RUNNING,
+        started_at__lt=now - timedelta(seconds=settings.LOGBOOK_DOCUMENT_JOB_TIMEOUT),
+    ).update(
+        status=DocumentJob.FAILED,
+        error="The worker stopped before the document was finished.",
+        finished_at=now,
+    )
+
+
+def purge_finished_jobs():
+    """
+    Deletes finished jobs, and their documents, older than
+    LOGBOOK_DOCUMENT_JOB_RETENTION seconds.
+    """
+    cutoff = timezone.now() - timedelta(seconds=settings.LOGBOOK_DOCUMENT_JOB_RETENTION)
+    expired = DocumentJob.objects.filter(
+        status__in=[DocumentJob.DONE, DocumentJob.FAILED], finished_at__lt=cutoff)
+    for output_path in expired.exclude(output_path='').values_list('output_path', flat=True):
+        try:
+            os.remove(output_path)
+        except FileNotFoundError:
+            pass
+    expired.delete()
+
+
+def run_worker(processes, poll_interval=1.0, once=False):
+    """
+    Claims and renders jobs until stopped. With once=True it returns as soon
+    as the queue is drained.
+    """
+    running = {}
+    last_purge = 0
+    fail_stale_jobs()
+
+    # spawned workers only render documents, they never touch the database
+    context = multiprocessing.get_context('spawn')
+    with ProcessPoolExecutor(max_workers=processes, mp_context=context) as pool:
+        while True:
+            # fill free worker slots
+            while len(running) < processes:
+                job = claim_next_job()
+                if job is None:
+                    break
+                try:
+                    future, cache_key = start_job(pool, job)
+                except Exception:
+                    fail_job(job)
+                    continue
+                if future is not None:
+                    running[future] = (job, cache_key)
+
+            if not running:
+                if once:
+                    return
+                if time.monotonic() - last_purge > 60:
+                    fail_stale_jobs()
+                    purge_finished_jobs()
+                    last_purge = time.monotonic()
+                time.sleep(poll_interval)
+                continue
+
+            done, _ = wait(running, timeout=poll_interval, return_when=FIRST_COMPLETED)
+            for future in done:
+                job, cache_key = running.pop(future)
+                finish_job(job, future, cache_key)
@@ -0,0 +1,245 @@
+"""
+Load test of the student workflow against a running server.
+
+seed() fills a scratch database with students who each have a semester
+of weeks, and writes a manifest of their logins, logbooks and entries.
+run() logs every client in as its own student and repeats the workflow
+(catalog, detail, entry update, operations, Print) from several threads
+for a fixed time, timing every request. The load_test command starts
+gunicorn on a temporary database and puts the two together.
+"""
+import http.cookiejar
+import json
+import threading
+import time
+import urllib.error
+import urllib.parse
+import urllib.request
+from datetime import date, timedelta
+
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+
+from . import search
+from .batch import create_entries
+from .counters import refresh_counters
+from .instrumentation import percentile
+from .models import Student, Logbook, Entry, Week_operation
+
+PASSWORD = 'load-test-password'
+USERNAME = 'loadtest-{}'
+
+# the steps of one pass through the workflow, in order
+STEPS = ['catalog', 'detail', 'entry_update', 'operations', 'print']
+
+
+def seed(students, weeks, operations=3):
+    """
+    Creates students with weeks of logbooks, entries and operations, and
+    returns the manifest the clients work from.
+    """
+    # one hash for every user, hashing each password would take minutes
+    password = make_password(PASSWORD)
+    start_date = date(2024, 1, 1)
+
+    with transaction.atomic():
+        users = User.objects.bulk_create([
+            User(username=USERNAME.format(i), email=f"{USERNAME.format(i)}@udsm.ac.tz", password=password)
+            for i in range(students)
+        ])
+        users = User.objects.filter(username__in=[user.username for user in users]).order_by('id')
+        Student.objects.bulk_create([
+            Student(
+                user=user,
+                university="UDSM",
+                department_name="Load Test",
+                registration_number=f"2024-04-{i:05d}",
+                year_of_study=3,
+                pt_location="Dar es Salaam",
+            )
+            for i, user in enumerate(users)
+        ])
+        student_ids = Student.objects.filter(user__in=users).values_list('id', flat=True)
+        Logbook.objects.bulk_create([
+            Logbook(
+                student_id=student_id,
+                week_number=week_number,
+                from_date=start_date + timedelta(weeks=week_number - 1),
+                to_date=start_date + timedelta(weeks=week_number - 1, days=4),
+                week_activity=f"Week {week_number} of the practical training",
+            )
+            for student_id in student_ids
+            for week_number in range(1, weeks + 1)
+        ])
+        logbooks = Logbook.objects.filter(student_id__in=student_ids)
+        create_entries(logbooks)
+        Week_operation.objects.bulk_create([
+            Week_operation(logbook=logbook, operation=f"Operation {i} of week {logbook.week_number}",
+                           machinery=f"Machine {i}")
+            for logbook in logbooks
+            for i in range(operations)
+        ])
+        # bulk inserts send no signals
+        refresh_counters(logbooks)
+        search.rebuild()
+
+    entries = {}
+    for entry_id, logbook_id, entry_date in Entry.objects.filter(logbook__in=logbooks).values_list(
+            'id', 'logbook_id', 'date'):
+        entries.setdefault(logbook_id, []).append([entry_id, entry_date.isoformat()])
+
+    manifest = []
+    for user in users:
+        student_logbooks = logbooks.filter(student__user=user).order_by('week_number')
+        manifest.append({
+            'username': user.username,
+            'logbooks': [
+                {'id': logbook.id, 'entries': entries.get(logbook.id, [])}
+                for logbook in student_logbooks
+            ],
+        })
+    return manifest
+
+
+class NoRedirect(urllib.request.HTTPRedirectHandler):
+    # time every request on its own instead of following redirects
+    def redirect_request(self, *args, **kwargs):
+        return None
+
+
+class Client:
+    """
+    One student's browser session against base_url.
+    """
+    def __init__(self, base_url, student, timeout=60):
+        self.base_url = base_url.rstrip('/')
+        self.student = student
+        self.timeout = timeout
+        self.cookies = http.cookiejar.CookieJar()
+        self.opener = urllib.request.build_opener(
+            urllib.request.HTTPCookieProcessor(self.cookies), NoRedirect)
+
+    def csrf_token(self):
+        for cookie in self.cookies:
+            if cookie.name == 'csrftoken':
+                return cookie.value
+        return ''
+
+    def request(self, path, data=None):
+        """
+        Returns the status and the seconds taken, reading the whole body.
+        """
+        if data is not None:
+            data = urllib.parse.urlencode({**data, 'csrfmiddlewaretoken': self.csrf_token()}).encode()
+        request = urllib.request.Request(self.base_url + path, data=data)
+        start = time.perf_counter()
+        try:
+            with self.opener.open(request, timeout=self.timeout) as response:
+                response.read()
+                status = response.status
+        except urllib.error.HTTPError as error:
+            error.read()
+            status = error.code
+        return status, time.perf_counter() - start
+
+    def login(self):
+        self.request('/login/')
+        status, _ = self.request('/login/', {'email': self.student['username'], 'password': PASSWORD})
+        if status != 302:
+            raise RuntimeError(f"Could not log in as {self.student['username']}: HTTP {status}")
+
+    def workflow(self, iteration):
+        """
+        Yields (step, status, seconds) for one pass through the workflow.
+        """
+        logbooks = self.student['logbooks']
+        logbook = logbooks[iteration % len(logbooks)]
+        entry_id, entry_date = logbook['entries'][iteration % len(logbook['entries'])]
+
+        yield ('catalog', *self.request('/logbook/catalog/'))
+        yield ('detail', *self.request(f"/logbook/catalog/{logbook['id']}/"))
+        yield ('entry_update', *self.request(
+            f"/logbook/catalog/{logbook['id']}/entry/{entry_id}/",
+            {'date_input': entry_date, 'activity_summary': f"Load test update {iteration}"}))
+        yield ('operations', *self.request(f"/logbook/operations/{logbook['id']}/"))
+        yield ('print', *self.request(f"/logbook/mlfieldbook/{logbook['id']}/"))
+
+
+def run(base_url, manifest, clients, duration):
+    """
+    Runs the workflow from clients threads, each as a different student,
+    for duration seconds. Returns the samples as (step, status, seconds).
+    """
+    samples = []
+    lock = threading.Lock()
+    errors = []
+    deadline = time.monotonic() + duration
+
+    def client_thread(student):
+        try:
+            client = Client(base_url, student)
+            client.login()
+            iteration = 0
+            while time.monotonic() < deadline:
+                for sample in client.workflow(iteration):
+                    with lock:
+                        samples.append(sample)
+                iteration += 1
+        except Exception as error:
+            errors.append(error)
+
+    threads = [
+        threading.Thread(target=client_thread, args=[manifest[i % len(manifest)]])
+        for i in range(clients)
+    ]
+    started = time.monotonic()
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
+    if errors:
+        raise errors[0]
+    return samples, time.monotonic() - started
+
+
+def summarize(samples, elapsed):
+    """
+    Returns {step: {requests, errors, rps, p50_ms, p95_ms, p99_ms}} with an
+    'all' row over every request.
+    """
+    rows = {}
+    for step in [*STEPS, 'all']:
+        step_samples = [sample for sample in samples if step in ('all', sample[0])]
+        if not step_samples:
+            continue
+        latencies = sorted(seconds * 1000 for _, _, seconds in step_samples)
+        rows[step] = {
+            'requests': len(step_samples),
+            'errors': sum(1 for _, status, _ in step_samples if status >= 400),
+            'rps': round(len(step_samples) / elapsed, 2),
+            **{f'p{percent}_ms': round(percentile(latencies, percent), 1) for percent in (50, 95, 99)},
+        }
+    return rows
+
+
+def regressions(summary, baseline, tolerance):
+    """
+    Returns a message for every step whose p95 latency grew, or whose
+    throughput fell, by more than tolerance percent of the baseline.
+    """
+    messages = []
+    for step, row in summary.items():
+        base = baseline.get(step)
+        if base is None:
+            continue
+        if row['p95_ms'] > base['p95_ms'] * (1 + tolerance / 100):
+            messages.append(f"{step}: p95 {row['p95_ms']} ms, baseline {base['p95_ms']} ms")
+        if row['rps'] < base['rps'] * (1 - tolerance / 100):
+            messages.append(f"{step}: {row['rps']} req/s, baseline {base['rps']} req/s")
+    return messages
+
+
+def load_manifest(path):
+    with open(path) as file:
+        return json.load(file)
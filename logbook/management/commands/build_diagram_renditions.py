@@ -0,0 +1,28 @@
+from django.core.management.base import BaseCommand
+
+from logbook.diagrams import print_rendition, DiagramError
+from logbook.models import Logbook, get_default_activity_diagram
+
+
+class Command(BaseCommand):
+    help = "Create print renditions for activity diagrams uploaded before they existed."
+
+    def handle(self, *args, **options):
+        logbooks = (
+            Logbook.objects.filter(activity_diagram_print='')
+            .exclude(activity_diagram='')
+            .exclude(activity_diagram=get_default_activity_diagram())
+        )
+
+        created = 0
+        for logbook in logbooks.iterator():
+            try:
+                with logbook.activity_diagram.open('rb') as diagram_file:
+                    logbook.activity_diagram_print = print_rendition(diagram_file)
+            except (FileNotFoundError, DiagramError) as error:
+                self.stderr.write(f"Skipping logbook {logbook.id}: {error}")
+                continue
+            logbook.save(update_fields=['activity_diagram_print'])
+            created += 1
+
+        self.stdout.write(self.style.SUCCESS(f"Created {created} diagram renditions"))
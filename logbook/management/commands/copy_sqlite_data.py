@@ -0,0 +1,117 @@
+from django.apps import apps
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+from django.core.management.color import no_style
+from django.core.serializers import sort_dependencies
+from django.db import connections, transaction
+from django.db.backends.sqlite3.base import DatabaseWrapper
+from django.db.migrations.executor import MigrationExecutor
+
+from logbook import search
+
+SOURCE = 'sqlite_source'
+
+
+class Command(BaseCommand):
+    help = (
+        "Copy every row of an SQLite database into the configured database, "
+        "keeping primary keys. Run migrate on the target first."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--source', default=str(settings.BASE_DIR / 'db.sqlite3'),
+            help="Path of the SQLite database to copy from.")
+        parser.add_argument(
+            '--batch-size', type=int, default=2000,
+            help="Rows read and inserted at a time.")
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Copy even if the target already has users or logbooks.")
+
+    def handle(self, *args, **options):
+        # the source is only known at run time, so its connection is
+        # created here instead of in DATABASES
+        connections[SOURCE] = DatabaseWrapper({
+            **connections['default'].settings_dict,
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': options['source'],
+            'OPTIONS': {},
+        }, SOURCE)
+        target = connections['default']
+        if target.vendor == 'sqlite' and str(target.settings_dict['NAME']) == options['source']:
+            del connections[SOURCE]
+            raise CommandError("The source and the target are the same database.")
+
+        try:
+            self.copy(target, options)
+        finally:
+            connections[SOURCE].close()
+            del connections[SOURCE]
+
+    def copy(self, target, options):
+        # both databases must be on the same migrations for the rows to fit
+        for alias, hint in [
+                (SOURCE, f"DB_ENGINE=sqlite DB_NAME={options['source']} python manage.py migrate"),
+                ('default', "python manage.py migrate")]:
+            executor = MigrationExecutor(connections[alias])
+            if executor.migration_plan(executor.loader.graph.leaf_nodes()):
+                raise CommandError(f"The {alias} database is not migrated, run: {hint}")
+
+        models = self.copied_models()
+        user_model = apps.get_model(settings.AUTH_USER_MODEL)
+        if not options['force'] and any(
+                model.objects.exists() for model in [user_model, apps.get_model('logbook', 'Logbook')]):
+            raise CommandError("The target database already has data, use --force to copy anyway.")
+
+        with transaction.atomic():
+            # migrate created its own content types and permissions, the
+            # copied rows refer to the source's ids
+            apps.get_model('auth', 'Permission').objects.all().delete()
+            apps.get_model('contenttypes', 'ContentType').objects.all().delete()
+
+            for model in models:
+                copied = self.copy_model(model, options['batch_size'])
+                self.stdout.write(f"{model._meta.label}: {copied}")
+
+            # continue primary key sequences after the copied ids
+            with target.cursor() as cursor:
+                for sql in target.ops.sequence_reset_sql(no_style(), models):
+                    cursor.execute(sql)
+
+            indexed = search.rebuild()
+
+        self.stdout.write(self.style.SUCCESS(f"Copied {len(models)} tables, indexed {indexed} texts"))
+
+    def copied_models(self):
+        """
+        Every concrete model including many-to-many tables, parents before
+        the models referring to them.
+        """
+        app_list = [(app_config, None) for app_config in apps.get_app_configs()]
+        models = sort_dependencies(app_list, allow_cycles=True)
+        for model in list(models):
+            for field in model._meta.local_many_to_many:
+                through = field.remote_field.through
+                if through._meta.auto_created and through not in models:
+                    models.append(through)
+        return [
+            model for model in models
+            if model._meta.managed and not model._meta.proxy
+        ]
+
+    def copy_model(self, model, batch_size):
+        model.objects.all().delete()
+        rows = model._base_manager.using(SOURCE).order_by('pk')
+
+        copied = 0
+        batch = []
+        for row in rows.iterator(chunk_size=batch_size):
+            # bulk_create sends no signals, so nothing is recounted or cached
+            batch.append(row)
+            if len(batch) >= batch_size:
+                model._base_manager.bulk_create(batch)
+                copied += len(batch)
+                batch = []
+        model._base_manager.bulk_create(batch)
+        return copied + len(batch)
@@ -0,0 +1,37 @@
+from django.core.management.base import BaseCommand, CommandError
+
+from logbook.documents import semester_logbooks, merged_document, iter_zip
+from logbook.models import Student
+
+
+class Command(BaseCommand):
+    help = "Export every logbook week of a student or a department as one DOCX or a ZIP."
+
+    def add_arguments(self, parser):
+        target = parser.add_mutually_exclusive_group(required=True)
+        target.add_argument('--student', help="Registration number of the student.")
+        target.add_argument('--department', help="Department name, exports all of its students.")
+        parser.add_argument('--format', choices=['docx', 'zip'], default='zip')
+        parser.add_argument('--output', required=True, help="File to write the export to.")
+
+    def handle(self, *args, **options):
+        if options['department']:
+            students = Student.objects.filter(department_name=options['department'])
+        else:
+            students = Student.objects.filter(registration_number=options['student'])
+
+        logbooks = semester_logbooks(students)
+        if not logbooks.exists():
+            raise CommandError("There are no logbooks to export.")
+
+        with open(options['output'], 'wb') as output:
+            if options['format'] == 'docx':
+                output.write(merged_document(logbooks).getvalue())
+            else:
+                chunks = iter_zip(
+                    logbooks.iterator(chunk_size=100),
+                    by_student=bool(options['department']))
+                for chunk in chunks:
+                    output.write(chunk)
+
+        self.stdout.write(self.style.SUCCESS(f"Exported logbooks to {options['output']}"))
@@ -0,0 +1,116 @@
+import json
+import os
+import socket
+import subprocess
+import sys
+import tempfile
+import time
+
+from django.conf import settings
+from django.core.management.base import BaseCommand, CommandError
+
+from logbook import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Seed a temporary SQLite database, start gunicorn on it and drive "
+        "the student workflow with concurrent clients, reporting req/s and "
+        "p50/p95/p99 latency per step."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20, help="Students to seed.")
+        parser.add_argument('--weeks', type=int, default=12, help="Weeks per student.")
+        parser.add_argument('--clients', type=int, default=8, help="Concurrent clients.")
+        parser.add_argument('--duration', type=float, default=30, help="Seconds to run the clients.")
+        parser.add_argument('--workers', type=int, default=4, help="gunicorn worker processes.")
+        parser.add_argument('--port', type=int, default=0, help="Port to serve on, a free one by default.")
+        parser.add_argument('--output', help="Write the results as JSON to this file.")
+        parser.add_argument(
+            '--baseline',
+            help="JSON results of an earlier run, fail if p95 or req/s of a step is worse.")
+        parser.add_argument(
+            '--tolerance', type=float, default=20,
+            help="Percent a step may be worse than the baseline.")
+
+    def handle(self, *args, **options):
+        with tempfile.TemporaryDirectory(prefix='mlfieldbook-loadtest-') as directory:
+            port = options['port'] or free_port()
+            env = {
+                **os.environ,
+                'DB_ENGINE': 'sqlite',
+                'DB_NAME': os.path.join(directory, 'loadtest.sqlite3'),
+                # scratch ids would collide with the real cached documents
+                'LOGBOOK_DOCUMENT_CACHE_DIR': os.path.join(directory, 'docs'),
+                'LOGBOOK_DOCUMENT_JOB_DIR': os.path.join(directory, 'jobs'),
+                'GUNICORN_BIND': f'127.0.0.1:{port}',
+                'GUNICORN_WORKERS': str(options['workers']),
+            }
+            env.pop('DB_REPLICAS', None)
+            env.pop('PROMETHEUS_MULTIPROC_DIR', None)
+            manifest_path = os.path.join(directory, 'manifest.json')
+
+            self.stdout.write(f"Seeding {options['students']} students x {options['weeks']} weeks...")
+            manage = [sys.executable, os.path.join(settings.BASE_DIR, 'manage.py')]
+            for command in [
+                    ['migrate', '--verbosity', '0'],
+                    ['seed_load_test_data', '--students', str(options['students']),
+                     '--weeks', str(options['weeks']), '--manifest', manifest_path]]:
+                subprocess.run(manage + command, cwd=settings.BASE_DIR, env=env, check=True)
+
+            server = subprocess.Popen(
+                [sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'main.wsgi'],
+                cwd=settings.BASE_DIR, env=env)
+            try:
+                wait_for_port(port, server)
+                self.stdout.write(
+                    f"Running {options['clients']} clients for {options['duration']:g}s "
+                    f"against {options['workers']} workers...")
+                samples, elapsed = loadtest.run(
+                    f'http://127.0.0.1:{port}', loadtest.load_manifest(manifest_path),
+                    options['clients'], options['duration'])
+            finally:
+                server.terminate()
+                server.wait(timeout=30)
+
+        summary = loadtest.summarize(samples, elapsed)
+        self.print_summary(summary)
+        if options['output']:
+            with open(options['output'], 'w') as file:
+                json.dump(summary, file, indent=2)
+
+        if summary.get('all', {}).get('errors'):
+            raise CommandError(f"{summary['all']['errors']} requests failed.")
+        if options['baseline']:
+            messages = loadtest.regressions(
+                summary, loadtest.load_manifest(options['baseline']), options['tolerance'])
+            if messages:
+                raise CommandError("Slower than the baseline:\n" + "\n".join(messages))
+
+    def print_summary(self, summary):
+        self.stdout.write(
+            f"{'step':<14}{'requests':>10}{'errors':>8}{'req/s':>9}{'p50 ms':>9}{'p95 ms':>9}{'p99 ms':>9}")
+        for step, row in summary.items():
+            self.stdout.write(
+                f"{step:<14}{row['requests']:>10}{row['errors']:>8}{row['rps']:>9}"
+                f"{row['p50_ms']:>9}{row['p95_ms']:>9}{row['p99_ms']:>9}")
+
+
+def free_port():
+    with socket.socket() as sock:
+        sock.bind(('127.0.0.1', 0))
+        return sock.getsockname()[1]
+
+
+def wait_for_port(port, server, timeout=30):
+    deadline = time.monotonic() + timeout
+    while time.monotonic() < deadline:
+        if server.poll() is not None:
+            raise CommandError("gunicorn exited before serving.")
+        try:
+            with socket.create_connection(('127.0.0.1', port), timeout=1):
+                return
+        except OSError:
+            time.sleep(0.2)
+    raise CommandError(f"gunicorn did not listen on port {port} within {timeout}s.")
@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+from django.db import transaction
+
+from logbook import search
+
+
+class Command(BaseCommand):
+    help = "Rebuild the full-text search index of entries, week activities and operations."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--chunk-size', type=int, default=2000,
+            help="Rows read and indexed at a time.")
+
+    def handle(self, *args, **options):
+        if not search.is_supported():
+            self.stderr.write("Full-text search needs SQLite or PostgreSQL, nothing to rebuild.")
+            return
+
+        # searches keep seeing the old index until the new one is complete
+        with transaction.atomic():
+            count = search.rebuild(options['chunk_size'])
+
+        self.stdout.write(self.style.SUCCESS(f"Indexed {count} texts"))
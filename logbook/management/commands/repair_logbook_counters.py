@@ -0,0 +1,24 @@
+from django.core.management.base import BaseCommand
+
+from logbook.counters import refresh_counters
+from logbook.models import Logbook
+
+
+class Command(BaseCommand):
+    help = "Recount the entry and operation counters stored on every logbook."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--batch-size', type=int, default=1000,
+            help="Logbooks recounted per UPDATE statement.")
+
+    def handle(self, *args, **options):
+        batch_size = options['batch_size']
+        logbook_ids = list(Logbook.objects.order_by('id').values_list('id', flat=True))
+
+        repaired = 0
+        for start in range(0, len(logbook_ids), batch_size):
+            batch = logbook_ids[start:start + batch_size]
+            repaired += refresh_counters(Logbook.objects.filter(id__in=batch))
+
+        self.stdout.write(self.style.SUCCESS(f"Recounted {repaired} logbooks"))
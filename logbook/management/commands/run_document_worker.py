@@ -0,0 +1,22 @@
+from django.conf import settings
+from django.core.management.base import BaseCommand
+
+from logbook.jobs import run_worker
+
+
+class Command(BaseCommand):
+    help = "Render queued logbook documents in a pool of worker processes."
+
+    def add_arguments(self, parser):
+        parser.add_argument(
+            '--processes', type=int, default=settings.LOGBOOK_DOCUMENT_WORKERS,
+            help="Number of documents rendered at the same time.")
+        parser.add_argument(
+            '--poll-interval', type=float, default=1.0,
+            help="Seconds to wait between checks of an empty queue.")
+        parser.add_argument(
+            '--once', action='store_true',
+            help="Exit once the queue is empty instead of waiting for new jobs.")
+
+    def handle(self, *args, **options):
+        run_worker(options['processes'], options['poll_interval'], options['once'])
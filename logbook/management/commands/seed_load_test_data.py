@@ -0,0 +1,38 @@
+import json
+
+from django.contrib.auth.models import User
+from django.core.management.base import BaseCommand, CommandError
+
+from logbook import loadtest
+
+
+class Command(BaseCommand):
+    help = (
+        "Create load test students with weeks of logbooks, entries and "
+        "operations, and write the manifest load_test reads. Meant for a "
+        "scratch database."
+    )
+
+    def add_arguments(self, parser):
+        parser.add_argument('--students', type=int, default=20, help="Students to create.")
+        parser.add_argument('--weeks', type=int, default=12, help="Weeks of logbooks per student.")
+        parser.add_argument(
+            '--manifest', default='loadtest-manifest.json',
+            help="File the students' logins, logbooks and entries are written to.")
+        parser.add_argument(
+            '--force', action='store_true',
+            help="Seed even if the database already has users.")
+
+    def handle(self, *args, **options):
+        if not options['force'] and User.objects.exists():
+            raise CommandError("The database already has users, use --force to seed anyway.")
+        if User.objects.filter(username__startswith=loadtest.USERNAME.format('')).exists():
+            raise CommandError("The database is already seeded.")
+
+        manifest = loadtest.seed(options['students'], options['weeks'])
+        with open(options['manifest'], 'w') as file:
+            json.dump(manifest, file)
+
+        self.stdout.write(self.style.SUCCESS(
+            f"Created {options['students']} students with {options['weeks']} weeks each, "
+            f"manifest written to {options['manifest']}"))
@@ -0,0 +1,81 @@
+"""
+Prometheus metrics of logbook operations, served at /metrics.
+
+Every gunicorn worker (and the document worker) counts in its own process.
+When PROMETHEUS_MULTIPROC_DIR is set in the environment before the
+processes start, prometheus_client keeps the values in files under that
+directory, and the endpoint adds up the files of all processes, so every
+scrape sees the totals whichever worker answers it. Without it each
+process reports only its own counts, which is fine for runserver.
+
+Cache hit ratios are hits / (hits + misses) of logbook_cache_requests_total.
+"""
+import os
+import time
+from contextlib import contextmanager
+
+from prometheus_client import (
+    CONTENT_TYPE_LATEST,
+    REGISTRY,
+    CollectorRegistry,
+    Counter,
+    Histogram,
+    generate_latest,
+    multiprocess,
+)
+
+logbooks_created = Counter(
+    'logbook_logbooks_created', "Logbook weeks created.", ['source'])
+entry_updates = Counter(
+    'logbook_entry_updates', "Daily entries updated.")
+documents_generated = Counter(
+    'logbook_documents_generated', "Documents generated.", ['kind'])
+document_seconds = Histogram(
+    'logbook_document_seconds', "Time to generate a document, cached or not.", ['kind'],
+    buckets=(0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10, 30, 60))
+document_bytes = Histogram(
+    'logbook_document_bytes', "Size of generated documents.", ['kind'],
+    buckets=(64 * 1024, 256 * 1024, 1024 * 1024, 4 * 1024 * 1024, 16 * 1024 * 1024, 64 * 1024 * 1024))
+diagram_uploads = Counter(
+    'logbook_diagram_uploads', "Activity diagram uploads.", ['result'])
+login_attempts = Counter(
+    'logbook_login_attempts', "Login attempts.", ['result'])
+cache_requests = Counter(
+    'logbook_cache_requests', "Cache lookups.", ['cache', 'result'])
+
+
+@contextmanager
+def document_timer(kind):
+    """
+    Counts a document of this kind and the time spent in the block.
+    """
+    start = time.perf_counter()
+    yield
+    document_seconds.labels(kind).observe(time.perf_counter() - start)
+    documents_generated.labels(kind).inc()
+
+
+def observe_document_size(kind, document):
+    """
+    Records the size of an open document file, leaving it at the start.
+    """
+    document.seek(0, os.SEEK_END)
+    document_bytes.labels(kind).observe(document.tell())
+    document.seek(0)
+
+
+def cache_lookup(cache, hit):
+    cache_requests.labels(cache, 'hit' if hit else 'miss').inc()
+
+
+def exposition():
+    """
+    Returns the metrics of every process in the text format, and its
+    content type.
+    """
+    if 'PROMETHEUS_MULTIPROC_DIR' in os.environ:
+        registry = CollectorRegistry()
+        multiprocess.MultiProcessCollector(registry)
+    else:
+        registry = REGISTRY
+    return generate_latest(registry), CONTENT_TYPE_LATEST
@@ -0,0 +1,71 @@
+"""
+Resolves the logged in user's Student once per request as request.student.
+
+The lookup is lazy, so requests that never touch request.student cost
+nothing. When the default cache is shared by every worker process, the
+student (without its user) is also kept there for
+LOGBOOK_STUDENT_CACHE_TIMEOUT seconds, and saving the profile, or any
+Student, drops the cached copy. A per-process cache could not be cleared
+in the other workers, so it is not used.
+"""
+from django.conf import settings
+from django.core.cache import cache
+from django.utils.functional import SimpleLazyObject
+
+from . import metrics
+from .models import Student
+
+# caches that live in one process, or nowhere
+LOCAL_CACHE_BACKENDS = {
+    'django.core.cache.backends.locmem.LocMemCache',
+    'django.core.cache.backends.dummy.DummyCache',
+}
+
+
+def shares_cache():
+    return settings.CACHES['default']['BACKEND'] not in LOCAL_CACHE_BACKENDS
+
+
+def student_cache_key(user_id):
+    return f"logbook:student:{user_id}"
+
+
+def get_student(user):
+    """
+    Returns the user's Student, or None for anonymous users and users who
+    have not filled in their profile.
+    """
+    if not user.is_authenticated:
+        return None
+
+    student = None
+    if shares_cache():
+        key = student_cache_key(user.id)
+        student = cache.get(key)
+        metrics.cache_lookup('student', student is not None)
+    if student is None:
+        student = Student.objects.filter(user=user).first()
+        # a missing profile is not cached, it may be created any moment
+        if student is None:
+            return None
+        if shares_cache():
+            cache.set(key, student, settings.LOGBOOK_STUDENT_CACHE_TIMEOUT)
+
+    # the user is already loaded, and stays out of the cache with its
+    # password hash
+    student.user = user
+    return student
+
+
+def invalidate_student(user_id):
+    cache.delete(student_cache_key(user_id))
+
+
+class StudentMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # falsy until the user has a Student profile
+        request.student = SimpleLazyObject(lambda: get_student(request.user))
+        return self.get_response(request)
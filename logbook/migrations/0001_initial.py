@@ -0,0 +1,74 @@
+# Generated by Django 6.1.2 on 2026-10-18 08:41
+
+import django.db.models.deletion
+import logbook.models
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    initial = True
+
+    dependencies = [
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Logbook',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('week_number', models.IntegerField()),
+                ('from_date', models.DateField()),
+                ('to_date', models.DateField()),
+                ('is_submitted', models.BooleanField(default=False, verbose_name='Logbook Printed')),
+                ('week_activity', models.TextField(blank=True)),
+                ('activity_diagram', models.FileField(blank=True, default=logbook.models.get_default_activity_diagram, upload_to='activity_diagrams')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Entry',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('day', models.CharField(max_length=255)),
+                ('date', models.DateField()),
+                ('activity', models.TextField()),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_updated', models.BooleanField(default=False)),
+                ('logbook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='entries', to='logbook.logbook')),
+            ],
+        ),
+        migrations.CreateModel(
+            name='Student',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('university', models.CharField(max_length=255)),
+                ('department_name', models.CharField(max_length=255)),
+                ('registration_number', models.CharField(max_length=255)),
+                ('year_of_study', models.IntegerField()),
+                ('pt_location', models.CharField(max_length=255)),
+                ('practical_training_start_date', models.DateField(blank=True, null=True)),
+                ('logbook_print_count', models.IntegerField(default=0)),
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, to=settings.AUTH_USER_MODEL)),
+            ],
+        ),
+        migrations.AddField(
+            model_name='logbook',
+            name='student',
+            field=models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='logbooks', to='logbook.student'),
+        ),
+        migrations.CreateModel(
+            name='Week_operation',
+            fields=[
+                ('id', models.BigAutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('operation', models.TextField(blank=True)),
+                ('machinery', models.TextField(blank=True)),
+                ('created_at', models.DateTimeField(auto_now_add=True)),
+                ('updated_at', models.DateTimeField(auto_now=True)),
+                ('is_updated', models.BooleanField(default=False)),
+                ('logbook', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='week_operations', to='logbook.logbook')),
+            ],
+        ),
+    ]
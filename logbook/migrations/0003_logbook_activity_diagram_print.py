@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 08:46
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0002_documentjob'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logbook',
+            name='activity_diagram_print',
+            field=models.FileField(blank=True, upload_to='activity_diagrams/print'),
+        ),
+    ]
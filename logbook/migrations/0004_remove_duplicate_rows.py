@@ -0,0 +1,68 @@
+# Generated by Django 6.1.2 on 2026-10-18 08:47
+
+from django.db import migrations
+from django.db.models import Count, Exists, OuterRef
+
+
+def remove_duplicates(apps, schema_editor):
+    """
+    Make existing data fit the new unique constraints. Of entries sharing a
+    logbook and date, and of logbooks sharing a student and week number,
+    only duplicates the student has not written in are removed; anything
+    else has to be resolved by hand before migrating.
+    """
+    Entry = apps.get_model('logbook', 'Entry')
+    Logbook = apps.get_model('logbook', 'Logbook')
+    Week_operation = apps.get_model('logbook', 'Week_operation')
+
+    duplicate_dates = (
+        Entry.objects.values('logbook_id', 'date')
+        .annotate(count=Count('id')).filter(count__gt=1)
+    )
+    for duplicate in duplicate_dates:
+        entries = Entry.objects.filter(
+            logbook_id=duplicate['logbook_id'], date=duplicate['date']
+        ).order_by('-is_updated', '-updated_at', '-id')
+        unedited_duplicates = [entry.id for entry in entries[1:] if not entry.is_updated]
+        Entry.objects.filter(id__in=unedited_duplicates).delete()
+
+        if entries.count() > 1:
+            raise RuntimeError(
+                f"Logbook {duplicate['logbook_id']} has several edited entries for "
+                f"{duplicate['date']}, merge or remove them before migrating."
+            )
+
+    duplicate_weeks = (
+        Logbook.objects.values('student_id', 'week_number')
+        .annotate(count=Count('id')).filter(count__gt=1)
+    )
+    for duplicate in duplicate_weeks:
+        logbooks = Logbook.objects.filter(
+            student_id=duplicate['student_id'], week_number=duplicate['week_number']
+        ).annotate(
+            has_content=Exists(Entry.objects.filter(logbook=OuterRef('pk'), is_updated=True))
+            | Exists(Week_operation.objects.filter(logbook=OuterRef('pk')))
+        ).order_by('-has_content', 'id')
+        empty_duplicates = [logbook.id for logbook in logbooks[1:] if not logbook.has_content]
+        Logbook.objects.filter(id__in=empty_duplicates).delete()
+
+        if logbooks.count() > 1:
+            raise RuntimeError(
+                f"Student {duplicate['student_id']} has several logbooks with content for "
+                f"week {duplicate['week_number']}, merge or renumber them before migrating."
+            )
+
+
+class Migration(migrations.Migration):
+    """
+    Runs in its own transaction ahead of the constraints, PostgreSQL does
+    not alter a table with pending trigger events from deleted rows.
+    """
+
+    dependencies = [
+        ('logbook', '0003_logbook_activity_diagram_print'),
+    ]
+
+    operations = [
+        migrations.RunPython(remove_duplicates, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,29 @@
+# Generated by Django 6.1.2 on 2026-10-18 08:47
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0004_remove_duplicate_rows'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['logbook', 'day'], name='entry_logbook_day_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='entry',
+            index=models.Index(fields=['logbook', 'is_updated'], name='entry_logbook_updated_idx'),
+        ),
+        migrations.AddConstraint(
+            model_name='entry',
+            constraint=models.UniqueConstraint(fields=('logbook', 'date'), name='unique_entry_logbook_date'),
+        ),
+        migrations.AddConstraint(
+            model_name='logbook',
+            constraint=models.UniqueConstraint(fields=('student', 'week_number'), name='unique_logbook_student_week'),
+        ),
+    ]
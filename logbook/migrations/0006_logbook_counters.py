@@ -0,0 +1,57 @@
+# Generated by Django 6.1.2 on 2026-10-18 08:51
+
+from django.db import migrations, models
+from django.db.models import Count, IntegerField, OuterRef, Subquery, Value
+from django.db.models.functions import Coalesce
+
+
+def count_existing(apps, schema_editor):
+    Entry = apps.get_model('logbook', 'Entry')
+    Logbook = apps.get_model('logbook', 'Logbook')
+    Week_operation = apps.get_model('logbook', 'Week_operation')
+
+    def count(queryset):
+        counts = (
+            queryset.filter(logbook=OuterRef('pk')).order_by()
+            .values('logbook').annotate(count=Count('id')).values('count')
+        )
+        return Coalesce(Subquery(counts, output_field=IntegerField()), Value(0))
+
+    updated_entry_count = count(Entry.objects.filter(is_updated=True))
+    Logbook.objects.update(
+        entry_count=count(Entry.objects.all()),
+        updated_entry_count=updated_entry_count,
+        operation_count=count(Week_operation.objects.all()),
+        completion_percentage=updated_entry_count * 100 / 5,
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0005_lookup_indexes_and_constraints'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logbook',
+            name='completion_percentage',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='logbook',
+            name='entry_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='logbook',
+            name='operation_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.AddField(
+            model_name='logbook',
+            name='updated_entry_count',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+        migrations.RunPython(count_existing, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,65 @@
+from django.db import migrations
+
+SQLITE_SCHEMA = [
+    "CREATE VIRTUAL TABLE logbook_search USING fts5("
+    "body, logbook_id UNINDEXED, student_id UNINDEXED, tokenize='porter unicode61')",
+]
+
+POSTGRESQL_SCHEMA = [
+    "CREATE TABLE logbook_search ("
+    "rowid bigint PRIMARY KEY, "
+    "logbook_id bigint NOT NULL, "
+    "student_id bigint NOT NULL, "
+    "body text NOT NULL, "
+    "document tsvector GENERATED ALWAYS AS (to_tsvector('english', body)) STORED)",
+    "CREATE INDEX logbook_search_document_idx ON logbook_search USING GIN (document)",
+    "CREATE INDEX logbook_search_student_idx ON logbook_search (student_id)",
+]
+
+# index the existing data, written in SQL so it does not depend on the
+# models of later migrations
+POPULATE = [
+    "INSERT INTO logbook_search (rowid, logbook_id, student_id, body) "
+    "SELECT id * 4 + 2, id, student_id, week_activity FROM logbook_logbook "
+    "WHERE trim(week_activity) <> ''",
+    "INSERT INTO logbook_search (rowid, logbook_id, student_id, body) "
+    "SELECT e.id * 4 + 1, e.logbook_id, l.student_id, e.activity "
+    "FROM logbook_entry e JOIN logbook_logbook l ON l.id = e.logbook_id "
+    "WHERE trim(e.activity) NOT IN ('', '** click update to edit **')",
+    "INSERT INTO logbook_search (rowid, logbook_id, student_id, body) "
+    "SELECT o.id * 4 + 3, o.logbook_id, l.student_id, trim(o.operation || ' ' || o.machinery) "
+    "FROM logbook_week_operation o JOIN logbook_logbook l ON l.id = o.logbook_id "
+    "WHERE trim(o.operation || ' ' || o.machinery) <> ''",
+]
+
+
+def create_search_index(apps, schema_editor):
+    """
+    The search index is not a model, it is created with the database's own
+    full-text engine. Other databases search without an index.
+    """
+    vendor = schema_editor.connection.vendor
+    if vendor == 'sqlite':
+        statements = SQLITE_SCHEMA
+    elif vendor == 'postgresql':
+        statements = POSTGRESQL_SCHEMA
+    else:
+        return
+    for statement in statements + POPULATE:
+        schema_editor.execute(statement)
+
+
+def drop_search_index(apps, schema_editor):
+    if schema_editor.connection.vendor in ('sqlite', 'postgresql'):
+        schema_editor.execute("DROP TABLE IF EXISTS logbook_search")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0006_logbook_counters'),
+    ]
+
+    operations = [
+        migrations.RunPython(create_search_index, drop_search_index),
+    ]
@@ -0,0 +1,19 @@
+# Generated by Django 6.1.2 on 2026-10-18 08:58
+
+from django.conf import settings
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0007_search_index'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='student',
+            index=models.Index(fields=['department_name', 'registration_number', 'id'], name='student_department_idx'),
+        ),
+    ]
@@ -0,0 +1,18 @@
+# Generated by Django 6.1.2 on 2026-10-18 09:01
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0008_student_department_index'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='logbook',
+            name='version',
+            field=models.PositiveIntegerField(default=0, editable=False),
+        ),
+    ]
@@ -0,0 +1,30 @@
+from django.db import migrations
+from django.db.models import Count
+
+
+def fail_duplicates(apps, schema_editor):
+    """
+    Keeps the newest waiting or running job of every logbook, so the
+    constraint of the next migration can be added.
+    """
+    DocumentJob = apps.get_model('logbook', 'DocumentJob')
+    active = DocumentJob.objects.filter(status__in=['pending', 'running'])
+    duplicated = (
+        active.values('logbook').annotate(jobs=Count('id')).filter(jobs__gt=1)
+        .values_list('logbook', flat=True)
+    )
+    for logbook_id in duplicated:
+        newest = active.filter(logbook_id=logbook_id).order_by('-id').first()
+        active.filter(logbook_id=logbook_id).exclude(id=newest.id).update(
+            status='failed', error="Replaced by a newer job.")
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0009_logbook_version'),
+    ]
+
+    operations = [
+        migrations.RunPython(fail_duplicates, migrations.RunPython.noop),
+    ]
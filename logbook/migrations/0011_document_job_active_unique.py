@@ -0,0 +1,17 @@
+# Generated by Django 6.1.2 on 2026-10-18 09:25
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('logbook', '0010_fail_duplicate_document_jobs'),
+    ]
+
+    operations = [
+        migrations.AddConstraint(
+            model_name='documentjob',
+            constraint=models.UniqueConstraint(condition=models.Q(('status__in', ['pending', 'running'])), fields=('logbook',), name='unique_active_document_job'),
+        ),
+    ]
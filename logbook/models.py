@@ -1,4 +1,5 @@
-from django.db import models
+from django.db import models, transaction
+from django.db.models import F
 from django.contrib.auth.models import User
 from main import settings
 import os
@@ -14,6 +15,12 @@ class Student(models.Model):
     practical_training_start_date = models.DateField(blank=True, null=True)
     logbook_print_count = models.IntegerField(default=0)
 
+    class Meta:
+        indexes = [
+            # department dashboard pages
+            models.Index(fields=['department_name', 'registration_number', 'id'], name='student_department_idx'),
+        ]
+
     def __str__(self):
         return f'{self.user.first_name} {self.user.last_name}'
 
@@ -37,6 +44,44 @@ class Logbook(models.Model):
     is_submitted = models.BooleanField(default=False, verbose_name="Logbook Printed")
     week_activity = models.TextField(blank=True)
     activity_diagram = models.FileField(upload_to="activity_diagrams", blank=True, default=get_default_activity_diagram)
+    # downscaled copy of activity_diagram embedded in generated documents
+    activity_diagram_print = models.FileField(upload_to="activity_diagrams/print", blank=True)
+    # maintained from entries and week operations, see counters.py
+    entry_count = models.PositiveIntegerField(default=0, editable=False)
+    updated_entry_count = models.PositiveIntegerField(default=0, editable=False)
+    operation_count = models.PositiveIntegerField(default=0, editable=False)
+    completion_percentage = models.PositiveIntegerField(default=0, editable=False)
+    # bumped whenever the logbook, its entries or operations change, keys
+    # the cached template fragments of the logbook's pages
+    version = models.PositiveIntegerField(default=0, editable=False)
+
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['student', 'week_number'], name='unique_logbook_student_week'),
+        ]
+
+    # written only by counters.refresh_counters, in a single UPDATE
+    COUNTER_FIELDS = {'entry_count', 'updated_entry_count', 'operation_count', 'completion_percentage'}
+
+    def save(self, *args, **kwargs):
+        if self._state.adding:
+            self.version += 1
+            super().save(*args, **kwargs)
+            return
+
+        # an instance loaded before an entry changed holds stale counters
+        # and version, so neither is written back from memory
+        update_fields = kwargs.get('update_fields')
+        if update_fields is None:
+            update_fields = [
+                field.name for field in self._meta.concrete_fields
+                if not field.primary_key and field.name not in self.COUNTER_FIELDS | {'version'}
+            ]
+        kwargs['update_fields'] = {*update_fields, 'version'}
+        self.version = F('version') + 1
+        super().save(*args, **kwargs)
+        self.refresh_from_db(fields=['version'])
+
     def __str__(self):
         return f'Logbook week:{self.week_number}'
 
@@ -50,6 +95,21 @@ class Entry(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_updated = models.BooleanField(default=False)
 
+    class Meta:
+        constraints = [
+            models.UniqueConstraint(fields=['logbook', 'date'], name='unique_entry_logbook_date'),
+        ]
+        indexes = [
+            models.Index(fields=['logbook', 'day'], name='entry_logbook_day_idx'),
+            models.Index(fields=['logbook', 'is_updated'], name='entry_logbook_updated_idx'),
+        ]
+
+
+    def save(self, *args, **kwargs):
+        # the logbook counters are updated by a post_save signal, in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.day} - {self.date}'
 
@@ -62,7 +122,48 @@ class Week_operation(models.Model):
     updated_at = models.DateTimeField(auto_now=True)
     is_updated = models.BooleanField(default=False)
 
+
+    def save(self, *args, **kwargs):
+        # the logbook counters are updated by a post_save signal, in the same transaction
+        with transaction.atomic():
+            super().save(*args, **kwargs)
+
     def __str__(self):
         return f'{self.operation}'
 
-        
\ No newline at end of file
+
+class DocumentJob(models.Model):
+    PENDING = 'pending'
+    RUNNING = 'running'
+    DONE = 'done'
+    FAILED = 'failed'
+    STATUS_CHOICES = [
+        (PENDING, 'Pending'),
+        (RUNNING, 'Running'),
+        (DONE, 'Done'),
+        (FAILED, 'Failed'),
+    ]
+
+    logbook = models.ForeignKey(Logbook, related_name='document_jobs', on_delete=models.CASCADE)
+    status = models.CharField(max_length=10, choices=STATUS_CHOICES, default=PENDING)
+    file_name = models.CharField(max_length=255, blank=True)
+    output_path = models.CharField(max_length=500, blank=True)
+    error = models.TextField(blank=True)
+    created_at = models.DateTimeField(auto_now_add=True)
+    started_at = models.DateTimeField(blank=True, null=True)
+    finished_at = models.DateTimeField(blank=True, null=True)
+
+    class Meta:
+        indexes = [models.Index(fields=['status', 'id'])]
+        constraints = [
+            # one waiting or running job per logbook, see jobs.enqueue
+            models.UniqueConstraint(
+                fields=['logbook'],
+                condition=models.Q(status__in=['pending', 'running']),
+                name='unique_active_document_job',
+            ),
+        ]
+
+    def __str__(self):
+        return f'{self.logbook} - {self.status}'
+
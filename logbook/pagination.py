@@ -0,0 +1,91 @@
+"""
+Keyset pagination.
+
+Pages are selected with WHERE (a, b) > (last a, last b) ORDER BY a, b
+instead of OFFSET, so every page costs the same however deep it is, and
+rows added while paging do not shift later pages. The position is passed
+between requests as an opaque cursor.
+"""
+import base64
+import json
+
+from django.core.exceptions import ValidationError
+from django.db.models import Q
+
+
+class InvalidCursor(ValueError):
+    pass
+
+
+def encode_cursor(values):
+    payload = json.dumps(values, default=str, separators=(',', ':'))
+    return base64.urlsafe_b64encode(payload.encode('utf-8')).decode('ascii')
+
+
+def model_field(model, path):
+    # follows relations in 'user__last_name' style paths
+    *relations, name = path.split('__')
+    for relation in relations:
+        model = model._meta.get_field(relation).related_model
+    return model._meta.get_field(name)
+
+
+def decode_cursor(cursor, model, fields):
+    """
+    Returns the values of fields in cursor, converted to the types of the
+    model's fields.
+    """
+    try:
+        values = json.loads(base64.urlsafe_b64decode(cursor.encode('ascii')))
+    except (ValueError, UnicodeError) as error:
+        raise InvalidCursor("Invalid page cursor.") from error
+    if not isinstance(values, list) or len(values) != len(fields):
+        raise InvalidCursor("Invalid page cursor.")
+
+    converted = []
+    for field, value in zip(fields, values):
+        if value is None or isinstance(value, (list, dict)):
+            raise InvalidCursor("Invalid page cursor.")
+        try:
+            converted.append(model_field(model, field).to_python(value))
+        except (ValidationError, TypeError, ValueError) as error:
+            raise InvalidCursor("Invalid page cursor.") from error
+    return converted
+
+
+def after(fields, values):
+    """
+    Returns a Q for the rows after values in the ascending order of fields.
+    """
+    condition = Q()
+    for i in reversed(range(len(fields))):
+        equal = {field: value for field, value in zip(fields[:i], values[:i])}
+        condition = Q(**equal, **{f'{fields[i]}__gt': values[i]}) | condition
+    return condition
+
+
+def keyset_page(queryset, fields, cursor=None, page_size=50):
+    """
+    Returns the page of queryset after cursor, ordered by fields (the last
+    one unique, usually 'id'), and the cursor of the next page or None.
+
+    Raises:
+        InvalidCursor: If the cursor was not returned by keyset_page for
+            the same fields.
+    """
+    queryset = queryset.order_by(*fields)
+    if cursor:
+        queryset = queryset.filter(after(fields, decode_cursor(cursor, queryset.model, fields)))
+
+    # one more row tells whether there is a next page
+    rows = list(queryset[:page_size + 1])
+    if len(rows) <= page_size:
+        return rows, None
+
+    rows = rows[:page_size]
+    last = rows[-1]
+    values = [
+        last[field] if isinstance(last, dict) else getattr(last, field)
+        for field in fields
+    ]
+    return rows, encode_cursor(values)
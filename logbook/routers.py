@@ -0,0 +1,89 @@
+"""
+Read replicas for the read-heavy views.
+
+Views decorated with @replica_reads (the catalog, the detail page, the
+week entries API and document generation) read from one of the aliases in
+LOGBOOK_DATABASE_REPLICAS, every other query goes to the primary. Replicas
+lag behind the primary, so once a request writes, its remaining queries
+use the primary, and ReplicaMiddleware sets a cookie that keeps the
+user's reads on the primary for LOGBOOK_REPLICA_STICKY_SECONDS, long
+enough for the replicas to catch up with what they wrote.
+
+Queries outside a request (commands, the document worker) always use the
+primary.
+"""
+import random
+from contextvars import ContextVar
+from functools import wraps
+
+from django.conf import settings
+
+STICKY_COOKIE = 'logbook_primary'
+
+# whether the current request may read from a replica, and whether it wrote
+_use_replica = ContextVar('logbook_use_replica', default=False)
+_written = ContextVar('logbook_written', default=False)
+
+
+def choose_replica():
+    return random.choice(settings.LOGBOOK_DATABASE_REPLICAS)
+
+
+class ReplicaRouter:
+    def db_for_read(self, model, **hints):
+        if _use_replica.get() and settings.LOGBOOK_DATABASE_REPLICAS:
+            return choose_replica()
+        return None
+
+    def db_for_write(self, model, **hints):
+        _use_replica.set(False)
+        _written.set(True)
+        # objects read from a replica are saved to the primary
+        instance = hints.get('instance')
+        if instance is not None and instance._state.db in settings.LOGBOOK_DATABASE_REPLICAS:
+            return 'default'
+        return None
+
+    def allow_relation(self, obj1, obj2, **hints):
+        databases = {'default', *settings.LOGBOOK_DATABASE_REPLICAS}
+        if obj1._state.db in databases and obj2._state.db in databases:
+            return True
+        return None
+
+    def allow_migrate(self, db, app_label, model_name=None, **hints):
+        # replicas get their tables from the primary
+        if db in settings.LOGBOOK_DATABASE_REPLICAS:
+            return False
+        return None
+
+
+def replica_reads(view):
+    """
+    Lets the view read from a replica, unless the user wrote recently.
+    """
+    @wraps(view)
+    def wrapper(request, *args, **kwargs):
+        if request.method in ('GET', 'HEAD') and STICKY_COOKIE not in request.COOKIES:
+            _use_replica.set(True)
+        return view(request, *args, **kwargs)
+    return wrapper
+
+
+class ReplicaMiddleware:
+    def __init__(self, get_response):
+        self.get_response = get_response
+
+    def __call__(self, request):
+        # threads serve many requests, start every one on the primary
+        use_replica = _use_replica.set(False)
+        written = _written.set(False)
+        try:
+            response = self.get_response(request)
+            if _written.get():
+                response.set_cookie(
+                    STICKY_COOKIE, '1', max_age=settings.LOGBOOK_REPLICA_STICKY_SECONDS,
+                    httponly=True, samesite='Lax')
+        finally:
+            _use_replica.reset(use_replica)
+            _written.reset(written)
+        return response
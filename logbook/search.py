@@ -0,0 +1,261 @@
+"""
+Full-text search over entry activities, week activities and week
+operations.
+
+Every searchable text is one row of the logbook_search table, keyed by
+kind and object id (see migration 0007). On SQLite the table is an FTS5 index ranked with bm25,
+on PostgreSQL it holds a generated tsvector with a GIN index ranked with
+ts_rank. Signals keep rows up to date on save and delete, and the
+rebuild_search_index command indexes existing data. Other databases fall
+back to unranked icontains lookups.
+"""
+import re
+
+from django.db import connection
+
+from .batch import PLACEHOLDER_ACTIVITY
+from .models import Logbook, Entry, Week_operation
+
+ENTRY = 'entry'
+LOGBOOK = 'logbook'
+OPERATION = 'operation'
+
+# the row key packs the kind into the object id, so rows are replaced by
+# primary key instead of scanning for (kind, object_id)
+KIND_CODES = {ENTRY: 1, LOGBOOK: 2, OPERATION: 3}
+KINDS = {code: kind for kind, code in KIND_CODES.items()}
+
+WORD = re.compile(r'\w+')
+
+
+def is_supported():
+    return connection.vendor in ('sqlite', 'postgresql')
+
+
+def row_key(kind, object_id):
+    return object_id * 4 + KIND_CODES[kind]
+
+
+def entry_row(entry, student_id):
+    if entry.activity.strip() in ('', PLACEHOLDER_ACTIVITY):
+        return None
+    return (row_key(ENTRY, entry.id), entry.logbook_id, student_id, entry.activity)
+
+
+def logbook_row(logbook):
+    if not logbook.week_activity.strip():
+        return None
+    return (row_key(LOGBOOK, logbook.id), logbook.id, logbook.student_id, logbook.week_activity)
+
+
+def operation_row(operation, student_id):
+    body = f"{operation.operation} {operation.machinery}".strip()
+    if not body:
+        return None
+    return (row_key(OPERATION, operation.id), operation.logbook_id, student_id, body)
+
+
+INSERT_ROW = (
+    "INSERT INTO logbook_search (rowid, logbook_id, student_id, body) VALUES (%s, %s, %s, %s)"
+)
+
+# replacing in one statement, a DELETE and INSERT from two transactions
+# saving the same object can both find no row and insert it twice
+REPLACE_ROW = {
+    'sqlite': "INSERT OR REPLACE INTO logbook_search (rowid, logbook_id, student_id, body) "
+              "VALUES (%s, %s, %s, %s)",
+    'postgresql': INSERT_ROW + " ON CONFLICT (rowid) DO UPDATE SET "
+                  "logbook_id = EXCLUDED.logbook_id, student_id = EXCLUDED.student_id, body = EXCLUDED.body",
+}
+
+
+def write_rows(rows, removed_keys=(), replace=True):
+    """
+    Inserts or replaces index rows of (key, logbook_id, student_id, body)
+    and deletes the rows of removed_keys. Without replace the rows must
+    not be in the index yet.
+    """
+    if not is_supported():
+        return
+    with connection.cursor() as cursor:
+        if removed_keys:
+            cursor.executemany("DELETE FROM logbook_search WHERE rowid = %s", [[key] for key in removed_keys])
+        if rows:
+            cursor.executemany(REPLACE_ROW[connection.vendor] if replace else INSERT_ROW, rows)
+
+
+def index_object(kind, instance):
+    """
+    Updates the index row of a saved Entry, Logbook or Week_operation.
+    """
+    if kind == LOGBOOK:
+        row = logbook_row(instance)
+    else:
+        student_id = instance.logbook.student_id
+        row = entry_row(instance, student_id) if kind == ENTRY else operation_row(instance, student_id)
+
+    if row is None:
+        write_rows([], [row_key(kind, instance.id)])
+    else:
+        write_rows([row])
+
+
+def remove_object(kind, object_id):
+    write_rows([], [row_key(kind, object_id)])
+
+
+def iter_rows(chunk_size=2000):
+    logbooks = Logbook.objects.only('id', 'student_id', 'week_activity')
+    for logbook in logbooks.iterator(chunk_size=chunk_size):
+        yield logbook_row(logbook)
+    entries = Entry.objects.values_list('id', 'logbook_id', 'logbook__student_id', 'activity')
+    for entry_id, logbook_id, student_id, activity in entries.iterator(chunk_size=chunk_size):
+        yield entry_row(Entry(id=entry_id, logbook_id=logbook_id, activity=activity), student_id)
+    operations = Week_operation.objects.values_list(
+        'id', 'logbook_id', 'logbook__student_id', 'operation', 'machinery')
+    for operation_id, logbook_id, student_id, operation, machinery in operations.iterator(chunk_size=chunk_size):
+        yield operation_row(
+            Week_operation(id=operation_id, logbook_id=logbook_id, operation=operation, machinery=machinery),
+            student_id)
+
+
+def rebuild(chunk_size=2000):
+    """
+    Replaces the whole index with the current data. Returns the number of
+    rows indexed.
+    """
+    if not is_supported():
+        return 0
+
+    with connection.cursor() as cursor:
+        cursor.execute("DELETE FROM logbook_search")
+
+    count = 0
+    chunk = []
+    for row in iter_rows(chunk_size):
+        if row is None:
+            continue
+        chunk.append(row)
+        if len(chunk) >= chunk_size:
+            write_rows(chunk, replace=False)
+            count += len(chunk)
+            chunk = []
+    write_rows(chunk, replace=False)
+    return count + len(chunk)
+
+
+def match_expression(query):
+    """
+    Turns user input into a query all words have to match, the last one as
+    a prefix so results show up while typing. Returns None without words.
+    """
+    words = [word.lower() for word in WORD.findall(query)]
+    if not words:
+        return None
+    if connection.vendor == 'sqlite':
+        terms = [f'"{word}"' for word in words]
+        terms[-1] += '*'
+        return ' '.join(terms)
+    terms = [word.replace("'", '') for word in words]
+    terms[-1] += ':*'
+    return ' & '.join(terms)
+
+
+def search(query, student=None, limit=20):
+    """
+    Returns the best matches for query as dicts with kind, object_id,
+    logbook_id, week_number, snippet and rank, best first. With a student
+    only that student's logbooks are searched.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+
+    if connection.vendor == 'sqlite':
+        sql = (
+            "SELECT rowid, logbook_id, snippet(logbook_search, 0, '[', ']', '...', 12), "
+            "bm25(logbook_search) FROM logbook_search "
+            "WHERE logbook_search MATCH %s {student_filter}"
+            "ORDER BY bm25(logbook_search) LIMIT %s"
+        )
+    elif connection.vendor == 'postgresql':
+        sql = (
+            "SELECT rowid, logbook_id, "
+            "ts_headline('english', body, query, 'StartSel=[, StopSel=], MaxWords=12, MinWords=4'), "
+            "ts_rank(document, query) AS rank "
+            "FROM logbook_search, to_tsquery('english', %s) query "
+            "WHERE document @@ query {student_filter}"
+            "ORDER BY rank DESC LIMIT %s"
+        )
+    else:
+        return fallback_search(query, student, limit)
+
+    params = [expression]
+    student_filter = ''
+    if student is not None:
+        student_filter = 'AND student_id = %s '
+        params.append(student.id)
+    params.append(limit)
+
+    with connection.cursor() as cursor:
+        cursor.execute(sql.format(student_filter=student_filter), params)
+        rows = cursor.fetchall()
+
+    week_numbers = dict(
+        Logbook.objects.filter(id__in={row[1] for row in rows}).values_list('id', 'week_number'))
+    return [
+        {
+            'kind': KINDS[key % 4],
+            'object_id': key // 4,
+            'logbook_id': logbook_id,
+            'week_number': week_numbers.get(logbook_id),
+            'snippet': snippet,
+            'rank': rank,
+        }
+        for key, logbook_id, snippet, rank in rows
+    ]
+
+
+def matching_ids(query, kind):
+    """
+    Returns the ids of every object of a kind that matches query.
+    """
+    expression = match_expression(query)
+    if expression is None:
+        return []
+
+    if connection.vendor == 'sqlite':
+        sql = "SELECT rowid FROM logbook_search WHERE logbook_search MATCH %s AND rowid %% 4 = %s"
+    else:
+        sql = (
+            "SELECT rowid FROM logbook_search "
+            "WHERE document @@ to_tsquery('english', %s) AND rowid %% 4 = %s"
+        )
+    with connection.cursor() as cursor:
+        cursor.execute(sql, [expression, KIND_CODES[kind]])
+        return [key // 4 for key, in cursor.fetchall()]
+
+
+def fallback_search(query, student, limit):
+    results = []
+    lookups = [
+        (LOGBOOK, Logbook.objects.filter(week_activity__icontains=query), 'student', 'week_activity'),
+        (ENTRY, Entry.objects.filter(activity__icontains=query), 'logbook__student', 'activity'),
+        (OPERATION, Week_operation.objects.filter(operation__icontains=query), 'logbook__student', 'operation'),
+    ]
+    for kind, queryset, student_field, text_field in lookups:
+        if student is not None:
+            queryset = queryset.filter(**{student_field: student})
+        logbook_field = 'id' if kind == LOGBOOK else 'logbook_id'
+        week_field = 'week_number' if kind == LOGBOOK else 'logbook__week_number'
+        for object_id, logbook_id, week_number, text in queryset.values_list(
+                'id', logbook_field, week_field, text_field)[:limit]:
+            results.append({
+                'kind': kind,
+                'object_id': object_id,
+                'logbook_id': logbook_id,
+                'week_number': week_number,
+                'snippet': text[:120],
+                'rank': 0,
+            })
+    return results[:limit]
@@ -0,0 +1,85 @@
+import re
+
+from django.conf import settings
+from django.core.exceptions import ImproperlyConfigured
+from django.db.backends.signals import connection_created
+from django.db.models.signals import post_save, post_delete
+from django.dispatch import receiver
+
+from . import document_cache, search
+from .counters import refresh_counters
+from .middleware import invalidate_student
+from .models import Student, Logbook, Entry, Week_operation
+
+
+@receiver([post_save, post_delete], sender=Entry)
+@receiver([post_save, post_delete], sender=Week_operation)
+def invalidate_logbook_documents(sender, instance, **kwargs):
+    document_cache.invalidate([instance.logbook_id])
+
+
+@receiver([post_save, post_delete], sender=Entry)
+@receiver([post_save, post_delete], sender=Week_operation)
+def refresh_logbook_counters(sender, instance, origin=None, **kwargs):
+    # nothing to count when the whole logbook or student is being deleted
+    if isinstance(origin, (Logbook, Student)):
+        return
+    refresh_counters(Logbook.objects.filter(id=instance.logbook_id))
+
+
+@receiver([post_save, post_delete], sender=Logbook)
+def invalidate_documents_of_logbook(sender, instance, **kwargs):
+    document_cache.invalidate([instance.id])
+
+
+@receiver(post_save, sender=Student)
+def invalidate_documents_of_student(sender, instance, **kwargs):
+    if document_cache.is_enabled():
+        document_cache.invalidate(instance.logbooks.values_list('id', flat=True))
+
+
+@receiver([post_save, post_delete], sender=Student)
+def invalidate_cached_student(sender, instance, **kwargs):
+    invalidate_student(instance.user_id)
+
+
+@receiver(post_save, sender=Entry)
+def index_entry(sender, instance, **kwargs):
+    search.index_object(search.ENTRY, instance)
+
+
+@receiver(post_save, sender=Week_operation)
+def index_week_operation(sender, instance, **kwargs):
+    search.index_object(search.OPERATION, instance)
+
+
+@receiver(post_save, sender=Logbook)
+def index_logbook(sender, instance, **kwargs):
+    search.index_object(search.LOGBOOK, instance)
+
+
+@receiver(post_delete, sender=Entry)
+@receiver(post_delete, sender=Week_operation)
+@receiver(post_delete, sender=Logbook)
+def remove_from_search_index(sender, instance, **kwargs):
+    kind = {Entry: search.ENTRY, Week_operation: search.OPERATION, Logbook: search.LOGBOOK}[sender]
+    search.remove_object(kind, instance.id)
+
+
+# PRAGMA takes no query parameters, so only these names and plain values
+# are put into the statement
+SQLITE_PRAGMAS = {'journal_mode', 'synchronous', 'busy_timeout', 'cache_size', 'mmap_size', 'temp_store'}
+PRAGMA_VALUE = re.compile(r'-?\w+')
+
+
+@receiver(connection_created)
+def configure_sqlite(sender, connection, **kwargs):
+    # other SQLite files opened by alias, like copy_sqlite_data's source,
+    # are left as they are
+    if connection.vendor != 'sqlite' or connection.alias not in ['default', *settings.LOGBOOK_DATABASE_REPLICAS]:
+        return
+    with connection.cursor() as cursor:
+        for name, value in settings.LOGBOOK_SQLITE_PRAGMAS.items():
+            if name not in SQLITE_PRAGMAS or not PRAGMA_VALUE.fullmatch(str(value)):
+                raise ImproperlyConfigured(f"Unsupported LOGBOOK_SQLITE_PRAGMAS entry: {name} = {value!r}")
+            cursor.execute(f"PRAGMA {name} = {value}")
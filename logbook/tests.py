@@ -1,7 +1,1313 @@
-from django.test import TestCase
+import os
+import subprocess
+import sys
+import tempfile
+import threading
+import zipfile
+from concurrent.futures import Future
+from datetime import date, timedelta
+from io import BytesIO, StringIO
+from unittest import skipUnless
+from unittest.mock import patch
 
-# Create your tests here.
-from views import get_week_entries
+from django.conf import settings
+from django.contrib.auth.models import User
+from django.core.cache import cache
+from django.core.exceptions import ImproperlyConfigured
+from django.core.files.uploadedfile import SimpleUploadedFile
+from django.core.management import call_command, CommandError
+from django.db import connection, connections, transaction, IntegrityError
+from django.db.backends.sqlite3.base import DatabaseWrapper as SQLiteDatabaseWrapper
+from django.test import Client, TestCase, override_settings
+from django.test.utils import CaptureQueriesContext
+from django.urls import reverse
+from django.utils import timezone
+from docx import Document
+from docx.oxml.ns import qn
+from PIL import Image, ImageFile
+from prometheus_client import REGISTRY
 
-w = get_week_entries(week_number=1)
-print(w)
\ No newline at end of file
+from docs import benchmark_create_document
+from docs.create_document import (
+    DAYS,
+    build_practical_training_log_book,
+    fill_practical_training_log_book,
+    render_practical_training_log_book,
+)
+
+from . import document_cache, instrumentation, jobs, loadtest, metrics, routers, search
+from .diagrams import print_rendition
+from .documents import logbooks_for_documents, logbook_document_inputs
+from .middleware import student_cache_key
+from .pagination import encode_cursor
+from .models import Student, Logbook, Entry, Week_operation, DocumentJob
+
+
+def create_student(username="student", registration_number="2021-04-02100"):
+    user = User.objects.create_user(username, f"{username}@udsm.ac.tz", "password")
+    return Student.objects.create(
+        user=user,
+        university="UDSM",
+        department_name="Computer Science",
+        registration_number=registration_number,
+        year_of_study=3,
+        pt_location="ABC Technologies",
+    )
+
+
+def create_week(student, week_number, updated_days=3, operations=3):
+    from_date = date(2024, 1, 1) + timedelta(weeks=week_number - 1)
+    logbook = Logbook.objects.create(
+        student=student,
+        week_number=week_number,
+        from_date=from_date,
+        to_date=from_date + timedelta(days=4),
+        week_activity="Waiting for entries",
+    )
+    for i in range(5):
+        day = from_date + timedelta(days=i)
+        Entry.objects.create(
+            logbook=logbook,
+            day=day.strftime('%A'),
+            date=day,
+            activity=f"Activity {i}",
+            is_updated=i < updated_days,
+        )
+    for i in range(operations):
+        Week_operation.objects.create(
+            logbook=logbook,
+            operation=f"Operation {i} " + "x" * 40,
+            machinery=f"Machinery {i}",
+        )
+    return logbook
+
+
+class LogbookCatalogViewTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+
+    def get_catalog_query_count(self):
+        # start without a cached request.student
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(reverse('logbook_catalog'))
+        self.assertEqual(response.status_code, 200)
+        return len(queries), response
+
+    def test_catalog_metadata(self):
+        create_week(self.student, 1, updated_days=3, operations=3)
+        create_week(self.student, 2, updated_days=5, operations=0)
+
+        _, response = self.get_catalog_query_count()
+        first, second = response.context['logbooks']
+
+        self.assertEqual(response.context['logbook_count'], 2)
+        self.assertEqual(first['entry_count'], 3)
+        self.assertEqual(first['percentage'], 60)
+        self.assertEqual(first['week_operation_count'], 3)
+        self.assertEqual(len(first['week_operations']), 2)
+        self.assertTrue(first['week_operations'][0].operation.endswith("..."))
+        self.assertEqual(second['entry_count'], 5)
+        self.assertEqual(second['percentage'], 100)
+        self.assertEqual(second['week_operation_count'], 0)
+        self.assertEqual(list(second['week_operations']), [])
+
+    def test_catalog_query_count_is_flat(self):
+        create_week(self.student, 1)
+        baseline, _ = self.get_catalog_query_count()
+
+        for week_number in range(2, 53):
+            create_week(self.student, week_number)
+        query_count, response = self.get_catalog_query_count()
+
+        self.assertEqual(response.context['logbook_count'], 52)
+        self.assertEqual(query_count, baseline)
+
+    @override_settings(LOGBOOK_CATALOG_PAGE_SIZE=4)
+    def test_load_more_pages_through_the_catalog(self):
+        for week_number in [3, 1, 5, 2, 4, 6]:
+            create_week(self.student, week_number)
+
+        response = self.client.get(reverse('logbook_catalog'))
+        weeks = [logbook['week_number'] for logbook in response.context['logbooks']]
+        self.assertEqual(weeks, [1, 2, 3, 4])
+        self.assertEqual(response.context['logbook_count'], 6)
+
+        cursor = response.context['next_cursor']
+        page = self.client.get(reverse('logbook_catalog_more'), {'cursor': cursor}).json()
+        self.assertIn("Logbook - Week 5", page['html'])
+        self.assertIn("Logbook - Week 6", page['html'])
+        self.assertNotIn("Logbook - Week 4", page['html'])
+        self.assertIsNone(page['next_cursor'])
+
+        response = self.client.get(reverse('logbook_catalog_more'), {'cursor': cursor, 'format': 'html'})
+        self.assertContains(response, "Logbook - Week 6")
+        self.assertNotIn('X-Next-Cursor', response)
+
+        # well formed cursors with values that do not fit the fields
+        for values in (["five", 1], [None, 1], [{"week": 5}, 1], [5, "1; DROP"]):
+            response = self.client.get(reverse('logbook_catalog_more'), {'cursor': encode_cursor(values)})
+            self.assertEqual(response.status_code, 400)
+
+
+@override_settings(LOGBOOK_DOCUMENT_CACHE_DIR=None)
+class GenerateLogbookViewTests(TestCase):
+    def setUp(self):
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+
+    def test_document_is_streamed_from_memory(self):
+        with patch('docs.create_document.create_practical_training_log_book') as save_to_disk:
+            response = self.client.get(reverse('logbook_generate', args=[self.logbook.id]))
+
+        self.assertEqual(response.status_code, 200)
+        self.assertFalse(save_to_disk.called)
+        content = b"".join(response.streaming_content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+        self.assertIn(
+            'attachment; filename="2021-04-02100-week-1-practical-training-logbook.docx"',
+            response['Content-Disposition'])
+
+        document = Document(BytesIO(content))
+        self.assertIn("WEEK NO: 1", [cell.text for cell in document.tables[1]._cells])
+
+    @override_settings(LOGBOOK_SAVE_GENERATED_DOCX=True)
+    def test_document_can_be_kept_on_disk(self):
+        with tempfile.TemporaryDirectory() as media_root:
+            with patch('docs.create_document.MEDIA_ROOT', media_root):
+                response = self.client.get(reverse('logbook_generate', args=[self.logbook.id]))
+                content = b"".join(response.streaming_content)
+                response.close()
+
+                saved = os.path.join(
+                    media_root, 'docs', '2021-04-02100-week-1-practical-training-logbook.docx')
+                with open(saved, 'rb') as file:
+                    self.assertEqual(file.read(), content)
+        self.assertEqual(int(response['Content-Length']), len(content))
+
+
+class DocumentCacheTests(TestCase):
+    def setUp(self):
+        cache_dir = tempfile.TemporaryDirectory()
+        self.addCleanup(cache_dir.cleanup)
+        self.cache_dir = cache_dir.name
+        settings_override = override_settings(LOGBOOK_DOCUMENT_CACHE_DIR=self.cache_dir)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+
+    def download(self):
+        with patch(
+            'docs.create_document.render_practical_training_log_book',
+            wraps=render_practical_training_log_book,
+        ) as render:
+            response = self.client.get(reverse('logbook_generate', args=[self.logbook.id]))
+            content = b"".join(response.streaming_content)
+            response.close()
+        self.assertEqual(int(response['Content-Length']), len(content))
+        return render.called, content
+
+    def test_unchanged_week_is_served_from_cache(self):
+        rendered, first = self.download()
+        self.assertTrue(rendered)
+        rendered, second = self.download()
+        self.assertFalse(rendered)
+        self.assertEqual(first, second)
+
+    def test_saves_invalidate_cached_documents(self):
+        self.download()
+        entry = self.logbook.entries.first()
+        entry.activity = "Changed activity"
+        entry.save()
+        self.assertFalse(os.path.exists(document_cache.logbook_dir(self.logbook.id)))
+        rendered, content = self.download()
+        self.assertTrue(rendered)
+        self.assertIn("Changed activity", [
+            cell.text for cell in Document(BytesIO(content)).tables[2]._cells])
+
+        self.download()
+        self.student.pt_location = "XYZ Industries"
+        self.student.save()
+        rendered, _ = self.download()
+        self.assertTrue(rendered)
+
+    def test_cache_is_scanned_only_when_it_may_be_full(self):
+        with patch.object(document_cache, 'evict', wraps=document_cache.evict) as evict, \
+                override_settings(LOGBOOK_DOCUMENT_CACHE_MAX_BYTES=1000):
+            for i in range(5):
+                document_cache.store(1, f"key{i}", b"x" * 150)
+            # the first store counts what is cached, the next ones add up
+            self.assertEqual(evict.call_count, 1)
+
+            document_cache.store(2, "full", b"x" * 300)
+            self.assertEqual(evict.call_count, 2)
+        self.assertIsNone(document_cache.get(1, "key0"))
+        self.assertIsNotNone(document_cache.get(2, "full"))
+
+    def test_missing_files_are_reported(self):
+        with patch('docs.create_document.render_practical_training_log_book', side_effect=FileNotFoundError):
+            response = self.client.get(reverse('logbook_generate', args=[self.logbook.id]))
+        self.assertContains(response, "Error generating logbook document", status_code=500)
+
+    def test_least_recently_used_documents_are_evicted(self):
+        for key, age in (("old", 300), ("recent", 100)):
+            path = document_cache.store(1, key, b"x" * 100)
+            used_at = os.path.getmtime(path) - age
+            os.utime(path, (used_at, used_at))
+
+        # reading the old document makes it the most recently used
+        document_cache.get(1, "old")
+        with override_settings(LOGBOOK_DOCUMENT_CACHE_MAX_BYTES=250):
+            document_cache.store(2, "new", b"x" * 100)
+
+        self.assertIsNotNone(document_cache.get(1, "old"))
+        self.assertIsNone(document_cache.get(1, "recent"))
+        self.assertIsNotNone(document_cache.get(2, "new"))
+
+
+@override_settings(LOGBOOK_DOCUMENT_CACHE_DIR=None)
+class ExportLogbooksTests(TestCase):
+    def setUp(self):
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+
+    def export(self, **params):
+        response = self.client.get(reverse('logbook_export'), params)
+        self.assertEqual(response.status_code, 200)
+        return response, b"".join(response.streaming_content)
+
+    def test_merged_document_contains_every_week(self):
+        for week_number in range(1, 4):
+            create_week(self.student, week_number)
+
+        response, content = self.export(format='docx')
+
+        self.assertIn('2021-04-02100-practical-training-logbook.docx', response['Content-Disposition'])
+        cells = [cell.text for table in Document(BytesIO(content)).tables for cell in table._cells]
+        for week_number in range(1, 4):
+            self.assertIn(f"WEEK NO: {week_number}", cells)
+
+    def test_zip_export_loads_data_in_bounded_queries(self):
+        create_week(self.student, 1)
+        cache.clear()
+        with CaptureQueriesContext(connection) as baseline:
+            self.export(format='zip')
+
+        for week_number in range(2, 11):
+            create_week(self.student, week_number)
+        cache.clear()
+        with CaptureQueriesContext(connection) as queries:
+            response, content = self.export(format='zip')
+
+        self.assertEqual(len(queries), len(baseline))
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(
+                archive.namelist(),
+                [f"2021-04-02100-week-{week}-practical-training-logbook.docx" for week in range(1, 11)])
+
+    def test_department_export_is_staff_only(self):
+        create_week(self.student, 1)
+        other = create_student("other", "2021-04-02200")
+        create_week(other, 1)
+
+        response = self.client.get(reverse('logbook_export'), {'department': "Computer Science"})
+        self.assertEqual(response.status_code, 403)
+
+        self.student.user.is_staff = True
+        self.student.user.save()
+        _, content = self.export(department="Computer Science", format='zip')
+        with zipfile.ZipFile(BytesIO(content)) as archive:
+            self.assertEqual(len(archive.namelist()), 2)
+
+    def test_export_command(self):
+        create_week(self.student, 1)
+        create_week(self.student, 2)
+        with tempfile.TemporaryDirectory() as directory:
+            output = os.path.join(directory, "export.zip")
+            call_command(
+                'export_logbooks', student="2021-04-02100", output=output, stdout=StringIO())
+            with zipfile.ZipFile(output) as archive:
+                self.assertEqual(len(archive.namelist()), 2)
+
+
+class DocumentJobTests(TestCase):
+    def setUp(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        settings_override = override_settings(
+            LOGBOOK_DOCUMENT_CACHE_DIR=os.path.join(directory.name, 'docs'),
+            LOGBOOK_DOCUMENT_JOB_DIR=os.path.join(directory.name, 'jobs'),
+            LOGBOOK_DOCUMENT_JOBS_PER_STUDENT=2,
+        )
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+
+    def enqueue(self, logbook):
+        return self.client.post(reverse('logbook_document_enqueue', args=[logbook.id]))
+
+    def test_repeated_print_reuses_the_queued_job(self):
+        first = self.enqueue(self.logbook)
+        second = self.enqueue(self.logbook)
+
+        self.assertEqual(first.status_code, 202)
+        self.assertEqual(first.json()['id'], second.json()['id'])
+        self.assertEqual(first.json()['status'], DocumentJob.PENDING)
+        self.assertEqual(DocumentJob.objects.count(), 1)
+
+    def test_queued_jobs_per_student_are_limited(self):
+        self.enqueue(self.logbook)
+        self.enqueue(create_week(self.student, 2))
+
+        response = self.enqueue(create_week(self.student, 3))
+        self.assertEqual(response.status_code, 429)
+
+    def test_worker_renders_queued_documents(self):
+        status_url = self.enqueue(self.logbook).json()['status_url']
+        self.assertEqual(self.client.get(status_url).json()['status'], DocumentJob.PENDING)
+
+        call_command('run_document_worker', processes=1, once=True)
+
+        job = self.client.get(status_url).json()
+        self.assertEqual(job['status'], DocumentJob.DONE)
+        response = self.client.get(job['download_url'])
+        content = b"".join(response.streaming_content)
+        response.close()
+        self.assertEqual(int(response['Content-Length']), len(content))
+        self.assertIn("WEEK NO: 1", [
+            cell.text for cell in Document(BytesIO(content)).tables[1]._cells])
+
+        # the rendered document was added to the document cache
+        cached = os.listdir(document_cache.logbook_dir(self.logbook.id))
+        self.assertEqual(len(cached), 1)
+
+    def test_jobs_left_running_by_a_dead_worker_are_failed(self):
+        stuck = DocumentJob.objects.create(
+            logbook=self.logbook, status=DocumentJob.RUNNING,
+            started_at=timezone.now() - timedelta(hours=1))
+
+        # Print queues a new job instead of reusing the stuck one
+        job_id = self.enqueue(self.logbook).json()['id']
+        self.assertNotEqual(job_id, stuck.id)
+        stuck.refresh_from_db()
+        self.assertEqual(stuck.status, DocumentJob.FAILED)
+
+    def test_failed_jobs_are_not_finished_late(self):
+        job = DocumentJob.objects.create(
+            logbook=self.logbook, status=DocumentJob.RUNNING,
+            started_at=timezone.now() - timedelta(hours=1))
+        jobs.fail_stale_jobs()
+
+        # the worker was only slow, and its document arrives after all
+        future = Future()
+        future.set_result(None)
+        with patch.object(document_cache, 'store') as store:
+            jobs.finish_job(job, future, cache_key="key")
+        store.assert_not_called()
+        job.refresh_from_db()
+        self.assertEqual(job.status, DocumentJob.FAILED)
+
+    def test_a_logbook_has_one_active_job(self):
+        first = DocumentJob.objects.create(logbook=self.logbook)
+        # what a concurrent Print that missed first would run into
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            DocumentJob.objects.create(logbook=self.logbook, status=DocumentJob.RUNNING)
+        self.assertEqual(jobs.enqueue(self.logbook), first)
+
+        first.status = DocumentJob.DONE
+        first.save()
+        self.assertNotEqual(jobs.enqueue(self.logbook), first)
+
+    def test_jobs_of_other_students_are_hidden(self):
+        job_id = self.enqueue(self.logbook).json()['id']
+        self.client.force_login(create_student("other", "2021-04-02200").user)
+
+        response = self.client.get(reverse('document_job_status', args=[job_id]))
+        self.assertEqual(response.status_code, 404)
+
+
+class DocumentTemplateTests(TestCase):
+    def document_inputs(self, operations):
+        return {
+            'department': "Computer Science",
+            'student_name': "Doe, John",
+            'reg_no': "2021-04-02100",
+            'company': "ABC Technologies",
+            'week_no': 4,
+            'from_date': date(2024, 1, 22),
+            'to_date': date(2024, 1, 26),
+            'data_dictionary': {
+                day: {'date': date(2024, 1, 22 + i), 'activity': f"{day} work\nsecond line <<REG_NO>>"}
+                for i, day in enumerate(DAYS)
+            },
+            'operations': operations,
+            'activity_diagram': None,
+        }
+
+    def document_text(self, doc):
+        paragraphs = [paragraph.text for paragraph in doc.paragraphs]
+        cells = [[cell.text for cell in row.cells] for table in doc.tables for row in table.rows]
+        return paragraphs, cells
+
+    def test_template_matches_built_document(self):
+        operations_cases = [
+            [],
+            [{'operation': "Cabling", 'machinery': "Crimper"}],
+            [{'operation': f"Operation {i}\nstep", 'machinery': "Drill"} for i in range(4)],
+            # placeholder-like text typed by the student is kept as typed
+            [{'operation': "Use <<TORQUE>> spec, see <<REG_NO>>", 'machinery': "<<MACHINERY>> wrench"}],
+        ]
+        for operations in operations_cases:
+            inputs = self.document_inputs(operations)
+            built = build_practical_training_log_book(**inputs)
+            filled = fill_practical_training_log_book(**inputs)
+            self.assertEqual(self.document_text(filled), self.document_text(built))
+
+    def test_every_bordered_cell_has_one_border_definition(self):
+        doc = build_practical_training_log_book(**self.document_inputs(
+            [{'operation': "Cabling", 'machinery': "Crimper"}]))
+        student_table, *bordered_tables = doc.tables
+
+        self.assertIsNone(student_table._tbl.tblPr.find(qn('w:tblBorders')))
+        for table in bordered_tables:
+            table_borders = table._tbl.tblPr.findall(qn('w:tblBorders'))
+            for tc in table._tbl.iter(qn('w:tc')):
+                cell_borders = tc.findall(f"{qn('w:tcPr')}/{qn('w:tcBorders')}")
+                self.assertEqual(len(table_borders) + len(cell_borders), 1)
+
+
+
+class ActivityDiagramTests(TestCase):
+    def setUp(self):
+        media_root = tempfile.TemporaryDirectory()
+        self.addCleanup(media_root.cleanup)
+        settings_override = override_settings(
+            MEDIA_ROOT=media_root.name, LOGBOOK_DOCUMENT_CACHE_DIR=None)
+        settings_override.enable()
+        self.addCleanup(settings_override.disable)
+
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+
+    def upload(self, name, image, image_format, **save_options):
+        content = BytesIO()
+        image.save(content, image_format, **save_options)
+        return self.client.post(
+            reverse('diagram_update', args=[self.logbook.id]),
+            {'diagram': SimpleUploadedFile(name, content.getvalue())})
+
+    def test_photo_is_rotated_downscaled_and_recompressed(self):
+        exif = Image.Exif()
+        exif[0x0112] = 6  # orientation: rotate 90 degrees clockwise
+        photo = Image.effect_noise((3000, 2000), 64).convert('RGB')
+        response = self.upload("photo.jpg", photo, 'JPEG', quality=98, exif=exif)
+        self.assertEqual(response.status_code, 302)
+
+        self.logbook.refresh_from_db()
+        original_size = self.logbook.activity_diagram.size
+        with Image.open(self.logbook.activity_diagram_print.path) as rendition:
+            self.assertEqual(rendition.format, 'JPEG')
+            self.assertEqual(rendition.size, (1200, 1800))
+        self.assertLess(self.logbook.activity_diagram_print.size, original_size / 2)
+
+        inputs = logbook_document_inputs(logbooks_for_documents(Logbook.objects).get(id=self.logbook.id))
+        self.assertEqual(inputs['activity_diagram'], self.logbook.activity_diagram_print.path)
+
+    def test_large_photo_is_decoded_reduced(self):
+        content = BytesIO()
+        Image.effect_noise((4000, 3000), 64).convert('RGB').save(content, 'JPEG')
+
+        decoded = []
+        load = ImageFile.ImageFile.load
+
+        def record_load(image):
+            decoded.append(image.size)
+            return load(image)
+
+        with patch.object(ImageFile.ImageFile, 'load', autospec=True, side_effect=record_load):
+            rendition = print_rendition(SimpleUploadedFile("photo.jpg", content.getvalue()))
+        # JPEG decodes at half size, never the full 4000 x 3000
+        self.assertEqual(decoded[0], (2000, 1500))
+        with Image.open(rendition) as image:
+            self.assertEqual(image.size, (1200, 900))
+
+    def test_small_drawing_stays_png(self):
+        self.upload("drawing.png", Image.new('RGBA', (400, 300), 'white'), 'PNG')
+
+        self.logbook.refresh_from_db()
+        with Image.open(self.logbook.activity_diagram_print.path) as rendition:
+            self.assertEqual(rendition.format, 'PNG')
+            self.assertEqual(rendition.size, (400, 300))
+
+    def test_non_image_upload_is_rejected(self):
+        response = self.client.post(
+            reverse('diagram_update', args=[self.logbook.id]),
+            {'diagram': SimpleUploadedFile("diagram.png", b"not an image")})
+
+        self.assertEqual(response.status_code, 200)
+        self.assertContains(response, "The diagram must be a PNG or JPEG image.")
+        self.logbook.refresh_from_db()
+        self.assertFalse(self.logbook.activity_diagram_print)
+
+
+class LookupIndexTests(TestCase):
+    def setUp(self):
+        self.student = create_student()
+        self.logbook = create_week(self.student, 1)
+        if connection.vendor == 'postgresql':
+            # tiny test tables are cheaper to scan, make the planner show the index
+            with connection.cursor() as cursor:
+                cursor.execute("SET enable_seqscan = off")
+        elif connection.vendor != 'sqlite':
+            self.skipTest("EXPLAIN output is only checked on SQLite and PostgreSQL")
+
+    def assertUsesIndex(self, queryset, columns):
+        plan = queryset.explain()
+        if connection.vendor == 'sqlite':
+            self.assertRegex(plan, r"SEARCH \S+ USING (COVERING )?INDEX")
+            for column in columns:
+                self.assertIn(f"{column}=?", plan)
+        else:
+            self.assertIn("Index", plan)
+            self.assertNotIn("Seq Scan", plan)
+            for column in columns:
+                self.assertIn(column, plan)
+
+    def test_entry_lookups_use_composite_indexes(self):
+        entries = Entry.objects.filter(logbook=self.logbook)
+        self.assertUsesIndex(entries.filter(day="Monday"), ['logbook_id', 'day'])
+        self.assertUsesIndex(entries.filter(date=self.logbook.from_date), ['logbook_id', 'date'])
+        self.assertUsesIndex(entries.filter(is_updated=True), ['logbook_id', 'is_updated'])
+
+    def test_logbook_week_lookup_uses_unique_index(self):
+        logbooks = Logbook.objects.filter(student=self.student, week_number=1)
+        self.assertUsesIndex(logbooks, ['student_id', 'week_number'])
+
+    def test_one_entry_per_date_and_logbook_per_week(self):
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            Entry.objects.create(
+                logbook=self.logbook, day="Monday", date=self.logbook.from_date, activity="")
+        with self.assertRaises(IntegrityError), transaction.atomic():
+            create_week(self.student, 1)
+
+
+class BatchEntriesTests(TestCase):
+    def setUp(self):
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+        self.logbook.entries.all().delete()
+
+    def test_entries_are_created_once(self):
+        url = reverse('entry_batch_create', args=[self.logbook.id])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.post(url)
+        self.assertRedirects(response, f"/logbook/catalog/{self.logbook.id}", fetch_redirect_response=False)
+        inserts = [q for q in queries if q['sql'].startswith('INSERT') and '"logbook_entry"' in q['sql']]
+        self.assertEqual(len(inserts), 1)
+
+        self.client.post(url)
+        days = list(self.logbook.entries.order_by('date').values_list('day', flat=True))
+        self.assertEqual(days, DAYS)
+
+    def test_week_range_creates_missing_weeks(self):
+        create_week(self.student, 3, updated_days=5)
+
+        response = self.client.post(
+            reverse('entry_batch_create', args=[self.logbook.id]), {'to_week': 4})
+        self.assertRedirects(response, "/logbook/catalog", fetch_redirect_response=False)
+
+        logbooks = Logbook.objects.filter(student=self.student).order_by('week_number')
+        self.assertEqual([logbook.week_number for logbook in logbooks], [1, 2, 3, 4])
+        self.assertEqual(logbooks[3].from_date, self.logbook.from_date + timedelta(weeks=3))
+        for logbook in logbooks:
+            self.assertEqual(logbook.entries.count(), 5)
+        # existing entries are left alone
+        self.assertEqual(logbooks[2].entries.filter(is_updated=True).count(), 5)
+
+    def test_weeks_are_indexed_and_counted_once(self):
+        url = reverse('entry_batch_create', args=[self.logbook.id])
+        created = REGISTRY.get_sample_value('logbook_logbooks_created_total', {'source': 'batch'}) or 0
+        self.client.post(url, {'to_week': 3})
+        self.client.post(url, {'to_week': 3})
+
+        self.assertEqual(
+            REGISTRY.get_sample_value('logbook_logbooks_created_total', {'source': 'batch'}), created + 2)
+        week_3 = Logbook.objects.get(student=self.student, week_number=3)
+        self.assertIn(week_3.id, search.matching_ids("waiting", search.LOGBOOK))
+
+    def test_only_own_logbooks_and_form_posts_create_weeks(self):
+        url = reverse('entry_batch_create', args=[self.logbook.id])
+        # a link cannot scaffold a range
+        self.client.get(url, {'to_week': 4})
+        self.assertEqual(Logbook.objects.filter(student=self.student).count(), 1)
+
+        self.client.force_login(create_student("other", "2021-04-02200").user)
+        self.assertEqual(self.client.post(url, {'to_week': 4}).status_code, 404)
+        self.assertEqual(Logbook.objects.count(), 1)
+
+    def test_invalid_week_range(self):
+        url = reverse('entry_batch_create', args=[self.logbook.id])
+        self.assertEqual(self.client.post(url, {'to_week': 'x'}).status_code, 400)
+        with override_settings(LOGBOOK_MAX_BATCH_WEEKS=10):
+            self.assertEqual(self.client.post(url, {'to_week': 11}).status_code, 400)
+        self.assertFalse(Entry.objects.exists())
+
+
+class LogbookCounterTests(TestCase):
+    def setUp(self):
+        self.student = create_student()
+        self.logbook = create_week(self.student, 1, updated_days=2, operations=1)
+
+    def assertCounters(self, entries, updated_entries, operations, percentage):
+        self.logbook.refresh_from_db()
+        self.assertEqual(
+            (self.logbook.entry_count, self.logbook.updated_entry_count,
+             self.logbook.operation_count, self.logbook.completion_percentage),
+            (entries, updated_entries, operations, percentage))
+
+    def test_counters_follow_entries_and_operations(self):
+        self.assertCounters(5, 2, 1, 40)
+
+        entry = self.logbook.entries.filter(is_updated=False).first()
+        entry.is_updated = True
+        entry.save()
+        self.assertCounters(5, 3, 1, 60)
+
+        entry.delete()
+        self.logbook.week_operations.all().delete()
+        self.assertCounters(4, 2, 0, 40)
+
+    def test_counter_update_rolls_back_with_the_save(self):
+        entry = self.logbook.entries.filter(is_updated=False).first()
+        entry.is_updated = True
+        with patch('logbook.signals.refresh_counters', side_effect=RuntimeError):
+            with self.assertRaises(RuntimeError):
+                entry.save()
+        entry.refresh_from_db()
+        self.assertFalse(entry.is_updated)
+        self.assertCounters(5, 2, 1, 40)
+
+    def test_saving_a_stale_logbook_keeps_the_counters(self):
+        stale = Logbook.objects.get(id=self.logbook.id)
+        version = stale.version
+        entry = self.logbook.entries.filter(is_updated=False).first()
+        entry.is_updated = True
+        entry.save()
+
+        stale.week_activity = "Configured the routers"
+        stale.save()
+        self.assertEqual(stale.version, version + 2)
+        self.assertCounters(5, 3, 1, 60)
+        self.assertEqual(self.logbook.week_activity, "Configured the routers")
+
+    def test_repair_command(self):
+        Logbook.objects.update(entry_count=0, updated_entry_count=0, completion_percentage=0)
+        out = StringIO()
+        call_command('repair_logbook_counters', batch_size=1, stdout=out)
+        self.assertIn("Recounted 1 logbooks", out.getvalue())
+        self.assertCounters(5, 2, 1, 40)
+
+
+class WeekEntriesTests(TestCase):
+    def setUp(self):
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+        create_week(self.student, 2)
+
+    def test_week_entries_in_one_query(self):
+        url = reverse('get_week_entries', args=[1])
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual([entry['day'] for entry in response.json()], DAYS)
+        self.assertEqual(response.json()[0]['activity'], "Activity 0")
+        logbook_queries = [q for q in queries if '"logbook_' in q['sql']]
+        self.assertEqual(len(logbook_queries), 1)
+
+    def test_conditional_get(self):
+        url = reverse('get_week_entries', args=[1])
+        response = self.client.get(url)
+        etag = response['ETag']
+
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 304)
+
+        entry = self.logbook.entries.first()
+        entry.activity = "Changed"
+        entry.save()
+        response = self.client.get(url, HTTP_IF_NONE_MATCH=etag)
+        self.assertEqual(response.status_code, 200)
+        self.assertNotEqual(response['ETag'], etag)
+
+    def test_multiple_weeks(self):
+        response = self.client.get(reverse('get_weeks_entries'), {'weeks': '1,2'})
+        self.assertEqual(set(response.json()), {'1', '2'})
+        self.assertEqual(len(response.json()['2']), 5)
+
+        response = self.client.get(reverse('get_weeks_entries'), {'weeks': '1,3'})
+        self.assertEqual(response.json()['3'], [])
+        response = self.client.get(reverse('get_week_entries', args=[3]))
+        self.assertEqual(response.status_code, 404)
+
+
+def use_shared_cache(test_case):
+    """
+    Switches the test to a file cache, which the student cache needs.
+    """
+    directory = tempfile.TemporaryDirectory()
+    test_case.addCleanup(directory.cleanup)
+    settings_override = override_settings(CACHES={'default': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': directory.name,
+    }})
+    settings_override.enable()
+    test_case.addCleanup(settings_override.disable)
+
+
+class StudentMiddlewareTests(TestCase):
+    def setUp(self):
+        use_shared_cache(self)
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+
+    def student_queries(self, url):
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(url)
+        return response, [q for q in queries if 'FROM "logbook_student"' in q['sql']]
+
+    def test_student_is_cached_between_requests(self):
+        _, queries = self.student_queries(reverse('logbook_catalog'))
+        self.assertEqual(len(queries), 1)
+
+        response, queries = self.student_queries(reverse('logbook_catalog'))
+        self.assertEqual(len(queries), 0)
+        self.assertEqual(response.status_code, 200)
+
+        # the user and its password hash are not cached
+        cached = cache.get(student_cache_key(self.student.user_id))
+        self.assertNotIn('user', cached._state.fields_cache)
+
+    def test_per_process_cache_is_not_used(self):
+        with override_settings(CACHES={'default': {
+                'BACKEND': 'django.core.cache.backends.locmem.LocMemCache'}}):
+            for _ in range(2):
+                _, queries = self.student_queries(reverse('logbook_catalog'))
+                self.assertEqual(len(queries), 1)
+
+    def test_profile_save_invalidates_cache(self):
+        self.client.get(reverse('logbook_settings'))
+        self.client.post(reverse('logbook_settings'), {
+            'first_name': "Asha", 'last_name': "Juma", 'email': "asha@udsm.ac.tz",
+            'username': "student", 'reg_number': "2021-04-09999", 'year_of_study': 4,
+            'dept_name': "Computer Science", 'company_name': "XYZ Labs",
+        })
+        response = self.client.get(reverse('logbook_settings'))
+        self.assertEqual(response.context['student'].registration_number, "2021-04-09999")
+        self.assertEqual(response.context['student'].user.first_name, "Asha")
+
+    def test_user_without_profile(self):
+        user = User.objects.create_user("new", "new@udsm.ac.tz", "password")
+        self.client.force_login(user)
+        response = self.client.get(reverse('logbook_catalog'))
+        self.assertRedirects(response, "/logbook/logbook_settings", fetch_redirect_response=False)
+
+        # the profile counts as soon as it exists, even in other workers
+        Student.objects.bulk_create([Student(
+            user=user, university="UDSM", department_name="Computer Science",
+            registration_number="2021-04-02300", year_of_study=3, pt_location="Dar es Salaam")])
+        self.assertEqual(self.client.get(reverse('logbook_catalog')).status_code, 200)
+
+
+class SearchTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1, operations=0)
+        if not search.is_supported():
+            self.skipTest("Full-text search needs SQLite or PostgreSQL")
+
+    def update_entry(self, activity):
+        entry = self.logbook.entries.first()
+        entry.activity = activity
+        entry.save()
+        return entry
+
+    def test_index_follows_saves_and_deletes(self):
+        entry = self.update_entry("Configured the router firewall rules")
+        results = search.search("firewall", student=self.student)
+        self.assertEqual([(r['kind'], r['object_id']) for r in results], [(search.ENTRY, entry.id)])
+        self.assertEqual(results[0]['week_number'], 1)
+        self.assertIn("[firewall]", results[0]['snippet'])
+
+        self.update_entry("Crimped network cables")
+        self.assertEqual(search.search("firewall"), [])
+        with connection.cursor() as cursor:
+            cursor.execute("SELECT count(*) FROM logbook_search WHERE rowid = %s",
+                           [search.row_key(search.ENTRY, entry.id)])
+            self.assertEqual(cursor.fetchone(), (1,))
+        # stemmed, prefix matched
+        self.assertEqual(len(search.search("crimping netw")), 1)
+
+        entry.delete()
+        self.assertEqual(search.search("crimped"), [])
+
+    def test_results_are_ranked_and_scoped_to_the_student(self):
+        Week_operation.objects.create(logbook=self.logbook, operation="Server setup", machinery="Rack server")
+        self.update_entry("Server server server maintenance")
+        other = create_student("other", "2021-04-02101")
+        other_logbook = create_week(other, 1)
+        Week_operation.objects.create(logbook=other_logbook, operation="Server room", machinery="")
+
+        results = search.search("server", student=self.student)
+        self.assertEqual([r['kind'] for r in results], [search.ENTRY, search.OPERATION])
+        self.assertEqual(len(search.search("server")), 3)
+
+    def test_search_view_and_rebuild(self):
+        self.update_entry("Soldered the sensor board")
+        with connection.cursor() as cursor:
+            cursor.execute("DELETE FROM logbook_search")
+
+        out = StringIO()
+        call_command('rebuild_search_index', stdout=out)
+        # the week activity and the five entries
+        self.assertIn("Indexed 6 texts", out.getvalue())
+
+        response = self.client.get(reverse('logbook_search'), {'q': 'sensor', 'format': 'json'})
+        result, = response.json()['results']
+        self.assertEqual(result['url'], reverse('entry_update', args=[self.logbook.id, result['object_id']]))
+        self.assertEqual(self.client.get(reverse('logbook_search'), {'q': 'sensor'}).status_code, 200)
+
+    def test_staff_results_open_in_the_admin(self):
+        entry = self.update_entry("Soldered the sensor board")
+        staff = User.objects.create_user("coordinator", "coordinator@udsm.ac.tz", "password", is_staff=True)
+        self.client.force_login(staff)
+
+        response = self.client.get(reverse('logbook_search'), {'q': 'sensor', 'format': 'json'})
+        result, = response.json()['results']
+        self.assertEqual(result['url'], reverse('admin:logbook_entry_change', args=[entry.id]))
+
+
+class DepartmentDashboardTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.staff = User.objects.create_user("coordinator", "coordinator@udsm.ac.tz", "password", is_staff=True)
+        self.client.force_login(self.staff)
+
+    def test_progress_is_aggregated_per_student(self):
+        student = create_student()
+        create_week(student, 1, updated_days=5)
+        create_week(student, 2, updated_days=2)
+        create_student("idle", "2021-04-02101")
+
+        response = self.client.get(reverse('department_dashboard'), {'format': 'json'})
+        data = response.json()
+        self.assertEqual(data['summary'], {'logbooks': 2, 'completion': 70, 'students': 2})
+        first, second = data['students']
+        self.assertEqual((first['weeks'], first['updated_entries'], first['completion']), (2, 7, 70))
+        self.assertIsNotNone(first['last_activity'])
+        self.assertEqual((second['weeks'], second['completion'], second['last_activity']), (0, 0, None))
+        self.assertContains(self.client.get(reverse('department_dashboard')), "2021-04-02100")
+
+    @override_settings(LOGBOOK_DASHBOARD_PAGE_SIZE=2)
+    def test_keyset_pages(self):
+        for i in range(5):
+            create_student(f"student{i}", f"2021-04-0210{4 - i}")
+
+        registration_numbers = []
+        cursor = ''
+        with CaptureQueriesContext(connection) as queries:
+            while True:
+                data = self.client.get(
+                    reverse('department_dashboard'), {'format': 'json', 'cursor': cursor}).json()
+                registration_numbers += [s['registration_number'] for s in data['students']]
+                cursor = data['next_cursor']
+                if not cursor:
+                    break
+        self.assertEqual(registration_numbers, sorted(registration_numbers))
+        self.assertEqual(len(registration_numbers), 5)
+        self.assertFalse(any('OFFSET' in q['sql'] for q in queries))
+
+        response = self.client.get(reverse('department_dashboard'), {'cursor': 'nonsense'})
+        self.assertEqual(response.status_code, 400)
+
+    def test_staff_only(self):
+        student = create_student()
+        self.client.force_login(student.user)
+        self.assertEqual(self.client.get(reverse('department_dashboard')).status_code, 403)
+
+
+class FragmentCacheTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student()
+        self.client.force_login(self.student.user)
+        self.logbook = create_week(self.student, 1)
+
+    def test_fragments_are_reused_until_the_logbook_changes(self):
+        detail_url = reverse('logbook_detail', args=[self.logbook.id])
+        self.client.get(reverse('logbook_catalog'))
+        self.client.get(detail_url)
+
+        # cached fragments do not query the entries again
+        with CaptureQueriesContext(connection) as queries:
+            response = self.client.get(detail_url)
+        self.assertContains(response, "Activity 4")
+        self.assertFalse(any('FROM "logbook_entry"' in q['sql'] for q in queries))
+
+        entry = self.logbook.entries.get(activity="Activity 4")
+        entry.activity = "Calibrated the sensors"
+        entry.save()
+        self.assertContains(self.client.get(detail_url), "Calibrated the sensors")
+
+        self.assertContains(self.client.get(reverse('logbook_catalog')), "(3/5)")
+
+        entry = self.logbook.entries.filter(is_updated=False).first()
+        entry.is_updated = True
+        entry.save()
+        self.assertContains(self.client.get(reverse('logbook_catalog')), "(4/5)")
+
+
+class CopySqliteDataTests(TestCase):
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.source = os.path.join(self.directory.name, 'source.sqlite3')
+
+        # a migrated SQLite database with one student's week
+        connections['copy_source'] = SQLiteDatabaseWrapper(
+            {**connections['default'].settings_dict, 'NAME': self.source}, 'copy_source')
+        self.addCleanup(connections.__delitem__, 'copy_source')
+        self.addCleanup(connections['copy_source'].close)
+        call_command('migrate', database='copy_source', verbosity=0)
+
+        user = User(id=40, username="copied", first_name="Neema", last_name="Ally")
+        User.objects.using('copy_source').bulk_create([user])
+        Student.objects.using('copy_source').bulk_create([Student(
+            id=41, user_id=40, university="UDSM", department_name="Computer Science",
+            registration_number="2021-04-02999", year_of_study=3, pt_location="ABC")])
+        Logbook.objects.using('copy_source').bulk_create([Logbook(
+            id=42, student_id=41, week_number=1, from_date=date(2024, 1, 1),
+            to_date=date(2024, 1, 5), week_activity="Network audit", entry_count=1)])
+        Entry.objects.using('copy_source').bulk_create([Entry(
+            id=43, logbook_id=42, day="Monday", date=date(2024, 1, 1), activity="Mapped the switches")])
+
+    def test_rows_are_copied_with_their_ids(self):
+        out = StringIO()
+        call_command('copy_sqlite_data', source=self.source, stdout=out)
+        self.assertIn("logbook.Entry: 1", out.getvalue())
+
+        entry = Entry.objects.select_related('logbook__student__user').get(id=43)
+        self.assertEqual(entry.logbook.student.user.first_name, "Neema")
+        self.assertEqual(entry.logbook.entry_count, 1)
+        # sequences continue after the copied ids, and the copy is searchable
+        self.assertGreater(create_student().id, 41)
+        if search.is_supported():
+            self.assertEqual(search.search("switches")[0]['object_id'], 43)
+
+    def test_pragmas_apply_to_the_apps_databases_only(self):
+        with connections['copy_source'].cursor() as cursor:
+            cursor.execute("PRAGMA journal_mode")
+            self.assertEqual(cursor.fetchone()[0], 'delete')
+
+        database = SQLiteDatabaseWrapper(
+            {**connections['default'].settings_dict, 'NAME': self.source}, 'default')
+        self.addCleanup(database.close)
+        with override_settings(LOGBOOK_SQLITE_PRAGMAS={'journal_mode = WAL; PRAGMA synchronous': 'OFF'}):
+            with self.assertRaises(ImproperlyConfigured):
+                database.ensure_connection()
+
+    def test_refuses_to_overwrite_data(self):
+        create_student()
+        with self.assertRaises(CommandError):
+            call_command('copy_sqlite_data', source=self.source, stdout=StringIO())
+        self.assertFalse(Entry.objects.exists())
+
+
+@skipUnless(connection.vendor == 'sqlite', "SQLite pragmas")
+class SQLiteConcurrencyTests(TestCase):
+    """
+    Entry updates from several threads, each with its own connection to a
+    file database, the way a threaded server writes.
+    """
+    threads = 8
+    updates = 10
+
+    def setUp(self):
+        self.directory = tempfile.TemporaryDirectory()
+        self.addCleanup(self.directory.cleanup)
+        self.database = os.path.join(self.directory.name, 'concurrency.sqlite3')
+        self.settings_dict = connection.settings_dict
+        cache.clear()
+        thread, errors = self.run_in_thread(self.create_data)
+        thread.join()
+        self.assertEqual(errors, [])
+
+    def run_in_thread(self, function, *args):
+        errors = []
+
+        def target():
+            # connections are per thread, point this thread's default at the file
+            connections['default'] = SQLiteDatabaseWrapper(
+                {**self.settings_dict, 'NAME': self.database}, 'default')
+            try:
+                function(*args)
+            except Exception as error:
+                errors.append(error)
+            finally:
+                connections['default'].close()
+
+        thread = threading.Thread(target=target)
+        thread.start()
+        return thread, errors
+
+    def create_data(self):
+        call_command('migrate', verbosity=0)
+        student = create_student()
+        self.logbook_id = create_week(student, 1, updated_days=0).id
+        self.user_id = student.user_id
+
+    def update_entries(self, worker):
+        client = Client()
+        client.force_login(User.objects.get(id=self.user_id))
+        entries = list(Entry.objects.filter(logbook_id=self.logbook_id).order_by('date'))
+        for i in range(self.updates):
+            entry = entries[(worker + i) % len(entries)]
+            response = client.post(
+                reverse('entry_update', args=[self.logbook_id, entry.id]),
+                {'date_input': entry.date.isoformat(), 'activity_summary': f"worker {worker} update {i}"})
+            assert response.status_code == 302, response.status_code
+
+    def test_concurrent_entry_updates(self):
+        workers = [self.run_in_thread(self.update_entries, worker) for worker in range(self.threads)]
+        for thread, _ in workers:
+            thread.join()
+        self.assertEqual([error for _, errors in workers for error in errors], [])
+
+        def check():
+            logbook = Logbook.objects.get(id=self.logbook_id)
+            self.assertEqual(logbook.updated_entry_count, 5)
+            with connection.cursor() as cursor:
+                cursor.execute("PRAGMA journal_mode")
+                self.assertEqual(cursor.fetchone()[0], 'wal')
+        thread, errors = self.run_in_thread(check)
+        thread.join()
+        self.assertEqual(errors, [])
+
+
+@override_settings(LOGBOOK_DATABASE_REPLICAS=['default'])
+class ReplicaRouterTests(TestCase):
+    def setUp(self):
+        cache.clear()
+        self.student = create_student()
+        self.logbook = create_week(self.student, 1)
+        self.client.force_login(self.student.user)
+
+    def replica_reads(self, url):
+        # the replica alias is the primary here, count how often it is chosen
+        with patch.object(routers, 'choose_replica', wraps=routers.choose_replica) as choose:
+            response = self.client.get(url)
+        self.assertEqual(response.status_code, 200)
+        return choose.call_count
+
+    def test_read_views_use_replicas(self):
+        self.assertGreater(self.replica_reads(reverse('logbook_catalog')), 0)
+        self.assertGreater(self.replica_reads(reverse('logbook_detail', args=[self.logbook.id])), 0)
+        self.assertEqual(self.replica_reads(reverse('operations_list', args=[self.logbook.id])), 0)
+
+    def test_reads_stick_to_primary_after_a_write(self):
+        entry = self.logbook.entries.first()
+        response = self.client.post(
+            reverse('entry_update', args=[self.logbook.id, entry.id]),
+            {'date_input': entry.date.isoformat(), 'activity_summary': "Calibrated the sensors"})
+        self.assertEqual(response.cookies[routers.STICKY_COOKIE]['max-age'], 15)
+
+        detail = reverse('logbook_detail', args=[self.logbook.id])
+        self.assertEqual(self.replica_reads(detail), 0)
+
+        # once the cookie expires the replicas are used again
+        del self.client.cookies[routers.STICKY_COOKIE]
+        self.assertGreater(self.replica_reads(detail), 0)
+
+    @override_settings(LOGBOOK_DATABASE_REPLICAS=['replica'])
+    def test_objects_read_from_a_replica_are_saved_to_the_primary(self):
+        router = routers.ReplicaRouter()
+        # no request let it read from a replica
+        self.assertIsNone(router.db_for_read(Logbook))
+
+        self.logbook._state.db = 'replica'
+        self.assertEqual(router.db_for_write(Logbook, instance=self.logbook), 'default')
+        self.assertFalse(router.allow_migrate('replica', 'logbook'))
+
+
+@override_settings(
+    LOGBOOK_INSTRUMENTATION=True, LOGBOOK_SLOW_REQUEST_MS=None, LOGBOOK_SLOW_REQUEST_QUERIES=None,
+    LOGBOOK_DOCUMENT_CACHE_DIR=None)
+class InstrumentationTests(TestCase):
+    def setUp(self):
+        instrumentation.reset()
+        self.addCleanup(instrumentation.reset)
+        self.student = create_student()
+        self.logbook = create_week(self.student, 1, updated_days=5)
+        self.client.force_login(self.student.user)
+
+    def test_requests_are_reported_per_url_name(self):
+        for _ in range(3):
+            self.client.get(reverse('logbook_detail', args=[self.logbook.id]))
+        self.client.get(reverse('logbook_generate', args=[self.logbook.id]))
+
+        report = instrumentation.report()
+        detail = report['logbook_detail']
+        self.assertEqual(detail['count'], 3)
+        self.assertGreater(detail['queries']['p50'], 0)
+        self.assertLessEqual(detail['wall_ms']['p50'], detail['wall_ms']['max'])
+        self.assertEqual(detail['document_ms']['max'], 0)
+        self.assertGreater(report['logbook_generate']['document_ms']['p50'], 0)
+
+    def test_only_staff_can_read_the_report(self):
+        self.assertEqual(self.client.get(reverse('instrumentation')).status_code, 403)
+
+        staff = User.objects.create_user("staff", "staff@udsm.ac.tz", "password", is_staff=True)
+        self.client.force_login(staff)
+        response = self.client.get(reverse('instrumentation'))
+        self.assertEqual(response.status_code, 200)
+        # the refused request was recorded too
+        self.assertEqual(response.json()['views']['instrumentation']['count'], 1)
+
+    @override_settings(LOGBOOK_SLOW_REQUEST_QUERIES=0)
+    def test_slow_requests_are_logged_with_their_sql(self):
+        with self.assertLogs('logbook.instrumentation', 'WARNING') as logs:
+            self.client.get(reverse('logbook_detail', args=[self.logbook.id]))
+        self.assertIn("Slow request GET", logs.output[0])
+        self.assertIn("SELECT", logs.output[0])
+
+    def test_percentile(self):
+        values = list(range(1, 101))
+        self.assertEqual(instrumentation.percentile(values, 50), 50)
+        self.assertEqual(instrumentation.percentile(values, 99), 99)
+        self.assertEqual(instrumentation.percentile([7], 95), 7)
+
+
+class MetricsTests(TestCase):
+    def setUp(self):
+        use_shared_cache(self)
+        self.student = create_student()
+        self.logbook = create_week(self.student, 1)
+
+    def sample(self, name, **labels):
+        return REGISTRY.get_sample_value(name, labels) or 0
+
+    def test_operations_are_counted(self):
+        updates = self.sample('logbook_entry_updates_total')
+        failed = self.sample('logbook_login_attempts_total', result='failed')
+
+        self.client.post('/login/', {'email': 'student', 'password': 'wrong'})
+        self.client.force_login(self.student.user)
+        self.client.get(reverse('logbook_catalog'))
+        entry = self.logbook.entries.first()
+        self.client.post(
+            reverse('entry_update', args=[self.logbook.id, entry.id]),
+            {'date_input': entry.date.isoformat(), 'activity_summary': "Serviced the pump"})
+
+        self.assertEqual(self.sample('logbook_entry_updates_total'), updates + 1)
+        self.assertEqual(self.sample('logbook_login_attempts_total', result='failed'), failed + 1)
+
+        response = self.client.get('/metrics')
+        self.assertEqual(response.status_code, 200)
+        self.assertIn(b'logbook_entry_updates_total', response.content)
+        self.assertIn(b'logbook_cache_requests_total{cache="student",result="miss"}', response.content)
+
+    @override_settings(LOGBOOK_METRICS_TOKEN='secret')
+    def test_token_is_required_when_set(self):
+        self.assertEqual(self.client.get('/metrics').status_code, 401)
+        response = self.client.get('/metrics', HTTP_AUTHORIZATION='Bearer secret')
+        self.assertEqual(response.status_code, 200)
+
+    def test_worker_processes_are_added_up(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        env = {**os.environ, 'PROMETHEUS_MULTIPROC_DIR': directory.name}
+        for _ in range(2):
+            subprocess.run(
+                [sys.executable, '-c', "from logbook import metrics; metrics.entry_updates.inc(3)"],
+                cwd=settings.BASE_DIR, env=env, check=True)
+
+        with patch.dict(os.environ, {'PROMETHEUS_MULTIPROC_DIR': directory.name}):
+            content, _ = metrics.exposition()
+        self.assertIn(b'logbook_entry_updates_total 6.0', content)
+
+
+class LoadTestTests(TestCase):
+    def test_seed_creates_students_with_weeks(self):
+        directory = tempfile.TemporaryDirectory()
+        self.addCleanup(directory.cleanup)
+        manifest_path = os.path.join(directory.name, 'manifest.json')
+        call_command('seed_load_test_data', students=2, weeks=3, manifest=manifest_path, stdout=StringIO())
+
+        manifest = loadtest.load_manifest(manifest_path)
+        self.assertEqual(len(manifest), 2)
+        self.assertEqual(len(manifest[0]['logbooks']), 3)
+        self.assertEqual(len(manifest[0]['logbooks'][0]['entries']), 5)
+        logbook = Logbook.objects.get(id=manifest[0]['logbooks'][0]['id'])
+        self.assertEqual((logbook.entry_count, logbook.operation_count), (5, 3))
+        self.assertTrue(self.client.login(username=manifest[0]['username'], password=loadtest.PASSWORD))
+
+        with self.assertRaises(CommandError):
+            call_command('seed_load_test_data', students=1, weeks=1, manifest=manifest_path)
+
+    def test_summary_and_regressions(self):
+        samples = [('detail', 200, 0.010 * i) for i in range(1, 101)] + [('print', 500, 0.5)]
+        summary = loadtest.summarize(samples, elapsed=10)
+        self.assertEqual(summary['detail']['p95_ms'], 950.0)
+        self.assertEqual(summary['detail']['rps'], 10.0)
+        self.assertEqual(summary['all']['errors'], 1)
+
+        baseline = {'detail': {**summary['detail'], 'p95_ms': 500.0}, 'print': summary['print']}
+        messages = loadtest.regressions(summary, baseline, tolerance=20)
+        self.assertEqual(len(messages), 1)
+        self.assertTrue(messages[0].startswith('detail: p95'))
+
+
+class DocumentBenchmarkTests(TestCase):
+    def test_cases_report_time_size_and_memory(self):
+        results = benchmark_create_document.run(['missing_diagram'], rounds=2, modes=['template'])
+        result = results['missing_diagram[template]']
+        self.assertEqual(result['rounds'], 2)
+        self.assertLessEqual(result['min_ms'], result['max_ms'])
+        self.assertGreater(result['bytes'], 0)
+        self.assertGreater(result['peak_memory_bytes'], 0)
+
+        baseline = {'missing_diagram[template]': {**result, 'median_ms': result['median_ms'] / 2}}
+        self.assertEqual(
+            benchmark_create_document.compare(results, baseline, tolerance=10),
+            ['missing_diagram[template] median_ms'])
+
+
+class LazyDocumentImportTests(TestCase):
+    def test_workers_start_without_document_packages(self):
+        # a fresh interpreter, this one has imported python-docx for the tests
+        code = (
+            "import django, sys\n"
+            "django.setup()\n"
+            "from main.wsgi import application\n"
+            "from django.urls import get_resolver\n"
+            "get_resolver().url_patterns\n"
+            "print(sorted({name.split('.')[0] for name in sys.modules} & "
+            "{'docx', 'lxml', 'html2docx', 'docs'}))\n"
+        )
+        result = subprocess.run(
+            [sys.executable, '-c', code], cwd=settings.BASE_DIR, capture_output=True, text=True,
+            env={**os.environ, 'DJANGO_SETTINGS_MODULE': 'main.settings'}, check=True)
+        self.assertEqual(result.stdout.strip(), '[]', "views import python-docx at startup again")
@@ -3,6 +3,7 @@ from home.views import home_view
 from .views import (
     profile_settings_view,
     logbook_catalog_view,
+    logbook_catalog_more_view,
     delete_logbook,
     logbook_detail_view,
     create_entry_view,
@@ -11,12 +12,19 @@ from .views import (
     logbook_redirect_login,
     logbook_logout_redirect,
     generate_logbook,
+    export_logbooks,
+    enqueue_logbook_document,
+    document_job_status,
+    download_document_job,
     operations_view,
     operations_create_view,
     operations_edit_view,
     operations_delete_view,
     update_activity_diagram,
     get_week_entries,
+    search_view,
+    department_dashboard_view,
+    instrumentation_view,
 )
 
 urlpatterns = [
@@ -26,8 +34,12 @@ urlpatterns = [
     path("logbook_settings/", profile_settings_view, name="logbook_settings"),
     # Logbook Catalog
     path("catalog/", logbook_catalog_view, name="logbook_catalog"),
+    path("catalog/more/", logbook_catalog_more_view, name="logbook_catalog_more"),
     path("catalog/<int:logbook_id>/", logbook_detail_view, name="logbook_detail"),
     path("catalog/<int:logbook_id>/delete/", delete_logbook, name="logbook_delete"),
+    path("search/", search_view, name="logbook_search"),
+    path("dashboard/", department_dashboard_view, name="department_dashboard"),
+    path("instrumentation/", instrumentation_view, name="instrumentation"),
     # Logbook Entries
     path("catalog/<int:logbook_id>/entry/", create_entry_view, name="entry_create"),
     path(
@@ -45,6 +57,18 @@ urlpatterns = [
     path("redirect/logout/", logbook_logout_redirect, name="logbook_logout_redirect"),
     # Logbook Generation
     path("mlfieldbook/<int:logbook_id>/", generate_logbook, name="logbook_generate"),
+    path("export/", export_logbooks, name="logbook_export"),
+    path(
+        "mlfieldbook/<int:logbook_id>/jobs/",
+        enqueue_logbook_document,
+        name="logbook_document_enqueue",
+    ),
+    path("jobs/<int:job_id>/", document_job_status, name="document_job_status"),
+    path(
+        "jobs/<int:job_id>/download/",
+        download_document_job,
+        name="document_job_download",
+    ),
     # Operations
     path("operations/<int:logbook_id>/", operations_view, name="operations_list"),
     path(
@@ -68,6 +92,7 @@ urlpatterns = [
         update_activity_diagram,
         name="diagram_update",
     ),
+    path('week-entries/', get_week_entries, name='get_weeks_entries'),
     path(
         'week-entries/<int:week_number>/', 
         get_week_entries, 
@@ -1,10 +1,30 @@
-from django.shortcuts import render, redirect, HttpResponse
+from django.shortcuts import get_object_or_404, render, redirect, HttpResponse
 from django.urls import reverse
-from django.http import JsonResponse
+from django.template.loader import render_to_string
+from django.utils.text import slugify
+from django.http import JsonResponse, FileResponse, StreamingHttpResponse
+from django.conf import settings
+from django.db.models import Avg, Count, F, OuterRef, Prefetch, Subquery, Sum
+from django.utils.cache import get_conditional_response, patch_cache_control
+from django.utils.http import http_date, quote_etag
 from home.views import process_login, logout
-from .models import Student, Logbook, Entry, Week_operation, User
+from .models import Student, Logbook, Entry, Week_operation, User, DocumentJob
+from . import document_cache, instrumentation, jobs, metrics, search
+from .batch import scaffold_weeks
+from .diagrams import set_activity_diagram, DiagramError
+from .middleware import invalidate_student
+from .pagination import keyset_page, InvalidCursor
+from .routers import replica_reads
+from .documents import (
+    logbooks_for_documents,
+    logbook_document_inputs,
+    semester_logbooks,
+    merged_document,
+    iter_zip,
+    DAYS,
+)
 from datetime import datetime, timedelta
-from docs.create_document import create_practical_training_log_book as mlfieldbook
+import hashlib
 import os
 
 def is_allowed(request):
@@ -21,10 +41,7 @@ def logbook_home_view(request):
         login_pass = False
 
     # try to get student status
-    try:
-        student = Student.objects.get(user=request.user)
-    except:
-        student = None
+    student = request.student or None
 
     context = {
         'login_pass' : login_pass,
@@ -88,13 +105,13 @@ def profile_settings_view(request):
                 student.practical_training_start_date = start_date
             student.save()
 
+        # the cached request.student still has the old profile
+        invalidate_student(user.id)
+
         return redirect(reverse('logbook_settings'))
 
     # get student information
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
-        student = None
+    student = request.student or None
 
     
     context = {
@@ -104,6 +121,7 @@ def profile_settings_view(request):
     return render(request, 'logbook/logbook_settings.html', context)
 
 
+@replica_reads
 def logbook_catalog_view(request):
     # check if user is logged in
     login_pass = is_allowed(request)
@@ -114,74 +132,104 @@ def logbook_catalog_view(request):
         return logbook_create_view(request)
 
     # get student information
-    try:
-        student = Student.objects.get(user=request.user)
-    except Student.DoesNotExist:
-        student = None
+    student = request.student or None
 
-    if student is  None and request.user.is_authenticated:
+    if student is None and request.user.is_authenticated:
         return redirect("/logbook/logbook_settings")
  
-    # get logbooks
-    logbooks = Logbook.objects.filter(student=student)
-    logbook_catalog = []
+    logbooks, next_cursor = catalog_page(student, None)
+    context = {
+        "logbooks": logbooks,
+        "logbook_count": Logbook.objects.filter(student=student).count(),
+        "next_cursor": next_cursor,
+        "fragment_timeout": settings.LOGBOOK_FRAGMENT_CACHE_TIMEOUT,
+    }
+
+    return render(request, 'logbook/logbook_list.html', context)
+
 
-    # if empty logbooks, return empty catalog
-    if not logbooks:
-        context = {
-            "logbooks": logbook_catalog,
-            "logbook_count": 0
-        }
-        return render(request, 'logbook/logbook_list.html', context)
+def catalog_page(student, cursor):
+    """
+    Returns the catalog cards of one page of the student's logbooks, in
+    (week_number, id) order after cursor, and the next page's cursor.
+    """
+    # get logbooks with the two preview operations loaded up front, so the
+    # page cost does not grow per week. Counts are stored on the logbook.
+    logbooks = (
+        Logbook.objects.filter(student=student)
+        .prefetch_related(
+            Prefetch(
+                'week_operations',
+                queryset=Week_operation.objects.order_by('id')[:2],
+                to_attr='preview_operations',
+            )
+        )
+    )
+    logbooks, next_cursor = keyset_page(
+        logbooks, ['week_number', 'id'], cursor=cursor,
+        page_size=settings.LOGBOOK_CATALOG_PAGE_SIZE)
 
+    logbook_catalog = []
     for logbook in logbooks:
         metadata = {}
         metadata['id'] = logbook.id
         metadata['week_number'] = logbook.week_number
         metadata['from_date'] = logbook.from_date
         metadata['week_activity'] = logbook.week_activity
+        metadata['version'] = logbook.version
 
-        # get entries from this logbook
-        try:
-            entries = Entry.objects.filter(logbook=logbook)
-            updated_entries = Entry.objects.filter(logbook=logbook, is_updated=True)
-            updated_entries_count = len(updated_entries)
-
-            metadata['entries'] = entries
-            metadata['entry_count'] = updated_entries_count
-            # percentage of entries completed out of 5
-            metadata['percentage'] = int((updated_entries_count / 5) * 100)
-        except Entry.DoesNotExist:
-            entries = None
-
-            # get week operations   
-        try:
-            week_operations = Week_operation.objects.filter(logbook=logbook)
-            metadata['week_operation_count'] = len(week_operations)
-
-            # get only 2 week operations, max 30 characters for opeartions
-            week_operations = week_operations[:2]
-            for week_operation in week_operations:
-                if len(week_operation.operation) > 30:
-                    week_operation.operation = week_operation.operation[:50] + "..."
+        # percentage of entries completed out of 5
+        metadata['entry_count'] = logbook.updated_entry_count
+        metadata['percentage'] = logbook.completion_percentage
 
-        except Week_operation.DoesNotExist:
-            metadata['week_operation_count'] = 0
-            week_operations = None
+        # get only 2 week operations, max 30 characters for opeartions
+        metadata['week_operation_count'] = logbook.operation_count
+        week_operations = logbook.preview_operations
+        for week_operation in week_operations:
+            if len(week_operation.operation) > 30:
+                week_operation.operation = week_operation.operation[:50] + "..."
 
         metadata['week_operations'] = week_operations
-        
+
         logbook_catalog.append(metadata)
 
+    return logbook_catalog, next_cursor
 
-    context = {
-        "logbooks": logbook_catalog,
-        "logbook_count": len(logbooks)
-    }
 
-    return render(request, 'logbook/logbook_list.html', context)
+@replica_reads
+def logbook_catalog_more_view(request):
+    """
+    The catalog cards after ?cursor, as JSON with the rendered html and the
+    next cursor, or with ?format=html as a bare fragment with the next
+    cursor in the X-Next-Cursor header.
+    """
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    student = request.student or None
+    if student is None:
+        return JsonResponse({"error": "Student profile not found."}, status=404)
+
+    try:
+        logbooks, next_cursor = catalog_page(student, request.GET.get('cursor'))
+    except InvalidCursor as error:
+        return JsonResponse({"error": str(error)}, status=400)
+
+    html = render_to_string(
+        'logbook/includes/catalog_items.html',
+        {'logbooks': logbooks, 'fragment_timeout': settings.LOGBOOK_FRAGMENT_CACHE_TIMEOUT},
+        request=request)
+    if request.GET.get('format') == 'html':
+        response = HttpResponse(html)
+        if next_cursor:
+            response['X-Next-Cursor'] = next_cursor
+        return response
+    return JsonResponse({'html': html, 'next_cursor': next_cursor})
 
 
+@replica_reads
 def logbook_detail_view(request, logbook_id):
     # check if user is logged in
     login_pass = is_allowed(request)
@@ -189,48 +237,39 @@ def logbook_detail_view(request, logbook_id):
         return login_pass
 
     # get logbook
-    logbook = Logbook.objects.get(id=logbook_id, student=Student.objects.get(user=request.user))
+    logbook = Logbook.objects.get(id=logbook_id, student=request.student)
     metadata = {}
 
     # get entries from this logbook
-    try:
-        entries = Entry.objects.filter(logbook=logbook)
-        updated_entries = Entry.objects.filter(logbook=logbook, is_updated=True)
-        updated_entries = len(updated_entries)
+    entries = Entry.objects.filter(logbook=logbook)
+    updated_entries = logbook.updated_entry_count
 
-        metadata['entries'] = entries
-        metadata['entry_count'] = len(entries)
-        metadata['updated_entries'] = updated_entries
-        
-        print_state = False
-        if updated_entries == 5: 
-            print_state=True 
+    metadata['entries'] = entries
+    metadata['entry_count'] = logbook.entry_count
+    metadata['updated_entries'] = updated_entries
 
-        # percentage of entries completed out of 5
-        metadata['percentage'] = int((updated_entries / 5) * 100)
-        metadata['print_state'] = print_state
-    except Entry.DoesNotExist:
-        entries = None
+    print_state = False
+    if updated_entries == 5:
+        print_state=True
 
-    # get week operations   
-    try:
-        week_operations = Week_operation.objects.filter(logbook=logbook)
-        metadata['week_operation_count'] = len(week_operations)
-
-        # get only 2 week operations, max 30 characters for opeartions
-        week_operations = week_operations[:2]
-        for week_operation in week_operations:
-            if len(week_operation.operation) > 30:
-                week_operation.operation = week_operation.operation[:50] + "..."
+    # percentage of entries completed out of 5
+    metadata['percentage'] = logbook.completion_percentage
+    metadata['print_state'] = print_state
 
-    except Week_operation.DoesNotExist:
-        week_operations = None
+    # get week operations, only 2, max 30 characters for opeartions
+    metadata['week_operation_count'] = logbook.operation_count
+    week_operations = Week_operation.objects.filter(logbook=logbook)[:2]
+    for week_operation in week_operations:
+        if len(week_operation.operation) > 30:
+            week_operation.operation = week_operation.operation[:50] + "..."
 
     metadata['week_operations'] = week_operations
 
     context = {
         'logbook': logbook,
-        'metadata': metadata
+        'metadata': metadata,
+        'async_documents': settings.LOGBOOK_ASYNC_DOCUMENTS,
+        'fragment_timeout': settings.LOGBOOK_FRAGMENT_CACHE_TIMEOUT,
     }
     return render(request, 'logbook/logbook_detail.html', context)
 
@@ -242,7 +281,7 @@ def logbook_create_view(request):
         return login_pass
 
     # get student
-    student = Student.objects.get(user=request.user)
+    student = request.student
 
     # get data  passed form data
     week_activity = request.POST['week_activity']
@@ -256,6 +295,11 @@ def logbook_create_view(request):
         week_activity = "Waiting for entries"
 
 
+    # a student has one logbook per week, open the existing one instead
+    existing = Logbook.objects.filter(student=student, week_number=week_number).first()
+    if existing is not None:
+        return redirect(reverse('logbook_detail', kwargs={'logbook_id': existing.id}))
+
     # Create and return the Logbook instance
     Logbook.objects.create(
         student=student,
@@ -263,12 +307,13 @@ def logbook_create_view(request):
         from_date=from_date,
         to_date=to_date,
         week_activity=week_activity)
+    metrics.logbooks_created.labels('form').inc()
 
     return redirect("/logbook/catalog")
 
 
 def delete_logbook(request, logbook_id):
-    logbook = Logbook.objects.get(id=logbook_id, student=Student.objects.get(user=request.user))
+    logbook = Logbook.objects.get(id=logbook_id, student=request.student)
     if logbook is None: return
     logbook.delete()
     return redirect("/logbook/catalog")
@@ -338,21 +383,21 @@ def create_batch_entries(request, logbook_id):
     if login_pass is not True:
         return login_pass
 
-    logbook = Logbook.objects.get(id=logbook_id)
-    # create entries from monday to friday with empty activity from logbook from date
-    from_date = logbook.from_date
-    to_date = logbook.to_date
-    delta = to_date - from_date
-
-    for i in range(delta.days + 1):
-        date = from_date + timedelta(days=i)
-        day_name = date.strftime('%A')
-        Entry.objects.create(
-            logbook=logbook,
-            day=day_name,
-            date=date,
-            activity="** click update to edit **")
+    logbook = get_object_or_404(Logbook, id=logbook_id, student=request.student or None)
 
+    # optionally scaffold every week up to to_week, creating missing weeks.
+    # Only from the form, a link must not create weeks.
+    to_week = request.POST.get('to_week')
+    if to_week and not to_week.isdigit():
+        return HttpResponse("The last week must be a week number.", status=400)
+    last_week_number = int(to_week) if to_week else None
+    try:
+        scaffold_weeks(logbook, last_week_number)
+    except ValueError as error:
+        return HttpResponse(str(error), status=400)
+
+    if last_week_number is not None and last_week_number != logbook.week_number:
+        return redirect("/logbook/catalog")
     return redirect("/logbook/catalog/" + str(logbook_id))
 
 def update_entry_view(request, logbook_id, entry_id):
@@ -369,6 +414,16 @@ def update_entry_view(request, logbook_id, entry_id):
         date_input = request.POST['date_input']
         activity_summary = request.POST['activity_summary']
 
+        # only one entry per date
+        if Entry.objects.filter(logbook=logbook, date=date_input).exclude(id=entry.id).exists():
+            context = {
+                'logbook': logbook,
+                'entry': entry,
+                'entry_date': date_input,
+                'form_errors': "Another entry of this logbook already has this date."
+            }
+            return render(request, 'logbook/logbook_entry.html', context)
+
         # get day name from date input
         day_name = datetime.strptime(date_input, '%Y-%m-%d').strftime('%A')
 
@@ -377,6 +432,7 @@ def update_entry_view(request, logbook_id, entry_id):
         entry.activity=activity_summary
         entry.is_updated=True
         entry.save()
+        metrics.entry_updates.inc()
 
         return redirect("/logbook/catalog/" + str(logbook_id))
 
@@ -433,54 +489,45 @@ def signup_view(request):
 
 
 
+@replica_reads
 def generate_logbook(request, logbook_id):
-    student = Student.objects.get(user=request.user)
-    logbook = Logbook.objects.get(student=student, id=logbook_id)
+    student = request.student
+    logbook = logbooks_for_documents(Logbook.objects).get(student=student, id=logbook_id)
+
+    # update the flag only, a full save would drop the cached documents
+    if not logbook.is_submitted:
+        Logbook.objects.filter(id=logbook.id).update(is_submitted=True, version=F('version') + 1)
+
+    # python-docx is only loaded by workers that generate documents
+    from docs.create_document import create_practical_training_log_book as mlfieldbook
+    from docs.create_document import render_practical_training_log_book, logbook_filename
 
-    logbook.is_submitted=True
-    logbook.save()
+    # collect activities, operations and student details
+    document_inputs = logbook_document_inputs(logbook)
+    file_name = logbook_filename(document_inputs['reg_no'], document_inputs['week_no'])
 
-    # collect activities
-    activity_dict = {}
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-    for day in days:
-        entry = None
+    # render in memory (or reuse the cached copy of an unchanged week) and
+    # stream it back, unless a copy on disk is wanted
+    if not settings.LOGBOOK_SAVE_GENERATED_DOCX:
         try:
-            entry = Entry.objects.get(logbook=logbook, day=day)
-            activity_dict[day] = {
-            'date': entry.date,
-            'activity': entry.activity}
-        except:
-            activity_dict[day] = {
-            'date': "dd/mm/yyyy",
-            'activity': ""}
-
-    # get operation and machinery
-    operation_list = []
-    try:
-        week_operations = Week_operation.objects.filter(logbook=logbook)
-        for week_operation in week_operations:
-            operation_list.append(
-                {"operation": week_operation.operation,
-                "machinery": week_operation.machinery})
-    except:
-        pass
-            
-    
-    department = student.department_name
-    student_name = f"{student.user.last_name}, {student.user.first_name}"
-    reg_no = student.registration_number 
-    company = student.pt_location
-    week_no = logbook.week_number 
-    from_date = logbook.from_date
-    to_date = logbook.to_date
-    activity_diagram = logbook.activity_diagram.path if logbook.activity_diagram else None
+            with instrumentation.document_timer(), metrics.document_timer('week'):
+                document = document_cache.cached_document(
+                    logbook.id, document_inputs, render_practical_training_log_book)
+        except FileNotFoundError:
+            return HttpResponse(
+                "Error generating logbook document<br>"
+                "A file the document is built from could not be found. Please check the document template.",
+                status=500
+            )
+        metrics.observe_document_size('week', document)
+        return docx_response(document, file_name)
+
     try:
-        generated_document = mlfieldbook(department, student_name, reg_no, company, week_no, from_date, to_date, activity_dict, operation_list, activity_diagram)
-    except FileNotFoundError as e:
-        from django.http import HttpResponse
+        with instrumentation.document_timer(), metrics.document_timer('week'):
+            generated_document = mlfieldbook(**document_inputs)
+    except FileNotFoundError:
         return HttpResponse(
-            f"Error generating logbook document<br>"
+            "Error generating logbook document<br>"
             "The generated file could not be found. Please check if the output directory exists.",
             status=500
         )
@@ -488,14 +535,130 @@ def generate_logbook(request, logbook_id):
     return download_generated_docx(request, generated_document)
 
 
+def enqueue_logbook_document(request, logbook_id):
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    if request.method != 'POST':
+        return JsonResponse({"error": "Use POST to queue a document."}, status=405)
+
+    student = request.student
+    logbook = Logbook.objects.get(student=student, id=logbook_id)
+
+    job = jobs.enqueue(logbook)
+    if job is None:
+        return JsonResponse(
+            {"error": "You already have documents being generated, please wait for them."},
+            status=429)
+
+    if not logbook.is_submitted:
+        Logbook.objects.filter(id=logbook.id).update(is_submitted=True, version=F('version') + 1)
+
+    return JsonResponse(jobs.job_status(job), status=202)
+
+
+def get_student_document_job(request, job_id):
+    return DocumentJob.objects.get(id=job_id, logbook__student__user=request.user)
+
+
+def document_job_status(request, job_id):
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    try:
+        job = get_student_document_job(request, job_id)
+    except DocumentJob.DoesNotExist:
+        return JsonResponse({"error": "Document job not found."}, status=404)
+
+    return JsonResponse(jobs.job_status(job))
+
+
+def download_document_job(request, job_id):
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    try:
+        job = get_student_document_job(request, job_id)
+    except DocumentJob.DoesNotExist:
+        return HttpResponse("Document job not found.", status=404)
+
+    if job.status != DocumentJob.DONE:
+        return HttpResponse("The document is not ready yet.", status=409)
+
+    try:
+        document = open(job.output_path, 'rb')
+    except FileNotFoundError:
+        return HttpResponse("The document has expired, please print again.", status=410)
+
+    return docx_response(document, job.file_name)
+
+
+def export_logbooks(request):
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    export_format = request.GET.get('format', 'docx')
+    if export_format not in ('docx', 'zip'):
+        return HttpResponse("Export format must be docx or zip.", status=400)
+
+    # staff can export any student or a whole department
+    department = request.GET.get('department')
+    student_id = request.GET.get('student')
+    if (department or student_id) and not request.user.is_staff:
+        return HttpResponse("Only staff can export other students.", status=403)
+
+    if department:
+        students = Student.objects.filter(department_name=department)
+        export_name = f"{slugify(department)}-practical-training-logbooks"
+    else:
+        if student_id:
+            student = Student.objects.filter(id=student_id).first()
+        else:
+            student = request.student or None
+        if student is None:
+            return HttpResponse("Student not found.", status=404)
+        students = [student]
+        export_name = f"{student.registration_number}-practical-training-logbook"
+
+    logbooks = semester_logbooks(students)
+    if not logbooks.exists():
+        return HttpResponse("There are no logbooks to export.", status=404)
+
+    if export_format == 'docx':
+        with instrumentation.document_timer(), metrics.document_timer('export'):
+            document = merged_document(logbooks)
+        metrics.observe_document_size('export', document)
+        return docx_response(document, f"{export_name}.docx")
+
+    response = StreamingHttpResponse(
+        iter_zip(logbooks.iterator(chunk_size=100), by_student=bool(department)),
+        content_type='application/zip')
+    response['Content-Disposition'] = f'attachment; filename="{export_name}.zip"'
+    return response
+
+
+def docx_response(file, file_name):
+    # FileResponse streams the file in chunks and sets Content-Length
+    return FileResponse(
+        file,
+        as_attachment=True,
+        filename=file_name,
+        content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
+
+
 def download_generated_docx(request, generated_file_path):
     file_path = generated_file_path
     file_name = os.path.basename(file_path)
-    
-    with open(file_path, 'rb') as file:
-        response = HttpResponse(file.read(), content_type='application/vnd.openxmlformats-officedocument.wordprocessingml.document')
-        response['Content-Disposition'] = f'attachment; filename="{file_name}"'
-        return response
+
+    return docx_response(open(file_path, 'rb'), file_name)
 
 
 
@@ -505,7 +668,7 @@ def operations_view(request, logbook_id):
     if login_pass is not True:
         return login_pass
 
-    student = Student.objects.get(user=request.user)
+    student = request.student
     logbook = Logbook.objects.get(student=student, id=logbook_id)
     try:
         week_operations = Week_operation.objects.filter(logbook=logbook)
@@ -542,7 +705,7 @@ def operations_create_view(request, logbook_id):
     if login_pass is not True:
         return login_pass
 
-    student = Student.objects.get(user=request.user)
+    student = request.student
     logbook = Logbook.objects.get(student=student, id=logbook_id)
     
     if request.method == 'POST':
@@ -571,7 +734,7 @@ def operations_edit_view(request, logbook_id, operation_id):
     if login_pass is not True:
         return login_pass
 
-    student = Student.objects.get(user=request.user)
+    student = request.student
     logbook = Logbook.objects.get(student=student, id=logbook_id)
     week_operation = Week_operation.objects.get(logbook=logbook, id=operation_id)
 
@@ -600,7 +763,7 @@ def operations_delete_view(request, logbook_id, operation_id):
     if login_pass is not True:
         return login_pass
 
-    student = Student.objects.get(user=request.user)
+    student = request.student
     logbook = Logbook.objects.get(student=student, id=logbook_id)
     week_operation = Week_operation.objects.get(logbook=logbook, id=operation_id)
     week_operation.delete()
@@ -614,13 +777,22 @@ def update_activity_diagram(request, logbook_id):
     if login_pass is not True:
         return login_pass
 
-    student = Student.objects.get(user=request.user)
+    student = request.student
     logbook = Logbook.objects.get(student=student, id=logbook_id)
 
     if request.method == 'POST':
         activity_diagram_file = request.FILES['diagram']
-        logbook.activity_diagram = activity_diagram_file
+        try:
+            set_activity_diagram(logbook, activity_diagram_file)
+        except DiagramError as error:
+            metrics.diagram_uploads.labels('rejected').inc()
+            context = {
+                'logbook': logbook,
+                'form_errors': str(error)
+            }
+            return render(request, 'logbook/logbook_operations_diagram.html', context)
         logbook.save()
+        metrics.diagram_uploads.labels('saved').inc()
 
         return redirect(reverse('operations_list', kwargs={'logbook_id': logbook_id}))
 
@@ -630,30 +802,224 @@ def update_activity_diagram(request, logbook_id):
 
     return render(request, 'logbook/logbook_operations_diagram.html', context)
 
-def get_week_entries(request, week_number):
+@replica_reads
+def get_week_entries(request, week_number=None):
+    """
+    Returns the week's entries as a list of {day, activity}. Without a
+    week number in the URL, ?weeks=1,2,3 returns several weeks keyed by
+    week number, weeks without a logbook as empty lists. Entries are read
+    in one query, and responses carry an ETag and Last-Modified from the
+    entries' updated_at so unchanged weeks are answered with 304.
+    """
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    if week_number is not None:
+        week_numbers = [week_number]
+    else:
+        weeks = request.GET.get('weeks', '').split(',')
+        if not all(week.strip().isdigit() for week in weeks):
+            return JsonResponse({"error": "weeks must be a list of week numbers."}, status=400)
+        week_numbers = sorted({int(week) for week in weeks})
+        if len(week_numbers) > settings.LOGBOOK_MAX_BATCH_WEEKS:
+            return JsonResponse({"error": "Too many weeks requested."}, status=400)
+
+    rows = list(
+        Entry.objects
+        .filter(
+            logbook__student__user=request.user,
+            logbook__week_number__in=week_numbers,
+            day__in=DAYS)
+        .order_by('date', 'id')
+        .values_list('id', 'logbook__week_number', 'day', 'activity', 'updated_at')
+    )
+
+    # no entries, tell missing profiles and logbooks apart from empty weeks.
+    # Several weeks return missing ones as empty lists.
+    if not rows:
+        if not request.student:
+            return JsonResponse({"error": "Student profile not found."}, status=404)
+        if week_number is not None and not Logbook.objects.filter(
+                student__user=request.user, week_number=week_number).exists():
+            return JsonResponse({"error": "Logbook not found."}, status=404)
+
+    # one entry per weekday, Monday to Friday
+    entries_by_week = {week: {} for week in week_numbers}
+    for entry_id, week, day, activity, updated_at in rows:
+        entries_by_week[week].setdefault(day, activity.strip())
+    weeks_data = {
+        week: [{'day': day, 'activity': entries[day]} for day in DAYS if day in entries]
+        for week, entries in entries_by_week.items()
+    }
+
+    versions = [(entry_id, updated_at.isoformat()) for entry_id, _, _, _, updated_at in rows]
+    etag = hashlib.sha256(repr((week_numbers, versions)).encode('utf-8')).hexdigest()
+    last_modified = max((row[4] for row in rows), default=None)
+    last_modified = int(last_modified.timestamp()) if last_modified else None
+
+    not_modified = get_conditional_response(request, etag=quote_etag(etag), last_modified=last_modified)
+    if not_modified is not None:
+        response = not_modified
+    elif week_number is not None:
+        response = JsonResponse(weeks_data[week_number], safe=False)
+    else:
+        response = JsonResponse({str(week): data for week, data in weeks_data.items()})
+
+    # the browser revalidates on every request instead of reusing stale entries
+    response['ETag'] = quote_etag(etag)
+    if last_modified is not None:
+        response['Last-Modified'] = http_date(last_modified)
+    patch_cache_control(response, private=True, no_cache=True)
+    return response
+
+
+def search_view(request):
+    """
+    Full-text search over entries, week activities and week operations.
+    Students search their own logbooks, staff search every student.
+    Returns JSON with ?format=json.
+    """
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    student = request.student or None
+    if student is None and not request.user.is_staff:
+        return redirect("/logbook/logbook_settings")
+
+    query = request.GET.get('q', '').strip()
+    results = search.search(query, student=None if request.user.is_staff else student)
+    # the student pages only open the student's own logbooks, staff see
+    # other students' texts in the admin
+    admin_urls = {
+        search.ENTRY: 'admin:logbook_entry_change',
+        search.OPERATION: 'admin:logbook_week_operation_change',
+        search.LOGBOOK: 'admin:logbook_logbook_change',
+    }
+    for result in results:
+        if request.user.is_staff:
+            result['url'] = reverse(admin_urls[result['kind']], args=[result['object_id']])
+        elif result['kind'] == search.ENTRY:
+            result['url'] = reverse('entry_update', args=[result['logbook_id'], result['object_id']])
+        elif result['kind'] == search.OPERATION:
+            result['url'] = reverse('operations_list', args=[result['logbook_id']])
+        else:
+            result['url'] = reverse('logbook_detail', args=[result['logbook_id']])
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({'query': query, 'results': results})
+
+    context = {
+        'query': query,
+        'results': results,
+    }
+    return render(request, 'logbook/logbook_search.html', context)
+
+
+def department_dashboard_view(request):
+    """
+    Progress of every student of a department, for staff. Aggregates are
+    computed in the database from the logbook counters, and students are
+    paged by (registration number, id) with a keyset cursor.
+    Returns JSON with ?format=json.
+    """
+    # check if user is logged in
     login_pass = is_allowed(request)
     if login_pass is not True:
         return login_pass
 
+    if not request.user.is_staff:
+        return HttpResponse("Only staff can view the department dashboard.", status=403)
+
+    departments = list(
+        Student.objects.order_by('department_name')
+        .values_list('department_name', flat=True).distinct()
+    )
+    department = request.GET.get('department') or (departments[0] if departments else '')
+
+    # latest entry update of each student
+    last_activity = (
+        Entry.objects.filter(logbook__student=OuterRef('pk'))
+        .order_by('-updated_at').values('updated_at')[:1]
+    )
+    students = (
+        Student.objects.filter(department_name=department)
+        .annotate(
+            weeks=Count('logbooks'),
+            updated_entries=Sum('logbooks__updated_entry_count', default=0),
+            completion=Avg('logbooks__completion_percentage', default=0),
+            last_activity=Subquery(last_activity),
+        )
+        .values(
+            'id', 'registration_number', 'user__first_name', 'user__last_name',
+            'pt_location', 'weeks', 'updated_entries', 'completion', 'last_activity')
+    )
     try:
-        student = Student.objects.get(user=request.user)
-        logbook = Logbook.objects.get(student=student, week_number=week_number)
-    except Student.DoesNotExist:
-        return JsonResponse({"error": "Student profile not found."}, status=404)
-    except Logbook.DoesNotExist:
-        return JsonResponse({"error": "Logbook not found."}, status=404)
+        students, next_cursor = keyset_page(
+            students, ['registration_number', 'id'],
+            cursor=request.GET.get('cursor'),
+            page_size=settings.LOGBOOK_DASHBOARD_PAGE_SIZE)
+    except InvalidCursor as error:
+        return HttpResponse(str(error), status=400)
+
+    for student in students:
+        student['completion'] = round(student['completion'])
+
+    summary = Logbook.objects.filter(student__department_name=department).aggregate(
+        logbooks=Count('id'),
+        completion=Avg('completion_percentage', default=0),
+    )
+    summary['students'] = Student.objects.filter(department_name=department).count()
+    summary['completion'] = round(summary['completion'])
+
+    if request.GET.get('format') == 'json':
+        return JsonResponse({
+            'department': department,
+            'summary': summary,
+            'students': students,
+            'next_cursor': next_cursor,
+        })
 
-    days = ['Monday', 'Tuesday', 'Wednesday', 'Thursday', 'Friday']
-    entries = []
+    context = {
+        'departments': departments,
+        'department': department,
+        'summary': summary,
+        'students': students,
+        'next_cursor': next_cursor,
+    }
+    return render(request, 'logbook/logbook_dashboard.html', context)
 
-    for day in days:
-        try:
-            entry = Entry.objects.get(logbook=logbook, day=day)
-            entries.append({
-                'day': day,
-                'activity': entry.activity.strip()
-            })
-        except Entry.DoesNotExist:
-            continue 
 
-    return JsonResponse(entries, safe=False)
\ No newline at end of file
+def instrumentation_view(request):
+    """
+    Percentiles of the wall time, query count, database time and document
+    time of the recent requests of every URL name, for staff, as JSON.
+    """
+    # check if user is logged in
+    login_pass = is_allowed(request)
+    if login_pass is not True:
+        return login_pass
+
+    if not request.user.is_staff:
+        return HttpResponse("Only staff can view request timings.", status=403)
+
+    return JsonResponse({
+        'enabled': settings.LOGBOOK_INSTRUMENTATION,
+        'window': settings.LOGBOOK_INSTRUMENTATION_WINDOW,
+        'views': instrumentation.report(),
+    })
+
+
+def metrics_view(request):
+    """
+    Prometheus metrics of every worker process. With LOGBOOK_METRICS_TOKEN
+    set, scrapers must send it as a bearer token.
+    """
+    token = settings.LOGBOOK_METRICS_TOKEN
+    if token and request.headers.get('Authorization') != f"Bearer {token}":
+        return HttpResponse("Invalid metrics token.", status=401)
+
+    content, content_type = metrics.exposition()
+    return HttpResponse(content, content_type=content_type)
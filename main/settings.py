@@ -10,6 +10,7 @@ For the full list of settings and their values, see
 https://docs.djangoproject.com/en/4.2/ref/settings/
 """
 
+import copy
 import os
 from pathlib import Path
 
@@ -51,12 +52,15 @@ INSTALLED_APPS = [
 ]
 
 MIDDLEWARE = [
+    'logbook.instrumentation.InstrumentationMiddleware',
     'django_hosts.middleware.HostsRequestMiddleware',
     'django.middleware.security.SecurityMiddleware',
+    'logbook.routers.ReplicaMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
     'django.contrib.auth.middleware.AuthenticationMiddleware',
+    'logbook.middleware.StudentMiddleware',
     'django.contrib.messages.middleware.MessageMiddleware',
     'django.middleware.clickjacking.XFrameOptionsMiddleware',
     'django_hosts.middleware.HostsResponseMiddleware',
@@ -92,11 +96,85 @@ WSGI_APPLICATION = 'main.wsgi.application'
 # Database
 # https://docs.djangoproject.com/en/4.2/ref/settings/#databases
 
-DATABASES = {
-    'default': {
-        'ENGINE': 'django.db.backends.sqlite3',
-        'NAME': BASE_DIR / 'db.sqlite3',
+# SQLite by default. Set DB_ENGINE=postgresql and the DB_* variables below
+# in the environment to use PostgreSQL, then copy an existing db.sqlite3
+# over with `python manage.py copy_sqlite_data`.
+
+DB_ENGINE = os.environ.get('DB_ENGINE', 'sqlite')
+
+if DB_ENGINE == 'postgresql':
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.postgresql',
+            'NAME': os.environ.get('DB_NAME', 'mlfieldbook'),
+            'USER': os.environ.get('DB_USER', 'mlfieldbook'),
+            'PASSWORD': os.environ.get('DB_PASSWORD', ''),
+            'HOST': os.environ.get('DB_HOST', 'localhost'),
+            'PORT': os.environ.get('DB_PORT', '5432'),
+            # keep connections open between requests, checking them
+            # before reuse so a restarted server does not fail a request
+            'CONN_MAX_AGE': int(os.environ.get('DB_CONN_MAX_AGE', 60)),
+            'CONN_HEALTH_CHECKS': True,
+            # set when connecting through PgBouncer in transaction mode
+            'DISABLE_SERVER_SIDE_CURSORS': os.environ.get('DB_DISABLE_SERVER_SIDE_CURSORS') == '1',
+            'OPTIONS': {},
+        }
     }
+    # DB_POOL_SIZE > 0 shares a psycopg connection pool per process instead
+    # of one persistent connection per thread
+    DB_POOL_SIZE = int(os.environ.get('DB_POOL_SIZE', 0))
+    if DB_POOL_SIZE > 0:
+        DATABASES['default']['CONN_MAX_AGE'] = 0
+        DATABASES['default']['OPTIONS']['pool'] = {
+            'min_size': int(os.environ.get('DB_POOL_MIN_SIZE', 2)),
+            'max_size': DB_POOL_SIZE,
+            'timeout': int(os.environ.get('DB_POOL_TIMEOUT', 10)),
+        }
+else:
+    DATABASES = {
+        'default': {
+            'ENGINE': 'django.db.backends.sqlite3',
+            'NAME': os.environ.get('DB_NAME', BASE_DIR / 'db.sqlite3'),
+            'OPTIONS': {
+                # take the write lock when a transaction starts, so waiting
+                # writers queue on the busy timeout instead of failing with
+                # "database is locked" when upgrading a read lock
+                'transaction_mode': 'IMMEDIATE',
+            },
+        }
+    }
+
+# Read replicas. DB_REPLICAS lists the replicas' hosts for PostgreSQL, or
+# database files for SQLite, separated by commas. The catalog, detail,
+# week entries and document views read from them, and a user who wrote
+# reads from the primary for LOGBOOK_REPLICA_STICKY_SECONDS afterwards.
+
+LOGBOOK_DATABASE_REPLICAS = []
+LOGBOOK_REPLICA_STICKY_SECONDS = 15
+
+for number, replica in enumerate(filter(None, os.environ.get('DB_REPLICAS', '').split(',')), 1):
+    alias = f'replica{number}'
+    DATABASES[alias] = copy.deepcopy(DATABASES['default'])
+    DATABASES[alias]['HOST' if DB_ENGINE == 'postgresql' else 'NAME'] = replica.strip()
+    # tests read the primary through the replica aliases
+    DATABASES[alias]['TEST'] = {'MIRROR': 'default'}
+    LOGBOOK_DATABASE_REPLICAS.append(alias)
+
+DATABASE_ROUTERS = ['logbook.routers.ReplicaRouter']
+
+# Pragmas run on every new connection to the SQLite database and its
+# replicas, only the names listed here are accepted. WAL lets readers
+# continue while an entry is saved, busy_timeout makes writers wait
+# (milliseconds) for each other instead of failing. Set to {} to keep
+# SQLite's defaults.
+
+LOGBOOK_SQLITE_PRAGMAS = {
+    'journal_mode': 'WAL',
+    'synchronous': 'NORMAL',
+    'busy_timeout': 5000,
+    'cache_size': -20000,
+    'mmap_size': 128 * 1024 * 1024,
+    'temp_store': 'MEMORY',
 }
 
 
@@ -145,6 +223,124 @@ MEDIA_URL = '/media/'
 MEDIA_ROOT = os.path.join(BASE_DIR, 'media')
 
 
+# Generated logbook documents
+# Documents are rendered in memory and streamed to the browser. Set to True
+# to also keep a copy of every generated document under MEDIA_ROOT/docs.
+
+LOGBOOK_SAVE_GENERATED_DOCX = False
+
+# Documents are filled in from a log book skeleton built once per process,
+# instead of being built from scratch. Set to False to always build them.
+
+LOGBOOK_DOCX_TEMPLATE = True
+
+# Uploaded activity diagrams are rotated upright, scaled down to this width
+# (6 inches at 200 dpi) and recompressed for embedding in documents.
+
+LOGBOOK_DIAGRAM_PRINT_WIDTH = 1200
+LOGBOOK_DIAGRAM_JPEG_QUALITY = 85
+
+# Generated documents are cached by a hash of their contents, so printing an
+# unchanged week is served from disk. Set the directory to None to disable.
+# The LOGBOOK_DOCUMENT_CACHE_DIR environment variable moves it elsewhere.
+
+LOGBOOK_DOCUMENT_CACHE_DIR = os.environ.get(
+    'LOGBOOK_DOCUMENT_CACHE_DIR', os.path.join(BASE_DIR, 'cache', 'docs'))
+LOGBOOK_DOCUMENT_CACHE_MAX_BYTES = 256 * 1024 * 1024
+
+# Set to True to render documents in the background: Print queues a job and
+# the page polls until `python manage.py run_document_worker` has rendered
+# it. LOGBOOK_DOCUMENT_WORKERS processes render at the same time, and every
+# student can have at most LOGBOOK_DOCUMENT_JOBS_PER_STUDENT jobs queued.
+# Finished documents are kept for LOGBOOK_DOCUMENT_JOB_RETENTION seconds.
+# Jobs still running after LOGBOOK_DOCUMENT_JOB_TIMEOUT seconds are taken to
+# belong to a worker that died and are failed, so Print can queue them again.
+# The LOGBOOK_DOCUMENT_JOB_DIR environment variable moves the finished
+# documents elsewhere.
+
+LOGBOOK_ASYNC_DOCUMENTS = False
+LOGBOOK_DOCUMENT_WORKERS = 2
+LOGBOOK_DOCUMENT_JOBS_PER_STUDENT = 3
+LOGBOOK_DOCUMENT_JOB_DIR = os.environ.get(
+    'LOGBOOK_DOCUMENT_JOB_DIR', os.path.join(BASE_DIR, 'cache', 'jobs'))
+LOGBOOK_DOCUMENT_JOB_RETENTION = 60 * 60
+LOGBOOK_DOCUMENT_JOB_TIMEOUT = 10 * 60
+
+# Create Entries can scaffold this many weeks at once, creating the missing
+# weeks after the current one together with their daily entries.
+
+LOGBOOK_MAX_BATCH_WEEKS = 52
+
+# request.student is cached per user for this many seconds, saving the
+# profile clears it. Only with a cache shared by all processes ("file"), a
+# per-process cache could not be cleared in the other workers.
+
+LOGBOOK_STUDENT_CACHE_TIMEOUT = 60
+
+# Students per page of the staff department dashboard.
+
+LOGBOOK_DASHBOARD_PAGE_SIZE = 50
+
+# Weeks shown on the first page of the catalog, "Load more" fetches the
+# next ones.
+
+LOGBOOK_CATALOG_PAGE_SIZE = 12
+
+# Cache for request.student and the rendered catalog cards and entry lists.
+# "locmem" keeps it in each process's memory, "file" shares it between
+# processes through LOGBOOK_CACHE_DIR. Fragments are keyed by the logbook's
+# version, so they never need to expire, LOGBOOK_FRAGMENT_CACHE_TIMEOUT
+# only bounds how long unused ones are kept.
+
+LOGBOOK_CACHE_BACKEND = 'locmem'
+LOGBOOK_CACHE_DIR = os.path.join(BASE_DIR, 'cache', 'django')
+LOGBOOK_FRAGMENT_CACHE_TIMEOUT = 24 * 60 * 60
+
+CACHE_BACKENDS = {
+    'locmem': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'logbook',
+    },
+    'file': {
+        'BACKEND': 'django.core.cache.backends.filebased.FileBasedCache',
+        'LOCATION': LOGBOOK_CACHE_DIR,
+    },
+}
+
+CACHES = {
+    'default': CACHE_BACKENDS[LOGBOOK_CACHE_BACKEND],
+}
+
+# Set to True to time every request: wall time, queries, database time and
+# document generation per URL name. The last LOGBOOK_INSTRUMENTATION_WINDOW
+# requests of each URL name are kept per process, and staff can read their
+# percentiles at /logbook/instrumentation/. Requests slower than
+# LOGBOOK_SLOW_REQUEST_MS or running more than LOGBOOK_SLOW_REQUEST_QUERIES
+# queries are logged with their slowest SQL (None disables either check).
+
+LOGBOOK_INSTRUMENTATION = False
+LOGBOOK_INSTRUMENTATION_WINDOW = 1000
+LOGBOOK_SLOW_REQUEST_MS = 1000
+LOGBOOK_SLOW_REQUEST_QUERIES = 50
+
+LOGGING = {
+    'version': 1,
+    'disable_existing_loggers': False,
+    'handlers': {
+        'console': {'class': 'logging.StreamHandler'},
+    },
+    'loggers': {
+        'logbook.instrumentation': {'handlers': ['console'], 'level': 'WARNING'},
+    },
+}
+
+# Prometheus metrics are served at /metrics. Set LOGBOOK_METRICS_TOKEN to
+# require "Authorization: Bearer <token>" from the scraper. With several
+# gunicorn workers, also set PROMETHEUS_MULTIPROC_DIR (see gunicorn.conf.py).
+
+LOGBOOK_METRICS_TOKEN = os.environ.get('LOGBOOK_METRICS_TOKEN')
+
+
 # Default primary key field type
 # https://docs.djangoproject.com/en/4.2/ref/settings/#default-auto-field
 
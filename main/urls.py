@@ -20,10 +20,13 @@ from django.urls import path, include
 from django.conf import settings
 from django.conf.urls.static import static
 
+from logbook.views import metrics_view
+
 urlpatterns = [
     path('', include('home.urls')),
     path('console/', admin.site.urls),
     path('logbook/', include('logbook.urls')),
+    path('metrics', metrics_view, name='metrics'),
     ]
 urlpatterns += static(settings.MEDIA_URL, document_root=settings.MEDIA_ROOT)
 urlpatterns += static(settings.STATIC_URL, document_root=settings.STATIC_ROOT)